@@ -16,11 +16,180 @@ class Settings(BaseSettings):
     yandex_vision_api_key: str = ""
     yandex_vision_folder_id: str = ""
     yandex_vision_endpoint: str = "https://vision.api.cloud.yandex.net/vision/v1/batchAnalyze"
+
+    # Model routing: fast score pass
+    score_model: str = "deepseek-chat"
+    score_temperature: float = 0.3
+    score_max_tokens: int = 150
+
+    # Model routing: deterministic re-score for stable comparisons
+    rescore_temperature: float = 0.0
     
+    # Model routing: full narrative pass
+    narrative_model: str = "deepseek-chat"
+    narrative_temperature: float = 0.7
+    narrative_max_tokens: int = 2000
+
+    # Model routing: visual analysis of OCR output
+    image_model: str = "deepseek-chat"
+    image_temperature: float = 0.7
+    image_max_tokens: int = 1500
+
+    # Default detail level: "scores", "full" or "auto"
+    default_analysis_detail: str = "auto"
+    # In "auto" mode the narrative is generated when any score is <= low or >= high
+    narrative_score_threshold_low: int = 4
+    narrative_score_threshold_high: int = 8
+
     # Server settings
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     
+    # Response settings
+    compression_minimum_size: int = 500
+    batch_concurrency: int = 4
+    
+    # Storage settings
+    data_dir: str = "data"
+    
+    # Similarity search
+    # Hashed feature dimension (4 bytes each per indexed entry); site-length texts rarely collide at 1024
+    similarity_dim: int = 1024
+    similarity_duplicate_threshold: float = 0.97
+    # Serve near-duplicate /analyze_text submissions from history
+    similarity_short_circuit: bool = True
+    
+    # Usage budgets (0 = unlimited)
+    daily_token_budget: int = 0
+    client_daily_token_budget: int = 0
+    daily_vision_call_budget: int = 0
+    # Share of a budget after which max_tokens shrink and "auto" analyses skip the narrative
+    budget_degrade_fraction: float = 0.8
+    budget_degraded_token_factor: float = 0.5
+    # Once exhausted: looser cache matching, then serialized score-only calls
+    budget_cache_threshold: float = 0.85
+    budget_queue_concurrency: int = 1
+    client_id_header: str = "X-API-Key"
+    # Days of per-client usage kept in usage.json (0 = keep all)
+    usage_retention_days: int = 90
+    
+    # Upstream resilience
+    upstream_timeout: float = 30.0
+    # Breaker opens when this share of the last breaker_window calls failed or were slow
+    breaker_window: int = 20
+    breaker_min_calls: int = 5
+    breaker_failure_rate: float = 0.5
+    breaker_slow_call_seconds: float = 20.0
+    breaker_open_seconds: float = 30.0
+    # Hedged requests: fire a second attempt once the first exceeds the observed p95
+    hedge_enabled: bool = False
+    hedge_latency_window: int = 100
+    hedge_min_samples: int = 20
+    # Near-duplicate threshold for serving history while the DeepSeek breaker is open
+    breaker_cache_threshold: float = 0.85
+    
+    # Competitor monitoring
+    monitor_enabled: bool = False
+    monitor_concurrency: int = 4
+    monitor_default_interval_hours: float = 24.0
+    # Random extra delay as a share of the interval, spreads crawls apart
+    monitor_jitter_fraction: float = 0.1
+    monitor_tick_seconds: float = 60.0
+    monitor_retry_minutes: float = 60.0
+    monitor_max_text_chars: int = 6000
+    monitor_analysis_detail: str = "auto"
+    monitor_deterministic: bool = True
+    monitor_user_agent: str = "MotionCraftMonitor/1.0"
+    # Fetched pages: bodies are cut at this size; redirects are followed and re-checked up to this many hops
+    monitor_max_page_bytes: int = 2097152
+    monitor_max_redirects: int = 5
+    # Allow targets resolving to private, loopback or link-local addresses (intranet testing only)
+    monitor_allow_private_hosts: bool = False
+    
+    # Analysis diffing and change alerts
+    # Token Jaccard similarity at which two list items count as the same point
+    diff_fuzzy_threshold: float = 0.5
+    # Score changes up to this size are treated as sampling noise
+    diff_score_noise: int = 1
+    diff_list_weight: float = 0.5
+    diff_significance_threshold: float = 2.0
+    
+    # Coalescing of short texts into one packed DeepSeek prompt
+    coalesce_enabled: bool = True
+    coalesce_max_chars: int = 600
+    coalesce_window_ms: float = 10.0
+    coalesce_max_items: int = 10
+    # Packed calls in flight, per priority class
+    coalesce_concurrency: int = 2
+    coalesce_max_tokens: int = 8000
+    
+    # OCR text reconstruction
+    ocr_min_confidence: float = 0.5
+    # Lines this many times taller than the median line are headings
+    ocr_heading_ratio: float = 1.4
+    # Token budget for extracted text sent to DeepSeek
+    ocr_max_tokens: int = 800
+    ocr_chars_per_token: int = 3
+    # Vision bodies at least this large are parsed incrementally to cap memory (needs ijson, 0 = never)
+    vision_stream_parse_min_bytes: int = 4194304
+    # Classification labels below this probability are not passed to the image prompt
+    vision_label_min_probability: float = 0.5
+    
+    # CPU-bound work (upload encoding, JSON parsing, validation): "process", "thread" or "inline";
+    # threads still hold the GIL, so only processes keep the event loop free
+    executor_kind: str = "process"
+    # 0 = executor default
+    executor_workers: int = 0
+    # Smaller payloads are handled inline on the event loop
+    executor_offload_min_bytes: int = 65536
+    # Event-loop lag sampling (0 = off); lags above loop_lag_stall_ms count as stalls
+    loop_lag_interval: float = 0.5
+    loop_lag_window: int = 120
+    loop_lag_stall_ms: float = 100.0
+    
+    # Priority lanes: concurrent upstream calls shared by interactive, batch and background requests
+    deepseek_concurrency: int = 8
+    vision_concurrency: int = 4
+    # Weighted fair queuing weights of waiting calls
+    lane_weight_interactive: float = 6.0
+    lane_weight_batch: float = 3.0
+    lane_weight_background: float = 1.0
+    # Upstream slots only interactive requests may take
+    lane_interactive_reserved: int = 2
+    lane_wait_window: int = 200
+    # Clients may lower (never raise) their class with this header: batch or background
+    priority_header: str = "X-Priority"
+    
+    # Warm cache of example and known-competitor analyses
+    warm_cache_enabled: bool = True
+    warm_cache_on_startup: bool = True
+    # Re-check for missing entries this often (0 = only at startup)
+    warm_cache_interval_hours: float = 24.0
+    # JSON list of {"text", "competitor_name", "detail"}; default: <data_dir>/warm_inputs.json
+    warm_cache_inputs: str = ""
+    
+    # Export: rows encoded per chunk (also the Parquet row group size)
+    export_chunk_rows: int = 5000
+    
+    # Submit/poll jobs: pending jobs older than job_timeout seconds are reported as failed
+    job_timeout: float = 600.0
+    job_ttl_hours: float = 24.0
+    # Retry-After hint while a job is pending, seconds
+    job_poll_interval: float = 2.0
+    
+    # Static frontend assets: content-hashed URLs are cached this long, seconds
+    static_max_age: int = 31536000
+    
+    # Request profiling (opt-in): share of requests profiled
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.01
+    # Keep every capture slower than this (0 = off). Slowness is only known at the end,
+    # so this profiles every request and the sample rate no longer bounds the overhead
+    profiling_slow_ms: float = 0.0
+    # Sampling interval of the statistical profiler, seconds
+    profiling_interval: float = 0.001
+    profiling_max_captures: int = 200
+    
     # Application settings
     app_title: str = "MotionCraft AI Analyzer"
     app_version: str = "1.0.0"
@@ -1,29 +1,80 @@
 """
 FastAPI Main Application - Python 3.6 compatible
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import base64
+from fastapi.middleware.gzip import GZipMiddleware
+import asyncio
+import hashlib
+import time
+from datetime import datetime
 from pathlib import Path
+from typing import Optional
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 from .config import settings
 from .models.schemas import (
     TextAnalysisRequest,
+    TextBatchRequest,
     ParseRequest,
+    MonitorTargetRequest,
+    SimilarSearchRequest,
+    DesignAnalysis,
+    ImageAnalysis,
     AnalysisResponse,
-    ImageAnalysisResponse
+    BatchAnalysisResponse,
+    ImageAnalysisResponse,
+    Job
+)
+from .responses import DefaultResponse, parse_fields, render, dump_analysis_response
+from .static_assets import HashedAssets, CachedStaticFiles
+from .services.analyzer_service import yandex_vision_analyzer
+from .services.batching_service import text_coalescer
+from .services.history_store import history_store, competitor_key
+from .services.analytics_service import analytics_service
+from .services.similarity_service import similarity_service
+from .services.monitor_service import monitor_service
+from .services.diff_service import diff_service
+from .services.executor_service import executor_service, loop_lag_monitor, encode_base64
+from .services.priority_lanes import (
+    deepseek_lanes, vision_lanes, lower_priority, PRIORITY_BATCH
 )
-from .services.analyzer_service import deepseek_analyzer, yandex_vision_analyzer
+from .services.warm_cache import warm_cache
+from .services.export_service import export_service, MEDIA_TYPES, EXTENSIONS
+from .services.job_service import job_service, PENDING_STATUSES
+from .services.profiling_service import profiling_service, StageTimings, current_stages, stage
+from .services.circuit_breaker import CircuitOpenError, deepseek_breaker, vision_breaker
+from .services.process_sync import scheduler_lease
+from .services.budget_service import (
+    budget_service,
+    current_client,
+    current_usage,
+    RequestUsage,
+    LEVEL_NORMAL,
+    LEVEL_DEGRADED,
+    LEVEL_EXHAUSTED
+)
+from .services.model_router import model_router, SCORE_FIELDS, DETAIL_FULL, DETAIL_AUTO, DETAIL_SCORES
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_title,
     version=settings.app_version,
-    root_path="/pem08"
+    root_path="/pem08",
+    default_response_class=DefaultResponse
 )
 
+# Compression middleware (brotli when available, gzip otherwise)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=settings.compression_minimum_size, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.compression_minimum_size)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -33,18 +84,112 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
+# Upstream calls once a budget is exhausted are queued through this semaphore
+_budget_queue = None  # type: Optional[asyncio.Semaphore]
+
+
+def budget_queue() -> asyncio.Semaphore:
+    """Created on first use, so it binds to the serving loop (not the importing thread's)"""
+    global _budget_queue
+    if _budget_queue is None:
+        _budget_queue = asyncio.Semaphore(settings.budget_queue_concurrency)
+    return _budget_queue
+
+
+@app.middleware("http")
+async def usage_middleware(request: Request, call_next):
+    """Attribute upstream usage to the calling client and report it per request"""
+    api_key = request.headers.get(settings.client_id_header)
+    client = "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:12] if api_key else "anonymous"
+    usage = RequestUsage()
+    current_client.set(client)
+    current_usage.set(usage)
+    lower_priority(request.headers.get(settings.priority_header))
+    response = await call_next(request)
+    response.headers["X-Usage"] = usage.header()
+    return response
+
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """Collect analyzer stage timings and profile sampled or slow requests"""
+    timings = StageTimings()
+    current_stages.set(timings)
+    # Path without root_path, as routed
+    path = request.scope["path"]
+    capture = None
+    if not path.startswith("/debug"):
+        capture = profiling_service.begin()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        if capture is not None:
+            profiling_service.end(capture, request.method, path, 500,
+                                  time.perf_counter() - started, timings)
+        raise
+    if capture is not None:
+        profiling_service.end(capture, request.method, path, response.status_code,
+                              time.perf_counter() - started, timings)
+    if profiling_service.enabled and timings.seconds:
+        response.headers["Server-Timing"] = timings.header()
+    return response
+
+
+# Mount static files (content-hashed URLs from index.html are cached long-term)
 frontend_path = Path(__file__).parent.parent / "frontend"
+frontend_assets = HashedAssets(frontend_path)
 if frontend_path.exists():
-    app.mount("/static", StaticFiles(directory=str(frontend_path)), name="static")
+    app.mount("/static", CachedStaticFiles(directory=str(frontend_path)), name="static")
+
+
+# Processes without the scheduler lease check this often whether its owner is gone
+SCHEDULER_LEASE_RETRY_SECONDS = 60.0
+_scheduler_task = None  # type: Optional[asyncio.Future]
+
+
+async def _run_schedulers():
+    """Scheduled monitoring and warm cache, in one process per data directory (Passenger starts several)"""
+    await scheduler_lease.wait(SCHEDULER_LEASE_RETRY_SECONDS)
+    if settings.monitor_enabled:
+        monitor_service.start()
+    # Precompute example and known-competitor analyses in the background
+    if settings.warm_cache_enabled and settings.warm_cache_on_startup:
+        warm_cache.start()
+
+
+@app.on_event("startup")
+async def start_schedulers():
+    global _scheduler_task
+    _scheduler_task = asyncio.ensure_future(_run_schedulers())
+
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    loop_lag_monitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_schedulers():
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+    await monitor_service.stop()
+    await warm_cache.stop()
+    scheduler_lease.release()
+
+
+@app.on_event("shutdown")
+async def stop_executor():
+    await loop_lag_monitor.stop()
+    executor_service.shutdown()
 
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Serve frontend"""
     index_path = frontend_path / "index.html"
     if index_path.exists():
-        return FileResponse(index_path)
+        return frontend_assets.index_response(request)
     return {"message": "MotionCraft AI Analyzer API"}
 
 
@@ -58,40 +203,184 @@ async def health_check():
             "deepseek": bool(settings.deepseek_api_key),
             "yandex_vision": bool(settings.yandex_vision_api_key),
             "parser": False
-        }
+        },
+        "coalescer": dict(text_coalescer.stats),
+        "circuit_breakers": {
+            "deepseek": deepseek_breaker.status(),
+            "yandex_vision": vision_breaker.status()
+        },
+        "priority_lanes": {
+            "deepseek": deepseek_lanes.status(),
+            "yandex_vision": vision_lanes.status()
+        },
+        "executor": executor_service.status(),
+        "event_loop": loop_lag_monitor.status(),
+        "jobs": job_service.status()
     }
 
 
 @app.post("/analyze_text", response_model=AnalysisResponse)
-async def analyze_text(request: TextAnalysisRequest):
-    """Analyze competitor text"""
+async def analyze_text(request: TextAnalysisRequest, http_request: Request, fields: Optional[str] = None):
+    """Analyze competitor text
+
+    ?fields=design_score,summary limits the returned analysis fields.
+    """
+    selected = parse_fields(fields, DesignAnalysis)
+    result = await _analyze_text_item(request)
+    return render(http_request, dump_analysis_response(result, selected))
+
+
+@app.post("/analyze_text_batch", response_model=BatchAnalysisResponse)
+async def analyze_text_batch(request: TextBatchRequest, http_request: Request, fields: Optional[str] = None):
+    """Analyze several competitor texts (JSON or MessagePack response)"""
+    selected = parse_fields(fields, DesignAnalysis)
+    # Bulk traffic queues behind interactive requests for upstream slots
+    lower_priority(PRIORITY_BATCH)
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    
+    async def run(item: TextAnalysisRequest) -> AnalysisResponse:
+        if text_coalescer.accepts(item.text):
+            # Short texts are packed into shared upstream calls by the coalescer
+            return await _analyze_text_item(item)
+        async with semaphore:
+            return await _analyze_text_item(item)
+    
+    results = await asyncio.gather(*[run(item) for item in request.items])
+    return render(
+        http_request,
+        {
+            "success": True,
+            "results": [dump_analysis_response(result, selected) for result in results],
+            "total": len(results)
+        },
+        compact=True
+    )
+
+
+async def _analyze_text_item(request: TextAnalysisRequest) -> AnalysisResponse:
+    """Run a single text analysis, converting errors into an unsuccessful response"""
     try:
+        if not request.deterministic:
+            warmed = warm_cache.get(request.text, request.competitor_name, request.detail)
+            if warmed is not None:
+                return AnalysisResponse(success=True, analysis=warmed)
+        
+        level = budget_service.level()
+        threshold = settings.budget_cache_threshold if level == LEVEL_EXHAUSTED else None
+        # A deterministic re-score must really re-score: history holds sampled (temperature > 0) results
+        cached = None if request.deterministic else await _find_duplicate_analysis(request, threshold)
+        if cached is not None:
+            return AnalysisResponse(success=True, analysis=cached, detail=CACHED_DETAIL)
+        
         if not settings.deepseek_api_key:
             raise HTTPException(status_code=503, detail="DeepSeek API key not configured")
         
-        analysis = await deepseek_analyzer.analyze_competitor_text(
-            text=request.text,
+        detail = model_router.resolve_detail(request.detail)
+        if level == LEVEL_DEGRADED and detail == DETAIL_AUTO:
+            detail = DETAIL_SCORES
+        
+        if level == LEVEL_EXHAUSTED:
+            # Over budget: no narrative, one upstream call at a time
+            async with budget_queue():
+                analysis = await text_coalescer.analyze(
+                    text=request.text,
+                    competitor_name=request.competitor_name,
+                    detail=DETAIL_SCORES,
+                    deterministic=request.deterministic
+                )
+        else:
+            analysis = await text_coalescer.analyze(
+                text=request.text,
+                competitor_name=request.competitor_name,
+                detail=detail,
+                deterministic=request.deterministic
+            )
+        
+        record = history_store.add(
+            request_type="text_analysis",
+            analysis=analysis.dict(),
+            competitor_name=request.competitor_name,
+            request_summary=request.text[:200],
+            response_summary=analysis.summary or _score_summary(analysis.dict())
+        )
+        similarity_service.index_analysis(
+            record.id,
+            request.text,
+            style_analysis=analysis.style_analysis,
             competitor_name=request.competitor_name
         )
+        if (level == LEVEL_NORMAL and not request.deterministic
+                and warm_cache.is_warm_input(request.text, request.competitor_name, request.detail)):
+            warm_cache.store(request.text, request.competitor_name, request.detail, analysis)
         
         return AnalysisResponse(success=True, analysis=analysis)
     
+    except CircuitOpenError as e:
+        # Upstream is down: serve a close match from history or fail fast
+        cached = await _find_duplicate_analysis(request, settings.breaker_cache_threshold)
+        if cached is not None:
+            return AnalysisResponse(success=True, analysis=cached, detail="Served from cache: " + str(e))
+        return AnalysisResponse(success=False, detail=str(e))
+    
     except Exception as e:
         return AnalysisResponse(success=False, detail=str(e))
 
 
+CACHED_DETAIL = "Served from cache: near-duplicate of an earlier analysis"
+
+
+async def _find_duplicate_analysis(request: TextAnalysisRequest,
+                                   threshold: Optional[float] = None) -> Optional[DesignAnalysis]:
+    """Stored analysis of a near-identical text of the same competitor, if it covers the requested detail"""
+    if not settings.similarity_short_circuit and threshold is None:
+        return None
+    duplicate = await similarity_service.find_duplicate(request.text, threshold)
+    if duplicate is None:
+        return None
+    record = history_store.get(duplicate["record_id"])
+    if record is None:
+        return None
+    if competitor_key(record.competitor_name) != competitor_key(request.competitor_name):
+        # Same text submitted for another studio is a different analysis subject
+        return None
+    analysis = DesignAnalysis(**record.analysis)
+    if threshold is None and model_router.resolve_detail(request.detail) == DETAIL_FULL and not analysis.summary:
+        # Cached result is score-only, the caller wants the narrative (budget mode takes it anyway)
+        return None
+    return analysis
+
+
 @app.post("/analyze_image", response_model=ImageAnalysisResponse)
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(http_request: Request, file: UploadFile = File(...), fields: Optional[str] = None):
     """Analyze image"""
+    selected = parse_fields(fields, ImageAnalysis)
+    contents = await file.read()
+    result = await _analyze_image_item(contents, file.filename)
+    return render(http_request, dump_analysis_response(result, selected))
+
+
+async def _analyze_image_item(contents: bytes, filename: Optional[str]) -> ImageAnalysisResponse:
+    """Run a single image analysis, converting errors into an unsuccessful response"""
     try:
         if not settings.yandex_vision_api_key:
             raise HTTPException(status_code=503, detail="Yandex Vision API key not configured")
         
-        # Read and encode image
-        contents = await file.read()
-        image_base64 = base64.b64encode(contents).decode('utf-8')
+        # Encode image
+        with stage("upload_encode"):
+            image_base64 = await executor_service.run(encode_base64, contents, size=len(contents))
         
-        analysis = await yandex_vision_analyzer.analyze_image(image_base64)
+        if budget_service.vision_level() == LEVEL_EXHAUSTED:
+            async with budget_queue():
+                analysis = await yandex_vision_analyzer.analyze_image(image_base64)
+        else:
+            analysis = await yandex_vision_analyzer.analyze_image(image_base64)
+        
+        history_store.add(
+            request_type="image_analysis",
+            analysis=analysis.dict(),
+            request_summary=filename or "image",
+            response_summary=analysis.description[:200]
+        )
         
         return ImageAnalysisResponse(success=True, analysis=analysis)
     
@@ -99,6 +388,51 @@ async def analyze_image(file: UploadFile = File(...)):
         return ImageAnalysisResponse(success=False, detail=str(e))
 
 
+@app.post("/jobs/analyze_text", status_code=202)
+async def submit_text_job(request: TextAnalysisRequest, http_request: Request):
+    """Start a text analysis and return at once; poll GET /jobs/{job_id} for the result"""
+    job = job_service.submit("analyze_text", _analyze_text_item(request))
+    return _job_accepted(http_request, job)
+
+
+@app.post("/jobs/analyze_image", status_code=202)
+async def submit_image_job(http_request: Request, file: UploadFile = File(...)):
+    """Start an image analysis and return at once; poll GET /jobs/{job_id} for the result"""
+    contents = await file.read()
+    job = job_service.submit("analyze_image", _analyze_image_item(contents, file.filename))
+    return _job_accepted(http_request, job)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, http_request: Request, fields: Optional[str] = None):
+    """Job status; once finished also the analysis result (?fields= as for /analyze_*)"""
+    job = job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    content = {"job_id": job.id, "status": job.status}
+    if job.status in PENDING_STATUSES:
+        response = render(http_request, content, compact=True)
+        response.headers["Retry-After"] = str(max(1, round(settings.job_poll_interval)))
+        return response
+    
+    selected = parse_fields(fields, ImageAnalysis if job.kind == "analyze_image" else DesignAnalysis)
+    result = dict(job.result or {"success": False, "detail": job.detail})
+    if selected is not None and result.get("analysis") is not None:
+        result["analysis"] = {name: value for name, value in result["analysis"].items() if name in selected}
+    content["result"] = result
+    return render(http_request, content, compact=True)
+
+
+def _job_accepted(http_request: Request, job: Job) -> JSONResponse:
+    poll_url = f"{http_request.scope.get('root_path', '')}/jobs/{job.id}"
+    return DefaultResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "poll": poll_url},
+        headers={"Location": poll_url, "Retry-After": str(max(1, round(settings.job_poll_interval)))}
+    )
+
+
 @app.post("/parse_demo")
 async def parse_demo(request: ParseRequest):
     """Demo parsing endpoint (simplified)"""
@@ -112,18 +446,172 @@ async def parse_demo(request: ParseRequest):
     )
 
 
+def _score_summary(analysis: dict) -> str:
+    """One-line score summary for history entries without narrative"""
+    return ", ".join(f"{field}: {analysis[field]}" for field in SCORE_FIELDS)
+
+
 @app.get("/history")
-async def get_history():
-    """Get analysis history"""
-    return {"items": [], "total": 0}
+async def get_history(http_request: Request, limit: int = 100, offset: int = 0):
+    """Get analysis history (JSON or MessagePack response)"""
+    items = history_store.list(limit=limit, offset=offset)
+    return render(
+        http_request,
+        {"items": [item.dict() for item in items], "total": history_store.count()},
+        compact=True
+    )
 
 
 @app.delete("/history")
 async def clear_history():
     """Clear history"""
+    history_store.clear()
+    similarity_service.clear()
+    diff_service.clear()
     return {"success": True, "message": "History cleared"}
 
 
+@app.post("/search/similar")
+async def search_similar(request: SimilarSearchRequest):
+    """Find previously analyzed competitors similar to the given text"""
+    items = await similarity_service.search(request.text, k=request.k, kind=request.kind)
+    return {"items": items, "total": len(items)}
+
+
+@app.get("/usage")
+async def get_usage(day: Optional[str] = None):
+    """Token and call usage per client for a day (YYYY-MM-DD, default today), budgets and current level"""
+    return budget_service.summary(day)
+
+
+@app.get("/monitor/status")
+async def monitor_status():
+    """Scheduler state, monitored targets and run counters"""
+    return monitor_service.status()
+
+
+@app.post("/monitor/targets")
+async def add_monitor_target(request: MonitorTargetRequest):
+    """Add or update a monitored competitor URL"""
+    try:
+        target = monitor_service.add_target(request.url, request.competitor_name, request.interval_hours)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "target": target.dict()}
+
+
+@app.delete("/monitor/targets")
+async def remove_monitor_target(url: str):
+    """Stop monitoring a competitor URL"""
+    if not monitor_service.remove_target(url):
+        raise HTTPException(status_code=404, detail="Target not found")
+    return {"success": True}
+
+
+@app.post("/monitor/run")
+async def run_monitor(url: Optional[str] = None):
+    """Crawl one target now, or every due target when url is omitted"""
+    if url is None:
+        return {"success": True, "runs": await monitor_service.run_due()}
+    target = await monitor_service.run_now(url)
+    if target is None:
+        raise HTTPException(status_code=404, detail="Target not found")
+    return {"success": True, "target": target.dict()}
+
+
+@app.get("/monitor/changes")
+async def monitor_changes(http_request: Request, limit: int = 100):
+    """Change log of score deltas between consecutive analyses of monitored competitors"""
+    items = monitor_service.changes(limit=limit)
+    return render(http_request, {"items": items, "total": len(items)}, compact=True)
+
+
+@app.get("/diff/alerts")
+async def diff_alerts(http_request: Request, limit: int = 100, competitor: Optional[str] = None):
+    """Significant changes between consecutive analyses of the same competitor"""
+    items = diff_service.alerts(limit=limit, competitor=competitor)
+    return render(http_request, {"items": items, "total": len(items)}, compact=True)
+
+
+@app.get("/diff/{record_id}")
+async def diff_record(record_id: str):
+    """Diff a stored analysis against the previous one for the same competitor"""
+    diff = diff_service.diff_record(record_id)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="No previous analysis to compare with")
+    return diff.dict()
+
+
+@app.get("/analytics/trends")
+async def analytics_trends(http_request: Request, competitor: Optional[str] = None, window: int = 5):
+    """Per-competitor score distributions, means and moving averages"""
+    trends = analytics_service.competitor_trends(competitor=competitor, window=window)
+    return render(http_request, {"items": trends, "total": len(trends)}, compact=True)
+
+
+@app.get("/analytics/improvers")
+async def analytics_improvers(field: str = "innovation_score", quarter: Optional[str] = None):
+    """Competitors whose mean score improved versus the previous quarter"""
+    if field not in SCORE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown score field: {field}")
+    try:
+        items = analytics_service.improvers(field=field, quarter=quarter)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "total": len(items)}
+
+
+@app.get("/export")
+async def export_history(format: str = "csv", request_type: Optional[str] = None,
+                         competitor: Optional[str] = None):
+    """Stream the stored analyses as CSV, Parquet or Arrow IPC (scores as int8 columns)"""
+    try:
+        body = export_service.stream(format, request_type=request_type, competitor=competitor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"motioncraft_analyses_{datetime.utcnow():%Y%m%d}.{EXTENSIONS[format]}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/cache/warm")
+async def warm_cache_status():
+    """Warm cache entries, configured inputs and current prompt template version"""
+    return warm_cache.status()
+
+
+@app.post("/cache/warm")
+async def refresh_warm_cache(force: bool = False):
+    """Analyze configured inputs missing from the warm cache (all of them with force=true)"""
+    warmed = await warm_cache.warm(force=force)
+    return {"success": True, "warmed": warmed, **warm_cache.status()}
+
+
+@app.get("/debug/profiles")
+async def list_profiles(limit: int = 100, reason: Optional[str] = None):
+    """Stored request profiles with their analyzer stage timings, newest first"""
+    items = profiling_service.list(limit=limit, reason=reason)
+    return {"enabled": profiling_service.enabled, "items": items, "total": len(items)}
+
+
+@app.get("/debug/profiles/{capture_id}")
+async def download_profile(capture_id: str):
+    """Raw capture: speedscope JSON (open at speedscope.app) or pstats"""
+    path = profiling_service.path_for(capture_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=path.name)
+
+
+@app.delete("/debug/profiles")
+async def clear_profiles():
+    profiling_service.clear()
+    return {"success": True}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=settings.api_host, port=settings.api_port)
@@ -1,13 +1,28 @@
 """
 Pydantic models for request/response validation
 """
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field
 
 
 class TextAnalysisRequest(BaseModel):
     text: str
     competitor_name: Optional[str] = None
+    # "scores", "full" or "auto"; None uses settings.default_analysis_detail
+    detail: Optional[str] = None
+    # Zero-temperature scoring for stable comparisons between runs
+    deterministic: bool = False
+
+
+class TextBatchRequest(BaseModel):
+    items: List[TextAnalysisRequest]
+
+
+class SimilarSearchRequest(BaseModel):
+    text: str
+    k: int = Field(5, ge=1, le=100)
+    # "text" (competitor texts), "style" (style analyses) or None for both
+    kind: Optional[str] = None
 
 
 class ImageAnalysisRequest(BaseModel):
@@ -24,11 +39,12 @@ class DesignAnalysis(BaseModel):
     innovation_score: int
     technical_execution: int
     client_focus: int
-    strengths: List[str]
-    weaknesses: List[str]
-    style_analysis: str
-    improvement_recommendations: List[str]
-    summary: str
+    # Narrative fields stay empty when only the score pass was run
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    style_analysis: str = ""
+    improvement_recommendations: List[str] = []
+    summary: str = ""
 
 
 class ImageAnalysis(BaseModel):
@@ -50,3 +66,73 @@ class ImageAnalysisResponse(BaseModel):
     success: bool
     analysis: Optional[ImageAnalysis] = None
     detail: Optional[str] = None
+
+
+class BatchAnalysisResponse(BaseModel):
+    success: bool
+    results: List[AnalysisResponse]
+    total: int
+
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: str
+    created_at: float
+    updated_at: float
+    # Serialized *AnalysisResponse once finished
+    result: Optional[Dict[str, Any]] = None
+    detail: Optional[str] = None
+
+
+class HistoryRecord(BaseModel):
+    id: str
+    timestamp: str
+    request_type: str
+    competitor_name: Optional[str] = None
+    request_summary: str = ""
+    response_summary: str = ""
+    analysis: Dict[str, Any] = {}
+
+
+class MonitorTargetRequest(BaseModel):
+    url: str
+    competitor_name: Optional[str] = None
+    interval_hours: Optional[float] = None
+
+
+class MonitorTarget(BaseModel):
+    url: str
+    competitor_name: Optional[str] = None
+    interval_hours: float
+    enabled: bool = True
+    next_run: float = 0.0
+    last_run: Optional[float] = None
+    content_hash: Optional[str] = None
+    last_record_id: Optional[str] = None
+    last_status: Optional[str] = None
+    last_error: Optional[str] = None
+
+
+class AnalysisDiff(BaseModel):
+    competitor_name: Optional[str] = None
+    timestamp: str
+    record_id: str
+    previous_record_id: str
+    score_deltas: Dict[str, int] = {}
+    added: Dict[str, List[str]] = {}
+    removed: Dict[str, List[str]] = {}
+    significance: float = 0.0
+    significant: bool = False
+
+
+class ScoreChange(BaseModel):
+    url: str
+    competitor_name: Optional[str] = None
+    timestamp: str
+    record_id: str
+    previous_record_id: Optional[str] = None
+    deltas: Dict[str, int] = {}
+    added: Dict[str, List[str]] = {}
+    removed: Dict[str, List[str]] = {}
+    significant: bool = False
@@ -0,0 +1,66 @@
+"""
+Response encoding helpers: fast JSON, MessagePack and field selection
+"""
+from typing import Any, Optional, Set, Type
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    orjson = None
+    DefaultResponse = JSONResponse
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+class MsgPackResponse(Response):
+    """Compact binary response for batch and history payloads"""
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[Set[str]]:
+    """Parse ?fields=a,b into a set, validating names against the model"""
+    if not fields:
+        return None
+    selected = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = selected - set(model.__fields__)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return selected
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Whether the client asked for MessagePack and it is available"""
+    return msgpack is not None and MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def render(request: Request, content: Any, compact: bool = False) -> Response:
+    """Render content as MessagePack when negotiated (compact endpoints only), else fast JSON"""
+    if compact and wants_msgpack(request):
+        return MsgPackResponse(content=content)
+    return DefaultResponse(content=content)
+
+
+def dump_analysis_response(response: BaseModel, fields: Optional[Set[str]]) -> dict:
+    """Serialize an *AnalysisResponse, keeping only selected analysis fields"""
+    if fields is None or response.analysis is None:
+        return response.dict(exclude_none=True)
+    return response.dict(
+        include={"success": True, "detail": True, "analysis": fields},
+        exclude_none=True
+    )
@@ -0,0 +1,207 @@
+"""
+Historical score aggregation and trend analytics
+"""
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from ..models.schemas import HistoryRecord
+from .history_store import history_store, HistoryStore, competitor_key
+from .model_router import SCORE_FIELDS
+
+
+# Number of trailing moving-average points returned per field
+MOVING_AVERAGE_POINTS = 30
+
+QUARTER_PATTERN = re.compile(r"^(\d{4})-Q([1-4])$")
+
+
+def quarter_of(timestamp: str) -> str:
+    """ISO timestamp -> '2024-Q3'"""
+    # Only year and month matter; strptime also works on Python 3.6 (no fromisoformat)
+    dt = datetime.strptime(timestamp[:7], "%Y-%m")
+    return f"{dt.year}-Q{(dt.month - 1) // 3 + 1}"
+
+
+def previous_quarter(quarter: str) -> str:
+    """'2024-Q1' -> '2023-Q4'; ValueError for anything that isn't a quarter"""
+    match = QUARTER_PATTERN.match(quarter)
+    if match is None:
+        raise ValueError(f"Invalid quarter '{quarter}', expected e.g. 2024-Q3")
+    year, q = int(match.group(1)), int(match.group(2))
+    if q == 1:
+        return f"{year - 1}-Q4"
+    return f"{year}-Q{q - 1}"
+
+
+class ScoreColumns:
+    """Growable columnar arrays of timestamps and scores for one competitor"""
+
+    def __init__(self, capacity: int = 16):
+        self.size = 0
+        self.timestamps = np.empty(capacity, dtype="datetime64[s]")
+        self.scores = np.empty((capacity, len(SCORE_FIELDS)), dtype=np.int8)
+
+    def append(self, timestamp: str, scores: List[int]) -> None:
+        if self.size == len(self.timestamps):
+            capacity = len(self.timestamps) * 2
+            self.timestamps = np.resize(self.timestamps, capacity)
+            self.scores = np.resize(self.scores, (capacity, len(SCORE_FIELDS)))
+        self.timestamps[self.size] = np.datetime64(timestamp[:19])
+        self.scores[self.size] = scores
+        self.size += 1
+
+    def view(self) -> np.ndarray:
+        """Scores of shape (n, fields) without the unused capacity"""
+        return self.scores[:self.size]
+
+
+class QuarterRollup:
+    """Running per-quarter sums so trend queries don't rescan records"""
+
+    def __init__(self):
+        self.count = 0
+        self.sums = np.zeros(len(SCORE_FIELDS), dtype=np.int64)
+
+    def add(self, scores: List[int]) -> None:
+        self.count += 1
+        self.sums += scores
+
+    def mean(self) -> np.ndarray:
+        return self.sums / self.count
+
+
+class CompetitorSeries:
+    def __init__(self, name: str):
+        self.name = name
+        self.columns = ScoreColumns()
+        self.quarters = {}  # type: Dict[str, QuarterRollup]
+        # Running totals for overall mean / std
+        self.sums = np.zeros(len(SCORE_FIELDS), dtype=np.int64)
+        self.sq_sums = np.zeros(len(SCORE_FIELDS), dtype=np.int64)
+
+
+class AnalyticsService:
+    """Incrementally maintained score rollups over the analysis history
+
+    Rollups catch up with the store on every query, so records added by
+    other server processes are included too.
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self._series = {}  # type: Dict[str, CompetitorSeries]
+        # Position in the store's records already rolled up
+        self._generation = None  # type: Optional[int]
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def competitor_trends(self, competitor: Optional[str] = None, window: int = 5) -> List[Dict]:
+        """Score distributions, means and moving averages per competitor"""
+        with self._lock:
+            series = self._get_series()
+            if competitor is not None:
+                key = competitor_key(competitor)
+                selected = [series[key]] if key in series else []
+            else:
+                selected = list(series.values())
+            return [self._describe(item, window) for item in selected]
+
+    def improvers(self, field: str = "innovation_score", quarter: Optional[str] = None) -> List[Dict]:
+        """Competitors whose mean score on field grew versus the previous quarter"""
+        column = SCORE_FIELDS.index(field)
+        quarter = quarter or quarter_of(datetime.utcnow().isoformat())
+        before = previous_quarter(quarter)
+
+        results = []
+        with self._lock:
+            for item in self._get_series().values():
+                current = item.quarters.get(quarter)
+                previous = item.quarters.get(before)
+                if current is None or previous is None:
+                    continue
+                delta = float(current.mean()[column] - previous.mean()[column])
+                if delta > 0:
+                    results.append({
+                        "competitor": item.name,
+                        "field": field,
+                        "quarter": quarter,
+                        "previous_mean": round(float(previous.mean()[column]), 2),
+                        "current_mean": round(float(current.mean()[column]), 2),
+                        "delta": round(delta, 2)
+                    })
+        return sorted(results, key=lambda row: row["delta"], reverse=True)
+
+    def _describe(self, item: CompetitorSeries, window: int) -> Dict:
+        scores = item.columns.view()
+        n = len(scores)
+        mean = item.sums / n
+        std = np.sqrt(np.maximum(item.sq_sums / n - mean ** 2, 0))
+
+        # Histogram of 1-10 scores per field in one pass: offset each column into its own bin range
+        offsets = np.arange(len(SCORE_FIELDS)) * 11
+        counts = np.bincount((scores + offsets).ravel(), minlength=11 * len(SCORE_FIELDS))
+        distribution = counts.reshape(len(SCORE_FIELDS), 11)[:, 1:]
+
+        # Trailing moving average along time for every field at once
+        window = max(1, min(window, n))
+        cumsum = np.cumsum(np.vstack([np.zeros(len(SCORE_FIELDS)), scores]), axis=0)
+        moving = (cumsum[window:] - cumsum[:-window]) / window
+
+        return {
+            "competitor": item.name,
+            "count": n,
+            "first_seen": str(item.columns.timestamps[0]),
+            "last_seen": str(item.columns.timestamps[n - 1]),
+            "mean": {field: round(float(mean[i]), 2) for i, field in enumerate(SCORE_FIELDS)},
+            "std": {field: round(float(std[i]), 2) for i, field in enumerate(SCORE_FIELDS)},
+            "latest": {field: int(scores[-1, i]) for i, field in enumerate(SCORE_FIELDS)},
+            "distribution": {field: distribution[i].tolist() for i, field in enumerate(SCORE_FIELDS)},
+            "moving_average": {
+                field: [round(float(value), 2) for value in moving[-MOVING_AVERAGE_POINTS:, i]]
+                for i, field in enumerate(SCORE_FIELDS)
+            },
+            "quarters": {
+                quarter: {field: round(float(value), 2) for field, value in zip(SCORE_FIELDS, rollup.mean())}
+                for quarter, rollup in sorted(item.quarters.items())
+            }
+        }
+
+    def _get_series(self) -> Dict[str, CompetitorSeries]:
+        """Rollups including every record stored so far (caller holds the lock)"""
+        generation, records = self.store.since(self._generation, self._count)
+        if generation != self._generation:
+            # First query or the history was cleared: rebuild
+            self._series = {}
+            self._generation = generation
+            self._count = 0
+        for record in records:
+            self._add(record)
+        self._count += len(records)
+        return self._series
+
+    def _add(self, record: HistoryRecord) -> None:
+        if record.request_type != "text_analysis":
+            return
+        try:
+            scores = [max(1, min(10, int(record.analysis[field]))) for field in SCORE_FIELDS]
+        except (KeyError, TypeError, ValueError):
+            return
+
+        key = competitor_key(record.competitor_name)
+        item = self._series.get(key)
+        if item is None:
+            item = self._series[key] = CompetitorSeries(record.competitor_name or "unknown")
+
+        item.columns.append(record.timestamp, scores)
+        item.sums += scores
+        item.sq_sums += np.square(scores)
+        quarter = quarter_of(record.timestamp)
+        if quarter not in item.quarters:
+            item.quarters[quarter] = QuarterRollup()
+        item.quarters[quarter].add(scores)
+
+
+# Global instance
+analytics_service = AnalyticsService(history_store)
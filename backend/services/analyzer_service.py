@@ -4,10 +4,56 @@ Python 3.6 compatible version
 """
 import httpx
 import base64
-import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from ..config import settings
 from ..models.schemas import DesignAnalysis, ImageAnalysis
+from .model_router import model_router, ModelRoute, SCORE_FIELDS, DETAIL_AUTO, DETAIL_FULL, DETAIL_SCORES
+from .budget_service import budget_service
+from .circuit_breaker import deepseek_breaker, vision_breaker
+from .ocr_layout import extract_layout_text
+from .upstream_json import loads, parse_vision_response, classification_labels
+from .executor_service import executor_service
+from .profiling_service import stage
+from .priority_lanes import deepseek_lanes, vision_lanes
+
+
+ANALYST_SYSTEM_PROMPT = "Ты эксперт-аналитик в области 3D-анимации и моушн-дизайна. Анализируй конкурентов и предоставляй подробные выводы. Отвечай на русском языке."
+VISUAL_SYSTEM_PROMPT = "Ты эксперт по визуальному дизайну. Отвечай на русском языке."
+
+
+SCORES_JSON_TEMPLATE = """{"design_score": <1-10>, "animation_potential": <1-10>, "innovation_score": <1-10>, "technical_execution": <1-10>, "client_focus": <1-10>}"""
+
+ANALYSIS_JSON_TEMPLATE = """{
+    "design_score": <1-10>,
+    "animation_potential": <1-10>,
+    "innovation_score": <1-10>,
+    "technical_execution": <1-10>,
+    "client_focus": <1-10>,
+    "strengths": ["сильная сторона 1", "сильная сторона 2", ...],
+    "weaknesses": ["слабая сторона 1", "слабая сторона 2", ...],
+    "style_analysis": "подробный анализ стиля",
+    "improvement_recommendations": ["рекомендация 1", "рекомендация 2", ...],
+    "summary": "краткое резюме"
+}"""
+
+
+def _extract_json(content: str) -> Any:
+    """Extract JSON from markdown code blocks if present and parse it"""
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+    return loads(content)
+
+
+def _read_vision_response(raw: bytes) -> Tuple[str, List[str]]:
+    """Vision body to (layout text, classification labels); bytes in, small result out"""
+    data = parse_vision_response(raw)
+    try:
+        text = extract_layout_text(data) or "No text detected in image"
+    except Exception:
+        text = "Error extracting text from image"
+    return text, classification_labels(data, settings.vision_label_min_probability)
 
 
 class DeepSeekAnalyzer:
@@ -17,44 +63,117 @@ class DeepSeekAnalyzer:
         self.api_key = settings.deepseek_api_key
         self.api_url = settings.deepseek_api_url
     
-    async def analyze_competitor_text(self, text: str, competitor_name: Optional[str] = None) -> DesignAnalysis:
-        """Analyze competitor text using DeepSeek"""
+    async def analyze_competitor_text(self, text: str, competitor_name: Optional[str] = None,
+                                      detail: Optional[str] = None,
+                                      deterministic: bool = False) -> DesignAnalysis:
+        """Analyze competitor text using DeepSeek
+
+        detail="scores" runs only the cheap score pass, "full" runs the single
+        full-narrative call and "auto" adds the narrative only for notable scores.
+        deterministic=True scores at zero temperature so repeated runs are comparable.
+        """
+        detail = model_router.resolve_detail(detail)
+        
+        if detail == DETAIL_FULL and not deterministic:
+            return await self.analyze_full(text, competitor_name)
         
+        scores = await self.score(text, competitor_name, deterministic)
+        return await self.complete_from_scores(text, competitor_name, scores, detail)
+    
+    async def analyze_full(self, text: str, competitor_name: Optional[str] = None) -> DesignAnalysis:
+        """Single call producing scores and narrative"""
         prompt = self._build_analysis_prompt(text, competitor_name)
+        content = await self._complete(model_router.route("narrative"), ANALYST_SYSTEM_PROMPT, prompt)
+        with stage("analysis_parse"):
+            return await executor_service.run(self._parse_analysis_response, content, size=len(content))
+    
+    async def score(self, text: str, competitor_name: Optional[str] = None,
+                    deterministic: bool = False) -> Dict[str, int]:
+        """Fast pass: numeric scores only"""
+        prompt = self._build_score_prompt(text, competitor_name)
+        score_route = model_router.route("rescore" if deterministic else "score")
+        content = await self._complete(score_route, ANALYST_SYSTEM_PROMPT, prompt)
+        with stage("analysis_parse"):
+            return self._parse_scores(content)
+    
+    async def complete_from_scores(self, text: str, competitor_name: Optional[str],
+                                   scores: Dict[str, int], detail: str) -> DesignAnalysis:
+        """Add the narrative pass on top of scores when the detail level calls for it"""
+        if detail == DETAIL_SCORES or (detail == DETAIL_AUTO and not model_router.needs_narrative(scores)):
+            return DesignAnalysis(**scores)
         
+        prompt = self._build_narrative_prompt(text, competitor_name, scores)
+        content = await self._complete(model_router.route("narrative"), ANALYST_SYSTEM_PROMPT, prompt)
+        with stage("analysis_parse"):
+            return await executor_service.run(self._parse_narrative_response, content, scores, size=len(content))
+    
+    async def score_batch(self, items: List[Tuple[str, Optional[str]]],
+                          deterministic: bool = False) -> List[Optional[Dict[str, int]]]:
+        """Score several (text, competitor_name) items with one packed prompt
+
+        Entries the model didn't return in a usable form come back as None.
+        """
+        route = model_router.route("rescore" if deterministic else "score")
+        prompt = self._build_batch_prompt(items, SCORES_JSON_TEMPLATE, "Оцени")
+        content = await self._complete(
+            route, ANALYST_SYSTEM_PROMPT, prompt,
+            max_tokens=min(route.max_tokens * len(items), settings.coalesce_max_tokens)
+        )
+        with stage("analysis_parse"):
+            return await executor_service.run(self._parse_scores_batch, content, len(items), size=len(content))
+    
+    async def analyze_full_batch(self, items: List[Tuple[str, Optional[str]]]) -> List[Optional[DesignAnalysis]]:
+        """Full analyses of several (text, competitor_name) items with one packed prompt"""
+        route = model_router.route("narrative")
+        prompt = self._build_batch_prompt(items, ANALYSIS_JSON_TEMPLATE, "Проанализируй")
+        content = await self._complete(
+            route, ANALYST_SYSTEM_PROMPT, prompt,
+            max_tokens=min(route.max_tokens * len(items), settings.coalesce_max_tokens)
+        )
+        with stage("analysis_parse"):
+            return await executor_service.run(self._parse_analysis_batch, content, len(items), size=len(content))
+    
+    async def _complete(self, route: ModelRoute, system_prompt: str, prompt: str,
+                        max_tokens: Optional[int] = None) -> str:
+        """Run a chat completion with the given route and return the message content"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
         payload = {
-            "model": "deepseek-chat",
+            "model": route.model,
             "messages": [
-            {
-                "role": "system",
-                "content": "Ты эксперт-аналитик в области 3D-анимации и моушн-дизайна. Анализируй конкурентов и предоставляй подробные выводы. Отвечай на русском языке."
-            },
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            "temperature": 0.7,
-            "max_tokens": 2000
+            "temperature": route.temperature,
+            "max_tokens": budget_service.max_tokens(max_tokens or route.max_tokens)
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self.api_url,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        async def attempt() -> Dict[str, Any]:
+            with stage("deepseek_upstream"):
+                async with httpx.AsyncClient(timeout=settings.upstream_timeout) as client:
+                    response = await client.post(
+                        self.api_url,
+                        headers=headers,
+                        json=payload
+                    )
+                    response.raise_for_status()
+            with stage("json_parse"):
+                data = await executor_service.run(loads, response.content, size=len(response.content))
+            # Every answered attempt is billed, including a hedge that lost the race
+            budget_service.record_completion(data.get("usage"))
+            return data
         
-        # Parse response
-        content = data["choices"][0]["message"]["content"]
-        return self._parse_analysis_response(content)
+        data = await deepseek_breaker.call(attempt, hedge=True, slot=deepseek_lanes.slot)
+        return data["choices"][0]["message"]["content"]
     
     def _build_analysis_prompt(self, text: str, competitor_name: Optional[str]) -> str:
         """Build analysis prompt"""
@@ -66,12 +185,35 @@ class DeepSeekAnalyzer:
 {text}
 
 Предоставь анализ в формате JSON на русском языке:
+{ANALYSIS_JSON_TEMPLATE}"""
+    
+    def _build_score_prompt(self, text: str, competitor_name: Optional[str]) -> str:
+        """Build compact prompt for the score-only pass"""
+        company_info = f"Компания: {competitor_name}\n" if competitor_name else ""
+        
+        return f"""{company_info}
+Оцени этого конкурента в области 3D-анимации и моушн-дизайна:
+
+{text}
+
+Ответь только JSON без пояснений:
+{SCORES_JSON_TEMPLATE}"""
+    
+    def _build_narrative_prompt(self, text: str, competitor_name: Optional[str], scores: Dict[str, int]) -> str:
+        """Build prompt for the narrative pass given already computed scores"""
+        company_info = f"Компания: {competitor_name}\n" if competitor_name else ""
+        score_lines = "\n".join(f"- {field}: {scores[field]}/10" for field in SCORE_FIELDS)
+        
+        return f"""{company_info}
+Проанализируй этого конкурента в области 3D-анимации и моушн-дизайна:
+
+{text}
+
+Оценки уже выставлены:
+{score_lines}
+
+Обоснуй их и предоставь анализ в формате JSON на русском языке:
 {{
-    "design_score": <1-10>,
-    "animation_potential": <1-10>,
-    "innovation_score": <1-10>,
-    "technical_execution": <1-10>,
-    "client_focus": <1-10>,
     "strengths": ["сильная сторона 1", "сильная сторона 2", ...],
     "weaknesses": ["слабая сторона 1", "слабая сторона 2", ...],
     "style_analysis": "подробный анализ стиля",
@@ -79,16 +221,77 @@ class DeepSeekAnalyzer:
     "summary": "краткое резюме"
 }}"""
     
+    def _build_batch_prompt(self, items: List[Tuple[str, Optional[str]]], template: str, verb: str) -> str:
+        """Pack several competitors into one prompt asking for a JSON array"""
+        sections = []
+        for number, (text, competitor_name) in enumerate(items, 1):
+            company_info = f"Компания: {competitor_name}\n" if competitor_name else ""
+            sections.append(f"### {number}\n{company_info}{text}")
+        packed = "\n\n".join(sections)
+        
+        return f"""{verb} каждого из {len(items)} конкурентов в области 3D-анимации и моушн-дизайна:
+
+{packed}
+
+Ответь только JSON-массивом из {len(items)} объектов в том же порядке, на русском языке, каждый объект в формате:
+{template}"""
+    
+    def _parse_batch(self, content: str, count: int) -> List[Dict[str, Any]]:
+        """Parse a packed JSON array answer; raises if it doesn't match the batch"""
+        data = _extract_json(content)
+        if isinstance(data, dict):
+            # Some answers wrap the array: {"results": [...]}
+            data = next((value for value in data.values() if isinstance(value, list)), None)
+        if not isinstance(data, list) or len(data) != count:
+            raise ValueError(f"Expected a JSON array of {count} analyses")
+        return [entry if isinstance(entry, dict) else {} for entry in data]
+    
+    def _parse_scores_batch(self, content: str, count: int) -> List[Optional[Dict[str, int]]]:
+        results = []
+        for entry in self._parse_batch(content, count):
+            try:
+                results.append({field: max(1, min(10, int(entry[field]))) for field in SCORE_FIELDS})
+            except Exception:
+                results.append(None)
+        return results
+    
+    def _parse_analysis_batch(self, content: str, count: int) -> List[Optional[DesignAnalysis]]:
+        results = []
+        for entry in self._parse_batch(content, count):
+            try:
+                results.append(DesignAnalysis(**entry))
+            except Exception:
+                results.append(None)
+        return results
+    
+    def _parse_scores(self, content: str) -> Dict[str, int]:
+        """Parse score-only response, clamping values to 1-10"""
+        try:
+            data = _extract_json(content)
+            return {field: max(1, min(10, int(data[field]))) for field in SCORE_FIELDS}
+        except Exception:
+            # Fallback scores
+            return {field: 7 for field in SCORE_FIELDS}
+    
+    def _parse_narrative_response(self, content: str, scores: Dict[str, int]) -> DesignAnalysis:
+        """Parse narrative-only response and merge it with the scores"""
+        try:
+            data = _extract_json(content)
+            data.update(scores)
+            return DesignAnalysis(**data)
+        except Exception as e:
+            return DesignAnalysis(
+                weaknesses=["Analysis parsing error: " + str(e)],
+                style_analysis="Unable to parse detailed analysis",
+                improvement_recommendations=["Review API response format"],
+                summary="Analysis completed with parsing issues",
+                **scores
+            )
+    
     def _parse_analysis_response(self, content: str) -> DesignAnalysis:
         """Parse AI response into DesignAnalysis model"""
         try:
-            # Extract JSON from markdown code blocks if present
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            data = json.loads(content)
+            data = _extract_json(content)
             return DesignAnalysis(**data)
         except Exception as e:
             # Fallback response
@@ -142,21 +345,29 @@ class YandexVisionAnalyzer:
             ]
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                self.endpoint,
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        async def attempt() -> bytes:
+            with stage("vision_upstream"):
+                async with httpx.AsyncClient(timeout=settings.upstream_timeout) as client:
+                    response = await client.post(
+                        self.endpoint,
+                        headers=headers,
+                        json=payload
+                    )
+                    response.raise_for_status()
+            # Counted per answered attempt, a losing hedge included
+            budget_service.record_vision_call()
+            return response.content
+        
+        raw = await vision_breaker.call(attempt, hedge=True, slot=vision_lanes.slot)
         
-        # Extract text and analyze
-        extracted_text = self._extract_text_from_response(data)
+        # Extract text and labels; dense screenshots are parsed off the event loop
+        with stage("ocr_extract"):
+            extracted_text, labels = await executor_service.run(_read_vision_response, raw, size=len(raw))
+        labels_info = f"Классификация изображения: {', '.join(labels)}\n\n" if labels else ""
         
         # Use DeepSeek to analyze the visual content
         deepseek = DeepSeekAnalyzer()
-        analysis_prompt = f"""Проанализируй описание дизайна/скриншота:
+        analysis_prompt = f"""{labels_info}Проанализируй текст со скриншота (строки с "# " — заголовки, блоки в порядке чтения):
 
 {extracted_text}
 
@@ -170,58 +381,14 @@ class YandexVisionAnalyzer:
     "recommendations": ["рекомендация 1", "рекомендация 2", ...]
 }}"""
         
-        headers_deepseek = {
-            "Authorization": f"Bearer {settings.deepseek_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload_deepseek = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "system", "content": "Ты эксперт по визуальному дизайну. Отвечай на русском языке."},
-                {"role": "user", "content": analysis_prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 1500
-        }
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                settings.deepseek_api_url,
-                headers=headers_deepseek,
-                json=payload_deepseek
-            )
-            response.raise_for_status()
-            data = response.json()
-        
-        content = data["choices"][0]["message"]["content"]
-        return self._parse_image_analysis(content, extracted_text)
-    
-    def _extract_text_from_response(self, response_data: Dict[str, Any]) -> str:
-        """Extract text from Yandex Vision response"""
-        try:
-            texts = []
-            for result in response_data.get("results", []):
-                for detection in result.get("results", []):
-                    if detection.get("textDetection"):
-                        for page in detection["textDetection"].get("pages", []):
-                            for block in page.get("blocks", []):
-                                for line in block.get("lines", []):
-                                    for word in line.get("words", []):
-                                        texts.append(word.get("text", ""))
-            return " ".join(texts) or "No text detected in image"
-        except Exception:
-            return "Error extracting text from image"
+        content = await deepseek._complete(model_router.route("image"), VISUAL_SYSTEM_PROMPT, analysis_prompt)
+        with stage("analysis_parse"):
+            return await executor_service.run(self._parse_image_analysis, content, extracted_text, size=len(content))
     
     def _parse_image_analysis(self, content: str, extracted_text: str) -> ImageAnalysis:
         """Parse image analysis response"""
         try:
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            data = json.loads(content)
+            data = _extract_json(content)
             return ImageAnalysis(**data)
         except Exception as e:
             return ImageAnalysis(
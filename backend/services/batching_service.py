@@ -0,0 +1,146 @@
+"""
+Micro-batching of short text analyses into packed DeepSeek prompts
+"""
+import asyncio
+from typing import List, Optional, Tuple
+from ..config import settings
+from ..models.schemas import DesignAnalysis
+from .analyzer_service import DeepSeekAnalyzer, deepseek_analyzer
+from .budget_service import current_client, current_usage, current_payers
+from .model_router import model_router, DETAIL_FULL
+from .priority_lanes import current_priority
+from .profiling_service import SharedStages, current_stages
+
+KIND_SCORES = "scores"
+KIND_FULL = "full"
+
+
+class _Pending:
+    def __init__(self, text: str, competitor_name: Optional[str], future: asyncio.Future):
+        self.text = text
+        self.competitor_name = competitor_name
+        self.future = future
+        # Captured in the caller's context: the batch task runs in the first caller's.
+        # Packed calls are charged by text length, close to each item's share of the prompt
+        self.payer = (current_client.get(), current_usage.get(), len(text))
+        self.stages = current_stages.get()
+
+
+class TextCoalescer:
+    """Collects short texts for a few milliseconds and analyzes them in one upstream call
+
+    Each caller awaits its own future; the packed answer is demultiplexed back
+    by position. If it can't be parsed, the affected items fall back to
+    individual calls. Usage of a packed call is split across its callers;
+    its stage timings go to every caller.
+    """
+
+    def __init__(self, analyzer: DeepSeekAnalyzer):
+        self.analyzer = analyzer
+        # Keyed by (kind, deterministic, priority): batches never mix request classes
+        self._queues = {}
+        self._timers = {}
+        # Per priority: a backlog of batch items must not hold the slots interactive items need
+        self._semaphores = {}
+        self.stats = {"items": 0, "batches": 0, "upstream_calls_saved": 0, "fallback_items": 0}
+
+    def accepts(self, text: str) -> bool:
+        """Whether text is short enough to be coalesced"""
+        return settings.coalesce_enabled and len(text) <= settings.coalesce_max_chars
+
+    async def analyze(self, text: str, competitor_name: Optional[str] = None,
+                      detail: Optional[str] = None, deterministic: bool = False) -> DesignAnalysis:
+        """Same contract as DeepSeekAnalyzer.analyze_competitor_text"""
+        if not self.accepts(text):
+            return await self.analyzer.analyze_competitor_text(text, competitor_name, detail, deterministic)
+
+        detail = model_router.resolve_detail(detail)
+        kind = KIND_FULL if detail == DETAIL_FULL and not deterministic else KIND_SCORES
+        result = await self._enqueue((kind, deterministic, current_priority.get()), text, competitor_name)
+        if kind == KIND_FULL:
+            return result
+        # Narrative passes stay individual: they are long and only needed for some items
+        return await self.analyzer.complete_from_scores(text, competitor_name, result, detail)
+
+    def _enqueue(self, key: Tuple[str, bool, str], text: str, competitor_name: Optional[str]) -> asyncio.Future:
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        queue = self._queues.setdefault(key, [])
+        queue.append(_Pending(text, competitor_name, future))
+        self.stats["items"] += 1
+
+        if len(queue) >= settings.coalesce_max_items:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(settings.coalesce_window_ms / 1000.0, self._flush, key)
+        return future
+
+    def _flush(self, key: Tuple[str, bool, str]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._queues.pop(key, [])
+        if items:
+            asyncio.ensure_future(self._run_batch(key, items))
+
+    def _semaphore_for(self, priority: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(priority)
+        if semaphore is None:
+            semaphore = self._semaphores[priority] = asyncio.Semaphore(settings.coalesce_concurrency)
+        return semaphore
+
+    async def _run_batch(self, key: Tuple[str, bool, str], items: List[_Pending]) -> None:
+        kind, deterministic, priority = key
+        current_priority.set(priority)
+
+        async with self._semaphore_for(priority):
+            results = [None] * len(items)
+            if len(items) > 1:
+                self.stats["batches"] += 1
+                current_payers.set([item.payer for item in items])
+                current_stages.set(SharedStages([item.stages for item in items]))
+                packed = [(item.text, item.competitor_name) for item in items]
+                try:
+                    if kind == KIND_FULL:
+                        results = await self.analyzer.analyze_full_batch(packed)
+                    else:
+                        results = await self.analyzer.score_batch(packed, deterministic)
+                    self.stats["upstream_calls_saved"] += len(items) - 1
+                except ValueError:
+                    # Unparseable packed answer: every item goes individually
+                    pass
+                except Exception as e:
+                    # Upstream failure would fail the individual calls the same way
+                    for item in items:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    return
+
+            for item, result in zip(items, results):
+                if result is not None and not item.future.done():
+                    item.future.set_result(result)
+
+            fallback = [item for item, result in zip(items, results) if result is None]
+            if len(items) > 1:
+                self.stats["fallback_items"] += len(fallback)
+            await asyncio.gather(*[self._run_single(kind, deterministic, item) for item in fallback])
+
+    async def _run_single(self, kind: str, deterministic: bool, item: _Pending) -> None:
+        # Runs as its own task (gather): only this item's caller pays and is timed
+        current_payers.set([item.payer])
+        current_stages.set(item.stages)
+        try:
+            if kind == KIND_FULL:
+                result = await self.analyzer.analyze_full(item.text, item.competitor_name)
+            else:
+                result = await self.analyzer.score(item.text, item.competitor_name, deterministic)
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result(result)
+
+
+# Global instance
+text_coalescer = TextCoalescer(deepseek_analyzer)
@@ -0,0 +1,209 @@
+"""
+Token and call accounting with budget-driven degradation
+"""
+import contextvars
+import json
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+from ..config import settings
+from .process_sync import file_stamp, locked
+
+
+LEVEL_NORMAL = "normal"
+LEVEL_DEGRADED = "degraded"
+LEVEL_EXHAUSTED = "exhausted"
+
+# Least to most restrictive
+LEVELS = (LEVEL_NORMAL, LEVEL_DEGRADED, LEVEL_EXHAUSTED)
+
+COUNTERS = ("prompt_tokens", "completion_tokens", "deepseek_calls", "vision_calls")
+
+
+class RequestUsage:
+    """Usage accumulated by a single HTTP request"""
+
+    def __init__(self):
+        self.counters = {name: 0 for name in COUNTERS}
+
+    def header(self) -> str:
+        return ",".join(f"{name}={value}" for name, value in self.counters.items())
+
+
+# Set per request by the usage middleware in main.py
+current_client = contextvars.ContextVar("current_client", default="anonymous")
+current_usage = contextvars.ContextVar("current_usage", default=None)
+# Callers sharing one upstream call (coalesced batches): [(client, RequestUsage or None, weight)]
+current_payers = contextvars.ContextVar("current_payers", default=None)
+
+
+class UsageStore:
+    """Compact per-day, per-client counters persisted as one JSON file
+
+    Re-read whenever another process saved it; updates hold a file lock.
+    Days older than USAGE_RETENTION_DAYS are dropped on save.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._days = None  # type: Optional[Dict[str, Dict[str, Dict[str, int]]]]
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def add(self, day: str, clients: Dict[str, Dict[str, int]]) -> None:
+        """Add counters for several clients in one locked read-modify-write"""
+        with self._lock, locked(self.path):
+            self._load()
+            for client, counters in clients.items():
+                totals = self._days.setdefault(day, {}).setdefault(client, {name: 0 for name in COUNTERS})
+                for name, value in counters.items():
+                    totals[name] = totals.get(name, 0) + value
+            self._prune()
+            self._save()
+
+    def day(self, day: str) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            self._load()
+            return json.loads(json.dumps(self._days.get(day, {})))
+
+    def _load(self) -> None:
+        stamp = file_stamp(self.path)
+        if self._days is None or stamp != self._stamp:
+            self._days = {}
+            if stamp is not None:
+                with open(self.path, encoding="utf-8") as f:
+                    self._days = json.load(f)
+            self._stamp = stamp
+
+    def _prune(self) -> None:
+        if settings.usage_retention_days <= 0:
+            return
+        # YYYY-MM-DD keys order like dates
+        oldest = (datetime.utcnow() - timedelta(days=settings.usage_retention_days)).strftime("%Y-%m-%d")
+        for day in [day for day in self._days if day < oldest]:
+            del self._days[day]
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._days, f, separators=(",", ":"))
+        tmp_path.replace(self.path)
+        self._stamp = file_stamp(self.path)
+
+
+class BudgetService:
+    """Records upstream usage and maps spend to a degradation level"""
+
+    def __init__(self):
+        self.store = UsageStore(Path(settings.data_dir) / "usage.json")
+
+    def record_completion(self, usage: Optional[Dict]) -> None:
+        """Record a DeepSeek call from its `usage` block"""
+        usage = usage or {}
+        self._record({
+            "prompt_tokens": int(usage.get("prompt_tokens", 0)),
+            "completion_tokens": int(usage.get("completion_tokens", 0)),
+            "deepseek_calls": 1
+        })
+
+    def record_vision_call(self) -> None:
+        self._record({"vision_calls": 1})
+
+    def level(self, client: Optional[str] = None) -> str:
+        """Budget level for the client (defaults to the current request's client)
+
+        For a call shared by several callers it is the most restrictive of their levels.
+        """
+        if client is None:
+            payers = current_payers.get()
+            if payers:
+                return max((self.level(payer[0]) for payer in payers), key=LEVELS.index)
+            client = current_client.get()
+        today = self.store.day(_today())
+        fractions = [
+            _fraction(_sum_tokens(today.values()), settings.daily_token_budget),
+            _fraction(_sum_tokens([today.get(client, {})]), settings.client_daily_token_budget)
+        ]
+        used = max(fractions)
+        if used >= 1.0:
+            return LEVEL_EXHAUSTED
+        if used >= settings.budget_degrade_fraction:
+            return LEVEL_DEGRADED
+        return LEVEL_NORMAL
+
+    def vision_level(self) -> str:
+        calls = sum(totals.get("vision_calls", 0) for totals in self.store.day(_today()).values())
+        if _fraction(calls, settings.daily_vision_call_budget) >= 1.0:
+            return LEVEL_EXHAUSTED
+        return LEVEL_NORMAL
+
+    def max_tokens(self, max_tokens: int) -> int:
+        """Shrink a route's token budget once the current client is over the soft limit"""
+        if self.level() == LEVEL_NORMAL:
+            return max_tokens
+        return max(50, int(max_tokens * settings.budget_degraded_token_factor))
+
+    def summary(self, day: Optional[str] = None) -> Dict:
+        day = day or _today()
+        clients = self.store.day(day)
+        return {
+            "day": day,
+            "clients": clients,
+            "total_tokens": _sum_tokens(clients.values()),
+            "vision_calls": sum(totals.get("vision_calls", 0) for totals in clients.values()),
+            "budgets": {
+                "daily_token_budget": settings.daily_token_budget,
+                "client_daily_token_budget": settings.client_daily_token_budget,
+                "daily_vision_call_budget": settings.daily_vision_call_budget
+            },
+            "level": self.level(),
+            "vision_level": self.vision_level()
+        }
+
+    def _record(self, counters: Dict[str, int]) -> None:
+        """Charge the current caller, or split a shared call across its callers by weight"""
+        payers = current_payers.get() or [(current_client.get(), current_usage.get(), 1)]
+        shares = {name: _split(value, [payer[2] for payer in payers]) for name, value in counters.items()}
+        by_client = {}  # type: Dict[str, Dict[str, int]]
+        for index, (client, usage, _) in enumerate(payers):
+            share = {name: parts[index] for name, parts in shares.items()}
+            totals = by_client.setdefault(client, dict.fromkeys(share, 0))
+            for name, value in share.items():
+                totals[name] += value
+                if usage is not None:
+                    usage.counters[name] += value
+        self.store.add(_today(), by_client)
+
+
+def _today() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+def _sum_tokens(totals) -> int:
+    return sum(t.get("prompt_tokens", 0) + t.get("completion_tokens", 0) for t in totals)
+
+
+def _split(value: int, weights: List[float]) -> List[int]:
+    """Integer shares of value proportional to weights (largest remainder, sums to value)"""
+    total = sum(weights)
+    if len(weights) == 1 or total <= 0:
+        return [value] + [0] * (len(weights) - 1)
+    exact = [value * weight / total for weight in weights]
+    shares = [int(part) for part in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda index: exact[index] - shares[index], reverse=True)
+    for index in by_remainder[:value - sum(shares)]:
+        shares[index] += 1
+    return shares
+
+
+def _fraction(used: int, budget: int) -> float:
+    """Share of budget used; 0 budget means unlimited"""
+    if budget <= 0:
+        return 0.0
+    return used / budget
+
+
+# Global instance
+budget_service = BudgetService()
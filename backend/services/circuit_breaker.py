@@ -0,0 +1,202 @@
+"""
+Circuit breaker and hedged requests for upstream API calls
+"""
+import asyncio
+import time
+import httpx
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+from ..config import settings
+
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} is temporarily unavailable, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Per-upstream breaker driven by error rate and slow-call rate over a rolling window"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self._outcomes = deque(maxlen=settings.breaker_window)  # (ok, latency)
+        self._latencies = deque(maxlen=settings.hedge_latency_window)
+        self._probe_in_flight = False
+
+    async def call(self, attempt: Callable[[], Awaitable[Any]], hedge: bool = False,
+                   slot: Optional[Callable[[], Any]] = None) -> Any:
+        """Run attempt() through the breaker, optionally hedging slow attempts
+
+        slot() is an async context manager (e.g. PriorityLanes.slot) entered
+        by every attempt, the hedge included, so hedging never exceeds the
+        upstream's concurrency; latency is measured inside the slot. Each
+        attempt records its own outcome and latency, a losing hedge too, so
+        p95 is not biased towards the winners.
+        """
+        self._before_call()
+        probe = self.state == STATE_HALF_OPEN
+        timed = _TimedAttempt(attempt, slot, lambda ok, latency: self._record(ok, latency, probe))
+        try:
+            if hedge and self._state_allows_hedge():
+                return await self._hedged(timed)
+            return await timed()
+        except asyncio.CancelledError:
+            self._probe_in_flight = False
+            raise
+
+    def p95(self) -> Optional[float]:
+        """p95 latency of recent successful calls, None until enough samples"""
+        if len(self._latencies) < settings.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def status(self) -> Dict:
+        failures = sum(1 for ok, latency in self._outcomes if not ok or latency > settings.breaker_slow_call_seconds)
+        return {
+            "state": self._current_state(),
+            "calls": len(self._outcomes),
+            "failure_rate": round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+            "p95_latency": self.p95()
+        }
+
+    def _current_state(self) -> str:
+        if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= settings.breaker_open_seconds:
+            return STATE_HALF_OPEN
+        return self.state
+
+    def _before_call(self) -> None:
+        state = self._current_state()
+        if state == STATE_OPEN:
+            raise CircuitOpenError(self.name, settings.breaker_open_seconds - (time.monotonic() - self.opened_at))
+        if state == STATE_HALF_OPEN:
+            # Let a single probe through, fail fast for the rest
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.name, 0)
+            self.state = STATE_HALF_OPEN
+            self._probe_in_flight = True
+
+    def _record(self, ok: bool, latency: float, probe: bool = False) -> None:
+        if ok:
+            self._latencies.append(latency)
+
+        if self.state == STATE_HALF_OPEN:
+            if not probe:
+                # A hedge left running from before the breaker opened doesn't decide the probe
+                return
+            self._probe_in_flight = False
+            if ok and latency <= settings.breaker_slow_call_seconds:
+                self.state = STATE_CLOSED
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append((ok, latency))
+        if len(self._outcomes) < settings.breaker_min_calls:
+            return
+        failures = sum(1 for ok, latency in self._outcomes if not ok or latency > settings.breaker_slow_call_seconds)
+        if failures / len(self._outcomes) >= settings.breaker_failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = STATE_OPEN
+        self.opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _state_allows_hedge(self) -> bool:
+        # A half-open probe must stay a single request
+        return settings.hedge_enabled and self.state == STATE_CLOSED
+
+    async def _hedged(self, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        """Start a second attempt if the first outlives p95; return whichever succeeds first
+
+        The losing attempt is left to finish (in its own slot): it was sent
+        and is billed, so the attempt must get to record its usage.
+        """
+        delay = self.p95()
+        tasks = [asyncio.ensure_future(attempt())]
+        won = False
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    tasks.append(asyncio.ensure_future(attempt()))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        won = True
+                        for loser in pending:
+                            loser.add_done_callback(_consume_result)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            if not won:
+                # Caller cancelled or everything failed: nothing to wait for
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+
+
+class _TimedAttempt:
+    """attempt() run inside an optional slot, reporting each run's outcome and duration to on_done(ok, latency)"""
+
+    def __init__(self, attempt: Callable[[], Awaitable[Any]], slot: Optional[Callable[[], Any]],
+                 on_done: Callable[[bool, float], None]):
+        self.attempt = attempt
+        self.slot = slot
+        self.on_done = on_done
+
+    async def __call__(self) -> Any:
+        if self.slot is None:
+            return await self._run()
+        async with self.slot():
+            return await self._run()
+
+    async def _run(self) -> Any:
+        started = time.monotonic()
+        try:
+            result = await self.attempt()
+        except asyncio.CancelledError:
+            # Not an upstream outcome (CancelledError is an Exception before Python 3.8)
+            raise
+        except Exception as e:
+            self.on_done(not _is_upstream_failure(e), time.monotonic() - started)
+            raise
+        self.on_done(True, time.monotonic() - started)
+        return result
+
+
+def _consume_result(task: asyncio.Future) -> None:
+    """Retrieve a background attempt's outcome so its errors aren't reported as unhandled"""
+    if not task.cancelled():
+        task.exception()
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Client errors (bad key, bad request) say nothing about upstream health"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+# Global instances, one per upstream
+deepseek_breaker = CircuitBreaker("DeepSeek")
+vision_breaker = CircuitBreaker("Yandex Vision")
@@ -0,0 +1,151 @@
+"""
+Per-field diffing of consecutive analyses and significance-filtered change alerts
+"""
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from ..config import settings
+from ..models.schemas import AnalysisDiff, HistoryRecord
+from .history_store import history_store, HistoryStore, competitor_key
+from .model_router import SCORE_FIELDS
+
+
+LIST_FIELDS = ["strengths", "weaknesses", "improvement_recommendations"]
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _tokens(item: str) -> FrozenSet[str]:
+    """Normalized token set: lowercase, punctuation stripped"""
+    return frozenset(token for token in _NON_WORD_RE.split(item.lower()) if token)
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def match_items(old: List[str], new: List[str], threshold: float) -> Tuple[List[str], List[str]]:
+    """Fuzzy set difference of two lists: (added, removed)
+
+    Items are matched greedily by token Jaccard similarity, so rewording
+    the same point doesn't show up as a change.
+    """
+    old_tokens = [_tokens(item) for item in old]
+    new_tokens = [_tokens(item) for item in new]
+    unmatched_old = set(range(len(old)))
+    added = []
+
+    for j, tokens in enumerate(new_tokens):
+        best, best_score = None, threshold
+        for i in unmatched_old:
+            score = _jaccard(tokens, old_tokens[i])
+            if score >= best_score:
+                best, best_score = i, score
+        if best is None:
+            added.append(new[j])
+        else:
+            unmatched_old.discard(best)
+
+    removed = [old[i] for i in sorted(unmatched_old)]
+    return added, removed
+
+
+class DiffService:
+    """Compares each new analysis with the previous one for the same competitor"""
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self.alerts_path = Path(settings.data_dir) / "diff" / "alerts.jsonl"
+        self._lock = threading.Lock()
+        store.subscribe(self.process)
+
+    def compare(self, previous: HistoryRecord, current: HistoryRecord) -> AnalysisDiff:
+        """Score deltas and fuzzy list changes between two text analyses"""
+        old, new = previous.analysis, current.analysis
+        deltas = {}
+        for field in SCORE_FIELDS:
+            if field in old and field in new:
+                delta = int(new[field]) - int(old[field])
+                if delta:
+                    deltas[field] = delta
+
+        added, removed = {}, {}
+        # Score-only analyses have no narrative to compare
+        if old.get("summary") and new.get("summary"):
+            for field in LIST_FIELDS:
+                field_added, field_removed = match_items(
+                    old.get(field, []), new.get(field, []), settings.diff_fuzzy_threshold
+                )
+                if field_added:
+                    added[field] = field_added
+                if field_removed:
+                    removed[field] = field_removed
+
+        # Deltas within the noise band don't count towards significance
+        noise = settings.diff_score_noise
+        significance = sum(max(0, abs(delta) - noise) for delta in deltas.values())
+        significance += settings.diff_list_weight * sum(
+            len(items) for items in list(added.values()) + list(removed.values())
+        )
+
+        return AnalysisDiff(
+            competitor_name=current.competitor_name,
+            timestamp=current.timestamp,
+            record_id=current.id,
+            previous_record_id=previous.id,
+            score_deltas=deltas,
+            added=added,
+            removed=removed,
+            significance=round(significance, 2),
+            significant=significance >= settings.diff_significance_threshold
+        )
+
+    def diff_record(self, record_id: str) -> Optional[AnalysisDiff]:
+        """Diff a stored record against the previous analysis of its competitor"""
+        record = self.store.get(record_id)
+        if record is None:
+            return None
+        previous = self.store.previous_for(record)
+        if previous is None:
+            return None
+        return self.compare(previous, record)
+
+    def process(self, record: HistoryRecord) -> None:
+        """History listener: diff the new record and keep an alert if it is significant"""
+        if record.request_type != "text_analysis":
+            return
+        previous = self.store.previous_for(record)
+        if previous is None:
+            return
+        diff = self.compare(previous, record)
+        if diff.significant:
+            with self._lock:
+                self.alerts_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.alerts_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(diff.dict(), ensure_ascii=False) + "\n")
+
+    def alerts(self, limit: int = 100, competitor: Optional[str] = None) -> List[Dict]:
+        """Most recent significant changes first"""
+        with self._lock:
+            if not self.alerts_path.exists():
+                return []
+            with open(self.alerts_path, encoding="utf-8") as f:
+                lines = f.readlines()
+        items = [json.loads(line) for line in reversed(lines)]
+        if competitor is not None:
+            key = competitor_key(competitor)
+            items = [item for item in items if competitor_key(item.get("competitor_name")) == key]
+        return items[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            if self.alerts_path.exists():
+                self.alerts_path.unlink()
+
+
+# Global instance
+diff_service = DiffService(history_store)
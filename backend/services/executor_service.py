@@ -0,0 +1,148 @@
+"""
+Offloading of CPU-bound work from the event loop and event-loop lag monitoring
+"""
+import asyncio
+import base64
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+KIND_THREAD = "thread"
+KIND_PROCESS = "process"
+KIND_INLINE = "inline"
+EXECUTOR_KINDS = (KIND_THREAD, KIND_PROCESS, KIND_INLINE)
+
+
+def encode_base64(data: bytes) -> str:
+    """Base64 text of an upload (module-level so process pools can pickle it)"""
+    return base64.b64encode(data).decode("utf-8")
+
+
+class ExecutorService:
+    """Runs small jobs inline and hands large ones to a thread or process pool
+
+    Dispatch is by payload size: below EXECUTOR_OFFLOAD_MIN_BYTES the
+    hand-off costs more than the work itself. With a process pool, func and
+    its arguments must be picklable (module-level functions, plain data).
+    Where processes can't be started (no /dev/shm or fork limits on shared
+    hosting) a thread pool is used instead; a job whose worker process died
+    runs inline and the pool is replaced.
+    """
+
+    def __init__(self):
+        self.kind = settings.executor_kind.lower()
+        if self.kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{self.kind}', expected one of {', '.join(EXECUTOR_KINDS)}")
+        self._pool = None
+        self.stats = {"inline": 0, "offloaded": 0, "offloaded_seconds": 0.0}
+
+    def should_offload(self, size: int) -> bool:
+        return self.kind != KIND_INLINE and size >= settings.executor_offload_min_bytes
+
+    async def run(self, func: Callable[..., Any], *args: Any, size: int = 0) -> Any:
+        """func(*args), in the pool when size (payload bytes) crosses the threshold"""
+        if not self.should_offload(size):
+            self.stats["inline"] += 1
+            return func(*args)
+
+        started = time.monotonic()
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(self._executor(), partial(func, *args))
+        except BrokenProcessPool:
+            logger.warning("Executor process pool broke: running the job inline, a new pool starts next time")
+            self.shutdown()
+            return func(*args)
+        finally:
+            self.stats["offloaded"] += 1
+            self.stats["offloaded_seconds"] += time.monotonic() - started
+
+    def status(self) -> Dict:
+        return {
+            "kind": self.kind,
+            "workers": settings.executor_workers or None,
+            "offload_min_bytes": settings.executor_offload_min_bytes,
+            "inline": self.stats["inline"],
+            "offloaded": self.stats["offloaded"],
+            "offloaded_seconds": round(self.stats["offloaded_seconds"], 3)
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            workers = settings.executor_workers or None
+            if self.kind == KIND_PROCESS:
+                try:
+                    self._pool = ProcessPoolExecutor(max_workers=workers)
+                except (OSError, NotImplementedError, ImportError) as e:
+                    logger.warning("Process pool unavailable (%s), using threads", e)
+                    self.kind = KIND_THREAD
+            if self.kind == KIND_THREAD:
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cpu")
+        return self._pool
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires: the time the loop was blocked"""
+
+    def __init__(self):
+        self._task = None
+        self._samples = deque(maxlen=settings.loop_lag_window)
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stall_at = None
+
+    def start(self) -> None:
+        if settings.loop_lag_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict:
+        samples = sorted(self._samples)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "lag_ms": round(self._samples[-1] * 1000, 1) if samples else None,
+            "p95_lag_ms": round(samples[int(0.95 * (len(samples) - 1))] * 1000, 1) if samples else None,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+            "last_stall_at": self.last_stall_at
+        }
+
+    async def _loop(self) -> None:
+        interval = settings.loop_lag_interval
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            self._record(max(0.0, time.monotonic() - expected))
+
+    def _record(self, lag: float) -> None:
+        self._samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag * 1000 >= settings.loop_lag_stall_ms:
+            self.stalls += 1
+            self.last_stall_at = time.time()
+
+
+# Global instances
+executor_service = ExecutorService()
+loop_lag_monitor = LoopLagMonitor()
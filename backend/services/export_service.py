@@ -0,0 +1,173 @@
+"""
+Streaming export of stored analyses to CSV, Parquet and Arrow IPC
+"""
+import csv
+import io
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from ..config import settings
+from ..models.schemas import HistoryRecord
+from .history_store import history_store, HistoryStore, competitor_key
+from .model_router import SCORE_FIELDS
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+FORMAT_ARROW = "arrow"
+EXPORT_FORMATS = (FORMAT_CSV, FORMAT_PARQUET, FORMAT_ARROW)
+
+MEDIA_TYPES = {
+    FORMAT_CSV: "text/csv; charset=utf-8",
+    FORMAT_PARQUET: "application/vnd.apache.parquet",
+    FORMAT_ARROW: "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {FORMAT_CSV: "csv", FORMAT_PARQUET: "parquet", FORMAT_ARROW: "arrows"}
+
+INFO_COLUMNS = ["id", "timestamp", "request_type", "competitor_name"]
+# Scores are 1-10: stored as int8 in columnar formats, empty when an analysis type lacks them
+INT_COLUMNS = SCORE_FIELDS + ["visual_style_score"]
+TEXT_COLUMNS = ["summary", "style_analysis", "description", "visual_style_analysis", "request_summary"]
+LIST_COLUMNS = ["strengths", "weaknesses", "improvement_recommendations", "recommendations"]
+COLUMNS = INFO_COLUMNS + INT_COLUMNS + TEXT_COLUMNS + LIST_COLUMNS
+
+# CSV cells can't hold lists: items go one per line inside the quoted cell
+CSV_LIST_SEPARATOR = "\n"
+
+
+def export_row(record: HistoryRecord) -> Dict[str, Any]:
+    """Flat row of a history record; missing fields are None"""
+    analysis = record.analysis
+    row = {
+        "id": record.id,
+        "timestamp": record.timestamp,
+        "request_type": record.request_type,
+        "competitor_name": record.competitor_name,
+        "request_summary": record.request_summary,
+    }
+    for column in INT_COLUMNS:
+        value = analysis.get(column)
+        row[column] = int(value) if value is not None else None
+    for column in TEXT_COLUMNS:
+        if column != "request_summary":
+            row[column] = analysis.get(column) or None
+    for column in LIST_COLUMNS:
+        value = analysis.get(column)
+        row[column] = list(value) if value else None
+    return row
+
+
+def _chunked(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes are handed out after each chunk"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []  # type: List[bytes]
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class ExportService:
+    """Generator-based export: rows are read, encoded and sent one chunk at a time"""
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+
+    def available_formats(self) -> List[str]:
+        return list(EXPORT_FORMATS) if pyarrow is not None else [FORMAT_CSV]
+
+    def rows(self, request_type: Optional[str] = None,
+             competitor: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        key = competitor_key(competitor) if competitor is not None else None
+        for record in self.store.scan():
+            if request_type is not None and record.request_type != request_type:
+                continue
+            if key is not None and competitor_key(record.competitor_name) != key:
+                continue
+            yield export_row(record)
+
+    def stream(self, fmt: str, request_type: Optional[str] = None,
+               competitor: Optional[str] = None) -> Iterator[bytes]:
+        """Encoded export body in chunks of export_chunk_rows rows"""
+        if fmt not in self.available_formats():
+            raise ValueError(f"Unsupported export format '{fmt}', available: {', '.join(self.available_formats())}")
+        chunks = _chunked(self.rows(request_type, competitor), settings.export_chunk_rows)
+        if fmt == FORMAT_CSV:
+            return self._csv(chunks)
+        return self._arrow(chunks, fmt)
+
+    def _csv(self, chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+        writer.writeheader()
+        for chunk in chunks:
+            for row in chunk:
+                writer.writerow({
+                    column: CSV_LIST_SEPARATOR.join(value) if column in LIST_COLUMNS and value else value
+                    for column, value in row.items()
+                })
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        # Header-only file when there is nothing to export
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    def _arrow(self, chunks: Iterator[List[Dict[str, Any]]], fmt: str) -> Iterator[bytes]:
+        schema = pyarrow.schema(
+            [(column, pyarrow.string()) for column in INFO_COLUMNS]
+            + [(column, pyarrow.int8()) for column in INT_COLUMNS]
+            + [(column, pyarrow.string()) for column in TEXT_COLUMNS]
+            + [(column, pyarrow.list_(pyarrow.string())) for column in LIST_COLUMNS]
+        )
+        sink = _DrainableSink()
+        if fmt == FORMAT_PARQUET:
+            writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pyarrow.ipc.new_stream(sink, schema)
+
+        for chunk in chunks:
+            table = pyarrow.Table.from_pylist(chunk, schema=schema)
+            # One row group / record batch per chunk
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        yield sink.drain()
+
+
+# Global instance
+export_service = ExportService(history_store)
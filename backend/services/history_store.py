@@ -0,0 +1,197 @@
+"""
+Persistent analysis history (JSON Lines file)
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from ..config import settings
+from ..models.schemas import HistoryRecord
+from .process_sync import file_stamp, locked
+
+logger = logging.getLogger(__name__)
+
+
+def competitor_key(name: Optional[str]) -> str:
+    """Normalize competitor name for grouping"""
+    return " ".join((name or "unknown").lower().split())
+
+
+class HistoryStore:
+    """Append-only store of analysis results with change listeners
+
+    Several processes may share the file: appends take a file lock, and
+    every access first reads what other processes appended since. Listeners
+    only see records added by this process.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or Path(settings.data_dir) / "history.jsonl")
+        self._records = None  # type: Optional[List[HistoryRecord]]
+        # File read so far: inode and byte offset; generation changes whenever records are reset
+        self._inode = None  # type: Optional[int]
+        self._offset = 0
+        self.generation = 0
+        self._by_id = {}  # type: Dict[str, HistoryRecord]
+        self._by_competitor = {}  # type: Dict[str, List[HistoryRecord]]
+        self._listeners = []  # type: List[Callable[[HistoryRecord], None]]
+        self._clear_listeners = []  # type: List[Callable[[], None]]
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[HistoryRecord], None],
+                  on_clear: Optional[Callable[[], None]] = None) -> None:
+        """Call listener for every record added from now on (and on_clear when history is cleared)"""
+        self._listeners.append(listener)
+        if on_clear is not None:
+            self._clear_listeners.append(on_clear)
+
+    def add(self, request_type: str, analysis: Dict, competitor_name: Optional[str] = None,
+            request_summary: str = "", response_summary: str = "") -> HistoryRecord:
+        """Append an analysis result to the history"""
+        record = HistoryRecord(
+            id=uuid.uuid4().hex,
+            timestamp=datetime.utcnow().isoformat(),
+            request_type=request_type,
+            competitor_name=competitor_name,
+            request_summary=request_summary,
+            response_summary=response_summary,
+            analysis=analysis
+        )
+        line = (json.dumps(record.dict(), ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock, locked(self.path):
+            # Caught up under the file lock, so the file ends where this record starts
+            self._load()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(line)
+                self._inode = os.fstat(f.fileno()).st_ino
+            self._offset += len(line)
+            self._index(record)
+
+        for listener in self._listeners:
+            # The record is already stored (and the upstream call paid for): a failing index must not fail the request
+            try:
+                listener(record)
+            except Exception:
+                logger.exception("History listener %r failed", listener)
+        return record
+
+    def iter_records(self) -> Iterator[HistoryRecord]:
+        """Iterate over records, oldest first"""
+        with self._lock:
+            records = list(self._load())
+        return iter(records)
+
+    def scan(self) -> Iterator[HistoryRecord]:
+        """Stream records from disk, oldest first, without loading the whole history
+
+        Only records present when the scan starts are returned.
+        """
+        with self._lock:
+            if not self.path.exists():
+                return
+            end = self.path.stat().st_size
+            f = open(self.path, "rb")
+        with f:
+            while f.tell() < end:
+                line = f.readline().strip()
+                if line:
+                    yield HistoryRecord(**json.loads(line))
+
+    def list(self, limit: int = 100, offset: int = 0) -> List[HistoryRecord]:
+        """Newest records first"""
+        with self._lock:
+            records = self._load()
+            newest = records[::-1]
+        return newest[offset:offset + limit]
+
+    def get(self, record_id: str) -> Optional[HistoryRecord]:
+        """Find a record by id"""
+        with self._lock:
+            self._load()
+            return self._by_id.get(record_id)
+
+    def previous_for(self, record: HistoryRecord) -> Optional[HistoryRecord]:
+        """Text analysis of the same competitor stored right before record
+
+        Records without a competitor name have no previous analysis: unrelated
+        unnamed submissions must not be compared with each other (the monitor
+        pairs its records by URL instead).
+        """
+        if not (record.competitor_name or "").strip():
+            return None
+        with self._lock:
+            self._load()
+            records = self._by_competitor.get(competitor_key(record.competitor_name), [])
+            for index in range(len(records) - 1, -1, -1):
+                if records[index].id == record.id:
+                    return records[index - 1] if index > 0 else None
+        return None
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+    def since(self, generation: Optional[int], count: int) -> Tuple[int, List[HistoryRecord]]:
+        """Records after the first count of generation, or all records if the history was reset since"""
+        with self._lock:
+            records = self._load()
+            if generation != self.generation:
+                return self.generation, list(records)
+            return self.generation, records[count:]
+
+    def clear(self) -> None:
+        """Remove all history"""
+        with self._lock, locked(self.path):
+            if self.path.exists():
+                self.path.unlink()
+            self._reset(None)
+
+        for listener in self._clear_listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("History clear listener %r failed", listener)
+
+    def _load(self) -> List[HistoryRecord]:
+        """Read records appended since the last access, by any process (caller holds the lock)
+
+        A missing or replaced file (cleared by another process) starts over.
+        """
+        stamp = file_stamp(self.path)
+        inode = stamp[0] if stamp is not None else None
+        if self._records is None or inode != self._inode or (stamp is not None and stamp[1] < self._offset):
+            self._reset(inode)
+        if stamp is not None and stamp[1] > self._offset:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(stamp[1] - self._offset)
+            # A line another process is still writing is read next time
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._index(HistoryRecord(**json.loads(line.decode("utf-8"))))
+            self._offset += end
+        return self._records
+
+    def _reset(self, inode: Optional[int]) -> None:
+        self._records = []
+        self._by_id = {}
+        self._by_competitor = {}
+        self._inode = inode
+        self._offset = 0
+        self.generation += 1
+
+    def _index(self, record: HistoryRecord) -> None:
+        self._records.append(record)
+        self._by_id[record.id] = record
+        if record.request_type == "text_analysis":
+            self._by_competitor.setdefault(competitor_key(record.competitor_name), []).append(record)
+
+
+# Global instance
+history_store = HistoryStore()
@@ -0,0 +1,122 @@
+"""
+Submit/poll jobs: long analyses run in the background while clients poll with short requests
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Dict, Optional
+from ..config import settings
+from ..models.schemas import Job
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+PENDING_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class JobService:
+    """Runs analyses as background tasks and keeps their state in data/jobs/<id>.json
+
+    State lives on disk so that any worker process behind Passenger can
+    answer a poll, not only the one running the job. A job still pending
+    after job_timeout seconds belonged to a process that was stopped and is
+    reported as failed.
+    """
+
+    def __init__(self):
+        self.directory = Path(settings.data_dir) / "jobs"
+        self._tasks = {}  # type: Dict[str, asyncio.Future]
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "lost": 0}
+
+    def submit(self, kind: str, work: Awaitable[Any]) -> Job:
+        """Start work (a coroutine returning a pydantic response) and return the queued job"""
+        self._cleanup()
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, kind=kind, status=JOB_QUEUED, created_at=now, updated_at=now)
+        self._save(job)
+        self.stats["submitted"] += 1
+        # The task inherits the submitting request's context (client, priority, stage timings)
+        task = asyncio.ensure_future(self._run(job, work))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        job = self._load(job_id)
+        if job is None or job.status not in PENDING_STATUSES or job.id in self._tasks:
+            return job
+        if time.time() - job.created_at > settings.job_timeout:
+            job.status = JOB_FAILED
+            job.detail = "Job was interrupted, please submit it again"
+            job.updated_at = time.time()
+            self._save(job)
+            self.stats["lost"] += 1
+        return job
+
+    def status(self) -> Dict[str, Any]:
+        return {"running": len(self._tasks), "stats": dict(self.stats)}
+
+    async def _run(self, job: Job, work: Awaitable[Any]) -> None:
+        job.status = JOB_RUNNING
+        job.updated_at = time.time()
+        self._save(job)
+        try:
+            result = await work
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.detail = str(e)
+        else:
+            job.result = result.dict(exclude_none=True)
+            job.status = JOB_DONE if getattr(result, "success", True) else JOB_FAILED
+            job.detail = getattr(result, "detail", None)
+        job.updated_at = time.time()
+        self._save(job)
+        self.stats["done" if job.status == JOB_DONE else "failed"] += 1
+
+    def _path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        # Ids are uuid4 hex, anything else can't name a job file
+        if len(job_id) != 32 or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        path = self._path(job_id)
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return Job(**json.load(f))
+
+    def _save(self, job: Job) -> None:
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(job.id)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(job.dict(), f, ensure_ascii=False)
+            # Atomic, so a poll from another process never sees a partial file
+            tmp_path.replace(path)
+
+    def _cleanup(self) -> None:
+        """Delete finished jobs older than job_ttl_hours, at most once a minute"""
+        now = time.time()
+        if now - self._last_cleanup < 60 or not self.directory.exists():
+            return
+        self._last_cleanup = now
+        cutoff = now - settings.job_ttl_hours * 3600
+        for path in self.directory.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+
+# Global instance
+job_service = JobService()
@@ -0,0 +1,86 @@
+"""
+Model routing for tiered DeepSeek inference
+"""
+from typing import Dict
+from pydantic import BaseModel
+from ..config import settings
+
+
+SCORE_FIELDS = [
+    "design_score",
+    "animation_potential",
+    "innovation_score",
+    "technical_execution",
+    "client_focus",
+]
+
+DETAIL_SCORES = "scores"
+DETAIL_FULL = "full"
+DETAIL_AUTO = "auto"
+DETAIL_LEVELS = (DETAIL_SCORES, DETAIL_FULL, DETAIL_AUTO)
+
+
+class ModelRoute(BaseModel):
+    name: str
+    model: str
+    temperature: float
+    max_tokens: int
+
+
+class ModelRouter:
+    """Picks model and generation parameters for each analysis pass"""
+
+    def __init__(self):
+        self.routes = {
+            "score": ModelRoute(
+                name="score",
+                model=settings.score_model,
+                temperature=settings.score_temperature,
+                max_tokens=settings.score_max_tokens
+            ),
+            "rescore": ModelRoute(
+                name="rescore",
+                model=settings.score_model,
+                temperature=settings.rescore_temperature,
+                max_tokens=settings.score_max_tokens
+            ),
+            "narrative": ModelRoute(
+                name="narrative",
+                model=settings.narrative_model,
+                temperature=settings.narrative_temperature,
+                max_tokens=settings.narrative_max_tokens
+            ),
+            "image": ModelRoute(
+                name="image",
+                model=settings.image_model,
+                temperature=settings.image_temperature,
+                max_tokens=settings.image_max_tokens
+            ),
+        }
+        self.threshold_low = settings.narrative_score_threshold_low
+        self.threshold_high = settings.narrative_score_threshold_high
+
+    def route(self, name: str) -> ModelRoute:
+        """Get route settings by name"""
+        return self.routes[name]
+
+    def resolve_detail(self, detail: str = None) -> str:
+        """Normalize requested detail level, falling back to the configured default"""
+        detail = (detail or settings.default_analysis_detail or DETAIL_FULL).lower()
+        if detail not in DETAIL_LEVELS:
+            raise ValueError(f"Unknown analysis detail '{detail}', expected one of {', '.join(DETAIL_LEVELS)}")
+        return detail
+
+    def needs_narrative(self, scores: Dict[str, int]) -> bool:
+        """Whether scores are notable enough to pay for the narrative pass"""
+        for field in SCORE_FIELDS:
+            value = scores.get(field)
+            if value is None:
+                continue
+            if value <= self.threshold_low or value >= self.threshold_high:
+                return True
+        return False
+
+
+# Global instance
+model_router = ModelRouter()
@@ -0,0 +1,358 @@
+"""
+Scheduled competitor monitoring: periodic crawl, change detection and re-analysis
+"""
+import asyncio
+import hashlib
+import ipaddress
+import json
+import random
+import socket
+import threading
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+from pathlib import Path
+from typing import Dict, List, Optional
+import httpx
+from ..config import settings
+from ..models.schemas import MonitorTarget, ScoreChange
+from .analyzer_service import deepseek_analyzer
+from .diff_service import diff_service
+from .executor_service import executor_service
+from .budget_service import budget_service, current_client, LEVEL_EXHAUSTED
+from .history_store import history_store
+from .priority_lanes import current_priority, PRIORITY_BACKGROUND
+from .process_sync import file_stamp, locked
+from .model_router import SCORE_FIELDS
+
+
+class _TextExtractor(HTMLParser):
+    """Visible text of an HTML page, without scripts and styles"""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth and data.strip():
+            self.parts.append(data.strip())
+
+
+def extract_page_text(html: str) -> str:
+    parser = _TextExtractor()
+    parser.feed(html)
+    return " ".join(" ".join(parser.parts).split())
+
+
+class UnsafeURLError(ValueError):
+    """URL the monitor refuses to fetch"""
+
+
+def check_url(url: str) -> str:
+    """Only absolute http(s) URLs with a host can be monitored"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeURLError(f"Only http(s) URLs with a host can be monitored: {url}")
+    return url
+
+
+async def check_public_host(url: str) -> None:
+    """Refuse hosts resolving to private, loopback, link-local or reserved addresses
+
+    Checked before every request and redirect hop; this blocks requests to
+    the hosting's internal services through client-supplied target URLs.
+    """
+    if settings.monitor_allow_private_hosts:
+        return
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_event_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise UnsafeURLError(f"Cannot resolve {parts.hostname}: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global:
+            raise UnsafeURLError(f"{parts.hostname} resolves to a non-public address")
+
+
+# Target settings managed through the API; a finished crawl keeps their current values
+SETTING_FIELDS = ("competitor_name", "interval_hours", "enabled")
+
+
+class MonitorService:
+    """Persisted competitor list crawled on jittered intervals within a fixed concurrency
+
+    The target list is re-read whenever another process saved it; updates
+    hold a file lock.
+    """
+
+    def __init__(self):
+        self.directory = Path(settings.data_dir) / "monitor"
+        self.targets_path = self.directory / "targets.json"
+        self.changes_path = self.directory / "changes.jsonl"
+        self._targets = None  # type: Optional[Dict[str, MonitorTarget]]
+        self._stamp = None
+        self._running = set()
+        self._lock = threading.Lock()
+        self._task = None
+        self._semaphore = None
+        self.stats = {"runs": 0, "unchanged": 0, "analyzed": 0, "errors": 0, "deferred": 0}
+
+    # --- target management ---
+
+    def add_target(self, url: str, competitor_name: Optional[str] = None,
+                   interval_hours: Optional[float] = None) -> MonitorTarget:
+        """Add or update a target; UnsafeURLError for non-http(s) URLs"""
+        check_url(url)
+        interval = interval_hours or settings.monitor_default_interval_hours
+        with self._lock, locked(self.targets_path):
+            targets = self._load()
+            target = targets.get(url)
+            if target is None:
+                # Spread first crawls over the interval so a bulk import doesn't stampede upstream
+                target = MonitorTarget(
+                    url=url,
+                    interval_hours=interval,
+                    next_run=time.time() + random.uniform(0, interval * 3600 * settings.monitor_jitter_fraction)
+                )
+            target.competitor_name = competitor_name or target.competitor_name
+            target.interval_hours = interval
+            targets[url] = target
+            self._save()
+        return target
+
+    def remove_target(self, url: str) -> bool:
+        with self._lock, locked(self.targets_path):
+            removed = self._load().pop(url, None) is not None
+            if removed:
+                self._save()
+        return removed
+
+    def targets(self) -> List[MonitorTarget]:
+        with self._lock:
+            return sorted(self._load().values(), key=lambda target: target.next_run)
+
+    def status(self) -> Dict:
+        targets = self.targets()
+        now = time.time()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "targets": len(targets),
+            "due": sum(1 for target in targets if target.enabled and target.next_run <= now),
+            "in_progress": sorted(self._running),
+            "next_run": min((target.next_run for target in targets if target.enabled), default=None),
+            "stats": dict(self.stats),
+            "items": [target.dict() for target in targets]
+        }
+
+    def changes(self, limit: int = 100) -> List[Dict]:
+        """Most recent score changes first"""
+        if not self.changes_path.exists():
+            return []
+        with open(self.changes_path, encoding="utf-8") as f:
+            lines = f.readlines()
+        return [json.loads(line) for line in reversed(lines[-limit:])]
+
+    # --- scheduler ---
+
+    def start(self) -> None:
+        """Start the background scheduler loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_due(self) -> int:
+        """Run every due target, at most monitor_concurrency at a time"""
+        now = time.time()
+        due = [
+            target for target in self.targets()
+            if target.enabled and target.next_run <= now and target.url not in self._running
+        ]
+        await asyncio.gather(*[self._run_limited(target.url) for target in due])
+        return len(due)
+
+    async def run_now(self, url: str) -> Optional[MonitorTarget]:
+        """Crawl one target immediately, regardless of its schedule"""
+        with self._lock:
+            if url not in self._load():
+                return None
+        await self._run_limited(url)
+        with self._lock:
+            return self._load().get(url)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_due()
+            except Exception:
+                self.stats["errors"] += 1
+            await asyncio.sleep(settings.monitor_tick_seconds)
+
+    async def _run_limited(self, url: str) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.monitor_concurrency)
+        async with self._semaphore:
+            await self._run_target(url)
+
+    async def _run_target(self, url: str) -> None:
+        with self._lock:
+            target = self._load().get(url)
+        if target is None or url in self._running:
+            return
+
+        self._running.add(url)
+        current_client.set("monitor")
+        current_priority.set(PRIORITY_BACKGROUND)
+        self.stats["runs"] += 1
+        try:
+            if budget_service.level() == LEVEL_EXHAUSTED:
+                # Stay inside the token envelope, retry later
+                self.stats["deferred"] += 1
+                target.last_status = "deferred"
+                target.next_run = time.time() + settings.monitor_retry_minutes * 60
+                return
+
+            text = await self._fetch_text(url)
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if content_hash == target.content_hash:
+                self.stats["unchanged"] += 1
+                target.last_status = "unchanged"
+            else:
+                await self._analyze(target, text)
+                target.content_hash = content_hash
+                target.last_status = "analyzed"
+                self.stats["analyzed"] += 1
+            target.last_error = None
+            target.last_run = time.time()
+            target.next_run = self._next_run(target)
+        except Exception as e:
+            self.stats["errors"] += 1
+            target.last_status = "error"
+            target.last_error = str(e)
+            target.next_run = time.time() + settings.monitor_retry_minutes * 60
+        finally:
+            self._running.discard(url)
+            with self._lock, locked(self.targets_path):
+                targets = self._load()
+                current = targets.get(url)
+                if current is not None:
+                    # Settings may have changed during the crawl, possibly in another process
+                    targets[url] = target.copy(update={name: getattr(current, name) for name in SETTING_FIELDS})
+                    self._save()
+
+    async def _fetch_text(self, url: str) -> str:
+        """Page text; redirects are followed by hand so every hop is checked, the body is size-capped"""
+        async with httpx.AsyncClient(timeout=settings.upstream_timeout) as client:
+            for _ in range(settings.monitor_max_redirects + 1):
+                check_url(url)
+                await check_public_host(url)
+                async with client.stream("GET", url, headers={"User-Agent": settings.monitor_user_agent}) as response:
+                    if response.is_redirect:
+                        url = str(response.url.join(response.headers["location"]))
+                        continue
+                    response.raise_for_status()
+                    body = await _read_capped(response, settings.monitor_max_page_bytes)
+                    encoding = response.encoding or "utf-8"
+                    break
+            else:
+                raise UnsafeURLError(f"More than {settings.monitor_max_redirects} redirects")
+        html = body.decode(encoding, errors="replace")
+        return await executor_service.run(extract_page_text, html, size=len(body))
+
+    async def _analyze(self, target: MonitorTarget, text: str) -> None:
+        """Re-analyze changed content and log score deltas against the previous analysis"""
+        analysis = await deepseek_analyzer.analyze_competitor_text(
+            text=text[:settings.monitor_max_text_chars],
+            competitor_name=target.competitor_name,
+            detail=settings.monitor_analysis_detail,
+            deterministic=settings.monitor_deterministic
+        )
+        scores = analysis.dict()
+        record = history_store.add(
+            request_type="text_analysis",
+            analysis=scores,
+            competitor_name=target.competitor_name,
+            request_summary=target.url,
+            response_summary=analysis.summary or ", ".join(f"{f}: {scores[f]}" for f in SCORE_FIELDS)
+        )
+
+        previous = history_store.get(target.last_record_id) if target.last_record_id else None
+        if previous is not None:
+            diff = diff_service.compare(previous, record)
+            change = ScoreChange(
+                url=target.url,
+                competitor_name=target.competitor_name,
+                timestamp=record.timestamp,
+                record_id=record.id,
+                previous_record_id=previous.id,
+                deltas=diff.score_deltas,
+                added=diff.added,
+                removed=diff.removed,
+                significant=diff.significant
+            )
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.changes_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(change.dict(), ensure_ascii=False) + "\n")
+
+        target.last_record_id = record.id
+
+    def _next_run(self, target: MonitorTarget) -> float:
+        interval = target.interval_hours * 3600
+        return time.time() + interval + random.uniform(0, interval * settings.monitor_jitter_fraction)
+
+    def _load(self) -> Dict[str, MonitorTarget]:
+        """Load targets on first access and after another process saved them (caller holds the lock)"""
+        stamp = file_stamp(self.targets_path)
+        if self._targets is None or stamp != self._stamp:
+            self._targets = {}
+            self._stamp = stamp
+            if stamp is not None:
+                with open(self.targets_path, encoding="utf-8") as f:
+                    for item in json.load(f):
+                        target = MonitorTarget(**item)
+                        self._targets[target.url] = target
+        return self._targets
+
+    def _save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.targets_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([target.dict() for target in self._targets.values()], f, ensure_ascii=False)
+        tmp_path.replace(self.targets_path)
+        self._stamp = file_stamp(self.targets_path)
+
+
+async def _read_capped(response: httpx.Response, limit: int) -> bytes:
+    """Body up to limit bytes; the rest of an oversized page is never downloaded"""
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk[:limit - size])
+        size += len(chunks[-1])
+        if size >= limit:
+            break
+    return b"".join(chunks)
+
+
+# Global instance
+monitor_service = MonitorService()
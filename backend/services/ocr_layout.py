@@ -0,0 +1,193 @@
+"""
+Layout-aware text reconstruction from Yandex Vision textDetection output
+"""
+from statistics import median
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from ..config import settings
+
+
+Box = Tuple[float, float, float, float]  # x0, y0, x1, y1
+
+
+class TextLine:
+    def __init__(self, text: str, box: Box):
+        self.text = text
+        self.box = box
+        self.heading = False
+
+    @property
+    def height(self) -> float:
+        return self.box[3] - self.box[1]
+
+
+class TextBlock:
+    def __init__(self, lines: List[TextLine], box: Box):
+        self.lines = lines
+        self.box = box
+
+
+def _box(item: Dict[str, Any]) -> Optional[Box]:
+    """Bounding box from Vision vertices (coordinates may be strings or missing)"""
+    vertices = item.get("boundingBox", {}).get("vertices", [])
+    if not vertices:
+        return None
+    xs = [float(vertex.get("x", 0)) for vertex in vertices]
+    ys = [float(vertex.get("y", 0)) for vertex in vertices]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _iter_pages(response_data: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for result in response_data.get("results", []):
+        for detection in result.get("results", []):
+            text_detection = detection.get("textDetection")
+            if text_detection:
+                for page in text_detection.get("pages", []):
+                    yield page
+
+
+def _kept(word: Dict[str, Any], min_confidence: float) -> bool:
+    return bool(word.get("text", "").strip()) and float(word.get("confidence", 1.0)) >= min_confidence
+
+
+class _RawBlock:
+    """Vision block positioned for reading order; its lines are only read once needed"""
+
+    def __init__(self, raw: Dict[str, Any], box: Box):
+        self.raw = raw
+        self.box = box
+
+
+def _height(item: Dict[str, Any]) -> Optional[float]:
+    """Bounding box height only (cheaper than _box when x is not needed)"""
+    ys = [float(vertex.get("y", 0)) for vertex in item.get("boundingBox", {}).get("vertices", [])]
+    return max(ys) - min(ys) if ys else None
+
+
+def _scan_block(block: Dict[str, Any], min_confidence: float) -> Tuple[Optional[Box], List[float]]:
+    """Box and kept line heights of a block, without building its lines (box is None if nothing is kept)"""
+    box = _box(block)
+    line_boxes = []
+    heights = []
+    for line in block.get("lines", []):
+        if not any(_kept(word, min_confidence) for word in line.get("words", [])):
+            continue
+        if box is None:
+            # No block box: it is spanned from the kept lines
+            line_box = _box(line)
+            if line_box is not None:
+                line_boxes.append(line_box)
+                heights.append(line_box[3] - line_box[1])
+        else:
+            height = _height(line)
+            if height is not None:
+                heights.append(height)
+    if not heights:
+        return None, []
+    if box is None:
+        box = (min(b[0] for b in line_boxes), min(b[1] for b in line_boxes),
+               max(b[2] for b in line_boxes), max(b[3] for b in line_boxes))
+    return box, heights
+
+
+def _read_block(block: Dict[str, Any], min_confidence: float) -> Optional[TextBlock]:
+    lines = []
+    for line in block.get("lines", []):
+        words = []
+        previous = None
+        for word in line.get("words", []):
+            if not _kept(word, min_confidence):
+                continue
+            text = word["text"].strip()
+            # OCR often repeats a word when glyphs overlap
+            if previous is not None and text.lower() == previous:
+                continue
+            words.append(text)
+            previous = text.lower()
+        box = _box(line)
+        if words and box is not None:
+            lines.append(TextLine(" ".join(words), box))
+    if not lines:
+        return None
+
+    box = _box(block) or (
+        min(line.box[0] for line in lines), min(line.box[1] for line in lines),
+        max(line.box[2] for line in lines), max(line.box[3] for line in lines)
+    )
+    lines.sort(key=lambda line: (line.box[1], line.box[0]))
+    return TextBlock(lines, box)
+
+
+def _reading_order(blocks: List[_RawBlock]) -> List[_RawBlock]:
+    """Top-to-bottom rows of vertically overlapping blocks, left-to-right within a row"""
+    rows = []  # type: List[Tuple[float, float, List[_RawBlock]]]
+    for block in sorted(blocks, key=lambda b: b.box[1]):
+        x0, y0, x1, y1 = block.box
+        if rows:
+            top, bottom, members = rows[-1]
+            overlap = min(bottom, y1) - max(top, y0)
+            if overlap >= 0.5 * min(bottom - top, y1 - y0):
+                members.append(block)
+                rows[-1] = (min(top, y0), max(bottom, y1), members)
+                continue
+        rows.append((y0, y1, [block]))
+
+    ordered = []
+    for _, _, members in rows:
+        ordered.extend(sorted(members, key=lambda b: b.box[0]))
+    return ordered
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // settings.ocr_chars_per_token + 1
+
+
+def extract_layout_text(response_data: Dict[str, Any], max_tokens: Optional[int] = None,
+                        min_confidence: Optional[float] = None) -> str:
+    """Blocks in reading order with '# ' marked headings, repeated lines dropped, capped at max_tokens
+
+    Only block and line boxes are scanned up front (for reading order and the
+    heading threshold); words are joined block by block until the budget runs out.
+    """
+    if max_tokens is None:
+        max_tokens = settings.ocr_max_tokens
+    if min_confidence is None:
+        min_confidence = settings.ocr_min_confidence
+
+    pages = []  # type: List[Tuple[Optional[float], List[_RawBlock]]]
+    for page in _iter_pages(response_data):
+        page_blocks = []
+        heights = []  # type: List[float]
+        for raw in page.get("blocks", []):
+            box, line_heights = _scan_block(raw, min_confidence)
+            if box is not None:
+                page_blocks.append(_RawBlock(raw, box))
+                heights.extend(line_heights)
+        threshold = median(heights) * settings.ocr_heading_ratio if heights else None
+        pages.append((threshold, _reading_order(page_blocks)))
+
+    seen = set()
+    output = []
+    budget = max_tokens
+    for threshold, page_blocks in pages:
+        for raw_block in page_blocks:
+            block = _read_block(raw_block.raw, min_confidence)
+            block_lines = []
+            for line in block.lines:
+                key = line.text.lower()
+                # Navigation, footers and watermarks repeat across the screenshot
+                if key in seen:
+                    continue
+                seen.add(key)
+                line.heading = line.height >= threshold
+                text = "# " + line.text if line.heading else line.text
+                cost = estimate_tokens(text)
+                if cost > budget:
+                    budget = 0
+                    break
+                budget -= cost
+                block_lines.append(text)
+            if block_lines:
+                output.append("\n".join(block_lines))
+            if budget <= 0:
+                return "\n\n".join(output)
+    return "\n\n".join(output)
@@ -0,0 +1,165 @@
+"""
+Priority lanes: weighted fair queuing of upstream calls by request class
+"""
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Dict, Optional
+from ..config import settings
+from .profiling_service import stage
+
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITY_BACKGROUND = "background"
+# Highest priority first
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND)
+
+current_priority = contextvars.ContextVar("current_priority", default=PRIORITY_INTERACTIVE)
+
+
+def lower_priority(priority: Optional[str]) -> str:
+    """Move the current request down to priority (never up) and return the effective class"""
+    current = current_priority.get()
+    if priority in PRIORITIES and PRIORITIES.index(priority) > PRIORITIES.index(current):
+        current_priority.set(priority)
+        return priority
+    return current
+
+
+class _Lane:
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        # (future, enqueued_at) per waiting call
+        self.waiters = deque()
+        self.virtual_time = 0.0
+        self.active = 0
+        self.served = 0
+        self.max_depth = 0
+        self.wait_total = 0.0
+        self.waits = deque(maxlen=settings.lane_wait_window)
+
+    def status(self) -> Dict:
+        waits = sorted(self.waits)
+        return {
+            "weight": self.weight,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "max_queued": self.max_depth,
+            "served": self.served,
+            "mean_wait_ms": round(self.wait_total / self.served * 1000, 1) if self.served else 0.0,
+            "p95_wait_ms": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else 0.0
+        }
+
+
+class _Slot:
+    def __init__(self, lanes: "PriorityLanes", priority: str):
+        self.lanes = lanes
+        self.priority = priority
+
+    async def __aenter__(self) -> None:
+        with stage("lane_wait"):
+            await self.lanes.acquire(self.priority)
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.lanes.release(self.priority)
+
+
+class PriorityLanes:
+    """Shares upstream concurrency between request classes
+
+    Waiting calls are served by weighted fair queuing (each grant advances
+    the lane's virtual time by 1/weight, the lowest virtual time goes next),
+    and the last lane_interactive_reserved slots are only given to
+    interactive calls, so bulk traffic can never occupy all of them.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.reserved = min(settings.lane_interactive_reserved, self.capacity - 1)
+        self.lanes = {
+            PRIORITY_INTERACTIVE: _Lane(PRIORITY_INTERACTIVE, settings.lane_weight_interactive),
+            PRIORITY_BATCH: _Lane(PRIORITY_BATCH, settings.lane_weight_batch),
+            PRIORITY_BACKGROUND: _Lane(PRIORITY_BACKGROUND, settings.lane_weight_background),
+        }
+        self.in_use = 0
+        self._clock = 0.0
+
+    def slot(self, priority: Optional[str] = None) -> _Slot:
+        """async with lanes.slot(): ... - defaults to the current request's class"""
+        return _Slot(self, priority or current_priority.get())
+
+    async def acquire(self, priority: str) -> None:
+        lane = self.lanes[priority]
+        if not lane.waiters:
+            # A lane that was idle doesn't get credit for the time it didn't use
+            lane.virtual_time = max(lane.virtual_time, self._clock)
+            if self._can_start(lane):
+                self._grant(lane, 0.0)
+                return
+
+        future = asyncio.get_event_loop().create_future()
+        lane.waiters.append((future, time.monotonic()))
+        lane.max_depth = max(lane.max_depth, len(lane.waiters))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before the caller was cancelled
+                self.release(priority)
+            else:
+                self._discard(lane, future)
+            raise
+
+    def release(self, priority: str) -> None:
+        self.lanes[priority].active -= 1
+        self.in_use -= 1
+        self._dispatch()
+
+    def status(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "interactive_reserved": self.reserved,
+            "in_use": self.in_use,
+            "lanes": {name: lane.status() for name, lane in self.lanes.items()}
+        }
+
+    def _can_start(self, lane: _Lane) -> bool:
+        if lane.name == PRIORITY_INTERACTIVE:
+            return self.in_use < self.capacity
+        return self.in_use < self.capacity - self.reserved
+
+    def _grant(self, lane: _Lane, waited: float) -> None:
+        self._clock = lane.virtual_time
+        lane.virtual_time += 1.0 / lane.weight
+        lane.active += 1
+        lane.served += 1
+        lane.wait_total += waited
+        lane.waits.append(waited)
+        self.in_use += 1
+
+    def _dispatch(self) -> None:
+        while True:
+            candidates = [lane for lane in self.lanes.values() if lane.waiters and self._can_start(lane)]
+            if not candidates:
+                return
+            lane = min(candidates, key=lambda item: item.virtual_time)
+            future, enqueued_at = lane.waiters.popleft()
+            if future.done():
+                continue
+            self._grant(lane, time.monotonic() - enqueued_at)
+            future.set_result(None)
+
+    def _discard(self, lane: _Lane, future: asyncio.Future) -> None:
+        for item in lane.waiters:
+            if item[0] is future:
+                lane.waiters.remove(item)
+                break
+
+
+# Global instances, one per upstream
+deepseek_lanes = PriorityLanes("deepseek", settings.deepseek_concurrency)
+vision_lanes = PriorityLanes("yandex_vision", settings.vision_concurrency)
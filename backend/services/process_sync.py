@@ -0,0 +1,87 @@
+"""
+Coordination between server processes sharing one data directory (Passenger runs several)
+"""
+import asyncio
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+from ..config import settings
+
+try:
+    import fcntl
+except ImportError:
+    # Windows (desktop app): a single process, the stores' thread locks are enough
+    fcntl = None
+
+
+Stamp = Tuple[int, int, int]  # inode, size, mtime_ns
+
+
+def file_stamp(path: Path) -> Optional[Stamp]:
+    """Changes whenever the file is replaced or written; None if it doesn't exist"""
+    try:
+        stat = os.stat(str(path))
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """Exclusive lock on <path>.lock, held across a read-modify-write of path by any process"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(str(path) + ".lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ProcessLease:
+    """Lock owned by one process at a time, until it exits
+
+    Used to run the background schedulers (monitor, warm cache) in a single
+    process; another process takes over once the owner is gone.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.held = False
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Take the lease if no other process holds it"""
+        if self.held:
+            return True
+        if fcntl is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            f = open(str(self.path), "a")
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+            self._file = f
+        self.held = True
+        return True
+
+    async def wait(self, interval: float) -> None:
+        """Until the lease is ours, retrying every interval seconds"""
+        while not self.acquire():
+            await asyncio.sleep(interval)
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.held = False
+
+
+# Global instance
+scheduler_lease = ProcessLease(Path(settings.data_dir) / "scheduler.lock")
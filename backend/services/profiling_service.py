@@ -0,0 +1,224 @@
+"""
+Opt-in request profiling: sampled and slow-request captures tagged with analyzer stage timings
+"""
+import contextvars
+import cProfile
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from ..config import settings
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = None
+    SpeedscopeRenderer = None
+
+
+FORMAT_SPEEDSCOPE = "speedscope"
+FORMAT_PSTATS = "pstats"
+
+REASON_SAMPLED = "sampled"
+REASON_SLOW = "slow"
+
+
+class StageTimings:
+    """Time spent per analyzer stage within one request (summed over repeated stages)"""
+
+    def __init__(self):
+        self.seconds = {}  # type: Dict[str, float]
+        self.counts = {}  # type: Dict[str, int]
+
+    def add(self, name: str, seconds: float) -> None:
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def as_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 2) for name, seconds in self.seconds.items()}
+
+    def header(self) -> str:
+        """Server-Timing header value"""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_ms().items())
+
+
+class SharedStages:
+    """Stage sink for work done once on behalf of several requests (coalesced batches)
+
+    Every request waited for the shared work, so each gets the full timings.
+    """
+
+    def __init__(self, sinks: List[Optional[StageTimings]]):
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def add(self, name: str, seconds: float) -> None:
+        for sink in self.sinks:
+            sink.add(name, seconds)
+
+
+# StageTimings of the current request (SharedStages inside a coalesced batch)
+current_stages = contextvars.ContextVar("current_stages", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Attribute the wrapped block's wall time to a stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_stages.get()
+        if timings is not None:
+            timings.add(name, time.perf_counter() - started)
+
+
+class _Capture:
+    def __init__(self, profiler: Any, fmt: str, sampled: bool):
+        self.profiler = profiler
+        self.format = fmt
+        self.sampled = sampled
+
+
+class ProfilingService:
+    """Profiles a fraction of requests and keeps every request slower than the threshold
+
+    With pyinstrument installed captures are low-overhead statistical
+    profiles of the request's own async context, saved for speedscope.
+    Otherwise cProfile is used, one request at a time (it hooks the whole
+    thread), and saved as pstats.
+
+    Slow capture (profiling_slow_ms > 0) has to profile every request, since
+    slowness is only known at the end; with cProfile, slow requests that
+    overlap a profiled one are missed.
+    """
+
+    def __init__(self):
+        self.directory = Path(settings.data_dir) / "profiles"
+        self.index_path = self.directory / "index.jsonl"
+        self._lock = threading.Lock()
+        self._cprofile_busy = False
+
+    @property
+    def enabled(self) -> bool:
+        return settings.profiling_enabled
+
+    def begin(self) -> Optional[_Capture]:
+        """Start profiling the current request if it is sampled or slow capture is on"""
+        if not self.enabled:
+            return None
+        sampled = random.random() < settings.profiling_sample_rate
+        if not sampled and settings.profiling_slow_ms <= 0:
+            return None
+
+        if Profiler is not None:
+            profiler = Profiler(interval=settings.profiling_interval, async_mode="enabled")
+            profiler.start()
+            return _Capture(profiler, FORMAT_SPEEDSCOPE, sampled)
+
+        if self._cprofile_busy:
+            return None
+        self._cprofile_busy = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return _Capture(profiler, FORMAT_PSTATS, sampled)
+
+    def end(self, capture: _Capture, method: str, path: str, status_code: int,
+            duration: float, stages: Optional[StageTimings]) -> Optional[Dict[str, Any]]:
+        """Stop profiling; keep the capture if it was sampled or slow"""
+        if capture.format == FORMAT_SPEEDSCOPE:
+            session = capture.profiler.stop()
+        else:
+            capture.profiler.disable()
+            self._cprofile_busy = False
+
+        duration_ms = duration * 1000
+        if settings.profiling_slow_ms > 0 and duration_ms >= settings.profiling_slow_ms:
+            reason = REASON_SLOW
+        elif capture.sampled:
+            reason = REASON_SAMPLED
+        else:
+            return None
+
+        capture_id = uuid.uuid4().hex[:16]
+        suffix = ".speedscope.json" if capture.format == FORMAT_SPEEDSCOPE else ".pstats"
+        entry = {
+            "id": capture_id,
+            "timestamp": datetime.now().isoformat(),
+            "method": method,
+            "path": path,
+            "status_code": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "reason": reason,
+            "format": capture.format,
+            "file": capture_id + suffix,
+            "stages_ms": stages.as_ms() if stages is not None else {},
+            "stage_counts": dict(stages.counts) if stages is not None else {}
+        }
+
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            target = self.directory / entry["file"]
+            if capture.format == FORMAT_SPEEDSCOPE:
+                target.write_text(SpeedscopeRenderer().render(session), encoding="utf-8")
+            else:
+                capture.profiler.dump_stats(str(target))
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._prune()
+        return entry
+
+    def list(self, limit: int = 100, reason: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Captures, newest first"""
+        with self._lock:
+            entries = self._read_index()
+        entries.reverse()
+        if reason is not None:
+            entries = [entry for entry in entries if entry["reason"] == reason]
+        return entries[:limit]
+
+    def path_for(self, capture_id: str) -> Optional[Path]:
+        with self._lock:
+            for entry in self._read_index():
+                if entry["id"] == capture_id:
+                    path = self.directory / entry["file"]
+                    return path if path.exists() else None
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._read_index():
+                path = self.directory / entry["file"]
+                if path.exists():
+                    path.unlink()
+            if self.index_path.exists():
+                self.index_path.unlink()
+
+    def _read_index(self) -> List[Dict[str, Any]]:
+        if not self.index_path.exists():
+            return []
+        with open(self.index_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _prune(self) -> None:
+        """Drop the oldest captures beyond profiling_max_captures"""
+        entries = self._read_index()
+        excess = len(entries) - settings.profiling_max_captures
+        if excess <= 0:
+            return
+        for entry in entries[:excess]:
+            path = self.directory / entry["file"]
+            if path.exists():
+                path.unlink()
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            for entry in entries[excess:]:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# Global instance
+profiling_service = ProfilingService()
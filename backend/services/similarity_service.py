@@ -0,0 +1,220 @@
+"""
+Semantic similarity search over past analyses
+Hashing vectorizer + brute-force NumPy index persisted to disk
+"""
+import json
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from ..config import settings
+from .executor_service import executor_service
+from .process_sync import file_stamp, locked
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Indexed entry kinds, stored as small integer codes (0 = unknown)
+KINDS = ("text", "style")
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS, 1)}
+
+
+class HashingVectorizer:
+    """Stateless text -> L2-normalized vector using the hashing trick (unigrams + bigrams)"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def transform(self, text: str) -> np.ndarray:
+        tokens = TOKEN_RE.findall(text.lower())
+        features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+
+        # crc32 is stable across processes, unlike hash()
+        hashes = np.array([zlib.crc32(f.encode("utf-8")) for f in features], dtype=np.uint64)
+        indices = (hashes % self.dim).astype(np.int64)
+        signs = np.where((hashes >> np.uint64(31)) & np.uint64(1), -1.0, 1.0)
+        vector += np.bincount(indices, weights=signs, minlength=self.dim).astype(np.float32)
+
+        # Sublinear term frequency
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class BruteForceIndex:
+    """Exact cosine search via a single matrix-vector product
+
+    Vectors are appended to a raw float32 file and metadata to JSON Lines,
+    so inserts never rewrite the index. The vector file is memory-mapped
+    rather than copied, so server processes share it through the page
+    cache; entries appended by other processes are picked up on the next
+    access. Another index (IVF/HNSW) only needs the same add/search/clear
+    methods.
+    """
+
+    def __init__(self, directory: Path, dim: int):
+        self.directory = directory
+        self.dim = dim
+        # File names carry the dimension: vectors of another SIMILARITY_DIM can't be compared
+        self.vectors_path = directory / f"vectors-{dim}.f32"
+        self.meta_path = directory / f"meta-{dim}.jsonl"
+        self._matrix = None  # type: Optional[np.memmap]
+        self._meta = []  # type: List[Dict]
+        # KINDS codes of the entries, grown with the metadata
+        self._kinds = None  # type: Optional[np.ndarray]
+        self._size = 0
+        # Metadata file read so far: inode and byte offset
+        self._meta_inode = None  # type: Optional[int]
+        self._meta_offset = 0
+        self._lock = threading.Lock()
+
+    def add(self, vector: np.ndarray, meta: Dict) -> None:
+        line = (json.dumps(meta, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock, locked(self.meta_path):
+            # Caught up under the file lock, so both files end where this entry starts
+            self._load()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.vectors_path, "ab") as f:
+                f.write(vector.astype(np.float32).tobytes())
+            with open(self.meta_path, "ab") as f:
+                f.write(line)
+                self._meta_inode = os.fstat(f.fileno()).st_ino
+            self._meta_offset += len(line)
+            self._append_meta([meta])
+            self._map_vectors()
+
+    def search(self, vector: np.ndarray, k: int = 5, kind: Optional[str] = None) -> List[Dict]:
+        """Top k entries by cosine similarity; entries scoring <= 0 are never returned"""
+        with self._lock:
+            self._load()
+            # The mapping and the first _size entries don't change under later appends
+            matrix, kinds, meta, size = self._matrix, self._kinds, self._meta, self._size
+        if size == 0 or k < 1:
+            return []
+        if kind is not None and kind not in KIND_CODES:
+            return []
+
+        scores = np.asarray(matrix @ vector)
+        if kind is not None:
+            scores = np.where(kinds[:size] == KIND_CODES[kind], scores, -np.inf)
+
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(meta[i], score=round(float(scores[i]), 4)) for i in top if scores[i] > 0]
+
+    def count(self) -> int:
+        with self._lock:
+            self._load()
+            return self._size
+
+    def nbytes(self) -> int:
+        """Size of the vector file, the data a search scans"""
+        stamp = file_stamp(self.vectors_path)
+        return stamp[1] if stamp is not None else 0
+
+    def clear(self) -> None:
+        with self._lock, locked(self.meta_path):
+            # Unmap first: Windows refuses to delete a mapped file
+            self._reset(None)
+            for path in (self.vectors_path, self.meta_path):
+                if path.exists():
+                    path.unlink()
+
+    def _load(self) -> None:
+        """Read entries appended since the last access, by any process (caller holds the lock)
+
+        Missing or replaced files (cleared by another process) start over.
+        """
+        stamp = file_stamp(self.meta_path)
+        inode = stamp[0] if stamp is not None else None
+        if self._kinds is None or inode != self._meta_inode or (stamp is not None and stamp[1] < self._meta_offset):
+            self._reset(inode)
+        if stamp is not None and stamp[1] > self._meta_offset:
+            with open(self.meta_path, "rb") as f:
+                f.seek(self._meta_offset)
+                data = f.read(stamp[1] - self._meta_offset)
+            # A line another process is still writing is read next time
+            end = data.rfind(b"\n") + 1
+            self._append_meta([json.loads(line.decode("utf-8")) for line in data[:end].splitlines() if line.strip()])
+            self._meta_offset += end
+        self._map_vectors()
+
+    def _append_meta(self, entries: List[Dict]) -> None:
+        count = len(self._meta)
+        needed = count + len(entries)
+        if needed > len(self._kinds):
+            self._kinds = np.resize(self._kinds, max(16, needed, len(self._kinds) * 2))
+        self._kinds[count:needed] = [KIND_CODES.get(entry.get("kind"), 0) for entry in entries]
+        self._meta.extend(entries)
+
+    def _map_vectors(self) -> None:
+        """Map the vectors that have metadata (a partially written tail is left out)"""
+        stamp = file_stamp(self.vectors_path)
+        rows = min(len(self._meta), stamp[1] // (self.dim * 4)) if stamp is not None else 0
+        if rows == self._size:
+            return
+        # The file is only appended to, so a longer mapping replaces the old one
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                 shape=(rows, self.dim)) if rows else None
+        self._size = rows
+
+    def _reset(self, inode: Optional[int]) -> None:
+        self._matrix = None
+        self._meta = []
+        self._kinds = np.zeros(0, dtype=np.uint8)
+        self._size = 0
+        self._meta_inode = inode
+        self._meta_offset = 0
+
+
+class SimilarityService:
+    """Indexes analyzed texts and style analyses, finds similar competitors"""
+
+    def __init__(self):
+        self.vectorizer = HashingVectorizer(settings.similarity_dim)
+        self.index = BruteForceIndex(Path(settings.data_dir) / "similarity", settings.similarity_dim)
+
+    def index_analysis(self, record_id: str, text: str, style_analysis: str = "",
+                       competitor_name: Optional[str] = None) -> None:
+        """Add competitor text (and its style analysis, if any) to the index"""
+        meta = {"record_id": record_id, "competitor_name": competitor_name}
+        self.index.add(self.vectorizer.transform(text), dict(meta, kind="text", snippet=text[:200]))
+        if style_analysis:
+            self.index.add(
+                self.vectorizer.transform(style_analysis),
+                dict(meta, kind="style", snippet=style_analysis[:200])
+            )
+
+    async def search(self, text: str, k: int = 5, kind: Optional[str] = None) -> List[Dict]:
+        """Search in the executor: the product scans every stored vector"""
+        return await executor_service.run(search_index, text, k, kind, size=self.index.nbytes())
+
+    async def find_duplicate(self, text: str, threshold: Optional[float] = None) -> Optional[Dict]:
+        """Closest previously analyzed text if it is a near-duplicate"""
+        if threshold is None:
+            threshold = settings.similarity_duplicate_threshold
+        matches = await self.search(text, k=1, kind="text")
+        if matches and matches[0]["score"] >= threshold:
+            return matches[0]
+        return None
+
+    def clear(self) -> None:
+        self.index.clear()
+
+
+def search_index(text: str, k: int, kind: Optional[str]) -> List[Dict]:
+    """Search the shared index (module-level so process pools can pickle it; a worker maps the files itself)"""
+    return similarity_service.index.search(similarity_service.vectorizer.transform(text), k=k, kind=kind)
+
+
+# Global instance
+similarity_service = SimilarityService()
@@ -0,0 +1,128 @@
+"""
+Fast and selective JSON parsing of upstream API responses
+"""
+import json
+from typing import Any, Dict, List
+from ..config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+DETECTION = "results.item.results.item"
+PAGE = DETECTION + ".textDetection.pages.item"
+BLOCK = PAGE + ".blocks.item"
+LINE = BLOCK + ".lines.item"
+WORD = LINE + ".words.item"
+PROPERTY = DETECTION + ".classification.properties.item"
+
+_NEW_PAGE, _NEW_BLOCK, _NEW_LINE, _NEW_WORD, _NEW_BLOCK_VERTEX, _NEW_LINE_VERTEX, _NEW_PROPERTY = range(7)
+_WORD_TEXT, _WORD_CONFIDENCE, _VERTEX_X, _VERTEX_Y, _PROPERTY_NAME, _PROPERTY_PROBABILITY = range(7, 13)
+
+# (prefix, event) pairs the streaming parser reacts to; every other event is skipped
+_ACTIONS = {
+    (PAGE, "start_map"): _NEW_PAGE,
+    (BLOCK, "start_map"): _NEW_BLOCK,
+    (LINE, "start_map"): _NEW_LINE,
+    (WORD, "start_map"): _NEW_WORD,
+    (BLOCK + ".boundingBox.vertices.item", "start_map"): _NEW_BLOCK_VERTEX,
+    (LINE + ".boundingBox.vertices.item", "start_map"): _NEW_LINE_VERTEX,
+    (PROPERTY, "start_map"): _NEW_PROPERTY,
+    (WORD + ".text", "string"): _WORD_TEXT,
+    (WORD + ".confidence", "number"): _WORD_CONFIDENCE,
+    (PROPERTY + ".name", "string"): _PROPERTY_NAME,
+    (PROPERTY + ".probability", "number"): _PROPERTY_PROBABILITY,
+}
+for _owner in (BLOCK, LINE):
+    for _event in ("string", "number"):
+        _ACTIONS[(_owner + ".boundingBox.vertices.item.x", _event)] = _VERTEX_X
+        _ACTIONS[(_owner + ".boundingBox.vertices.item.y", _event)] = _VERTEX_Y
+
+
+def loads(raw: bytes) -> Any:
+    """Parse a JSON body straight from bytes: orjson when installed, stdlib json otherwise"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _stream_vision_response(raw: bytes) -> Dict[str, Any]:
+    """Build a slim response from parser events: block/line boxes, word text and confidence, labels"""
+    pages = []  # type: List[Dict[str, Any]]
+    properties = []  # type: List[Dict[str, Any]]
+    block = line = word = vertex = prop = None
+    action_for = _ACTIONS.get
+
+    for prefix, event, value in ijson.parse(raw):
+        action = action_for((prefix, event))
+        if action is None:
+            continue
+        if action == _WORD_TEXT:
+            word["text"] = value
+        elif action == _WORD_CONFIDENCE:
+            word["confidence"] = float(value)
+        elif action == _VERTEX_X:
+            vertex["x"] = value
+        elif action == _VERTEX_Y:
+            vertex["y"] = value
+        elif action == _NEW_WORD:
+            word = {"text": "", "confidence": 1.0}
+            line["words"].append(word)
+        elif action == _NEW_LINE_VERTEX:
+            vertex = {}
+            line["boundingBox"]["vertices"].append(vertex)
+        elif action == _NEW_LINE:
+            line = {"boundingBox": {"vertices": []}, "words": []}
+            block["lines"].append(line)
+        elif action == _NEW_BLOCK_VERTEX:
+            vertex = {}
+            block["boundingBox"]["vertices"].append(vertex)
+        elif action == _NEW_BLOCK:
+            block = {"boundingBox": {"vertices": []}, "lines": []}
+            pages[-1]["blocks"].append(block)
+        elif action == _NEW_PAGE:
+            pages.append({"blocks": []})
+        elif action == _NEW_PROPERTY:
+            prop = {"name": "", "probability": 0.0}
+            properties.append(prop)
+        elif action == _PROPERTY_NAME:
+            prop["name"] = value
+        elif action == _PROPERTY_PROBABILITY:
+            prop["probability"] = float(value)
+
+    return {"results": [{"results": [
+        {"textDetection": {"pages": pages}},
+        {"classification": {"properties": properties}}
+    ]}]}
+
+
+def parse_vision_response(raw: bytes) -> Dict[str, Any]:
+    """Parse a Vision batchAnalyze body for text extraction and labels
+
+    Bodies of at least VISION_STREAM_PARSE_MIN_BYTES go through ijson when it
+    is installed: word boxes, languages and other unused parts never become
+    Python objects, which caps peak memory on dense screenshots at the cost
+    of slower per-event parsing. Everything else is one orjson/json call.
+    """
+    threshold = settings.vision_stream_parse_min_bytes
+    if ijson is not None and threshold and len(raw) >= threshold:
+        return _stream_vision_response(raw)
+    return loads(raw)
+
+
+def classification_labels(response_data: Dict[str, Any], min_probability: float = 0.0) -> List[str]:
+    """Classification label names, most probable first"""
+    properties = []
+    for result in response_data.get("results", []):
+        for detection in result.get("results", []):
+            properties.extend((detection.get("classification") or {}).get("properties", []))
+    properties.sort(key=lambda prop: float(prop.get("probability", 0.0)), reverse=True)
+    return [prop["name"] for prop in properties
+            if prop.get("name") and float(prop.get("probability", 0.0)) >= min_probability]
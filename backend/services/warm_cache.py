@@ -0,0 +1,218 @@
+"""
+Precomputed analyses of example and known-competitor inputs, invalidated by prompt template changes
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from ..config import settings
+from ..models.schemas import DesignAnalysis
+from .analyzer_service import deepseek_analyzer, ANALYST_SYSTEM_PROMPT
+from .budget_service import current_client, budget_service, LEVEL_NORMAL
+from .model_router import model_router, SCORE_FIELDS, DETAIL_FULL
+from .priority_lanes import current_priority, PRIORITY_BACKGROUND
+from .process_sync import file_stamp, locked
+
+
+EXAMPLE_COMPETITOR = "MotionCraft Studio"
+
+# Same text as loadExampleText() in frontend/app.js and the desktop "Example" button
+EXAMPLE_TEXT = """Студия MotionCraft — лидер в создании 3D-анимации и моушн-дизайна для технологических компаний.
+
+Наши ключевые услуги:
+• Создание анимированных роликов для презентаций продуктов
+• Разработка 3D-визуализаций для SaaS-платформ
+• Производство рекламных роликов для IT-стартапов
+• Создание анимированных инфографик
+
+Технологический стек:
+- Cinema 4D + Redshift
+- After Effects + Lottie
+- Blender для 3D-моделирования
+- Figma для пре-продакшн
+
+Наш подход: глубокое погружение в продукт клиента, agile-методология работы,
+фокус на передаче сложных технических концепций через простую и красивую анимацию.
+
+Портфолио включает проекты для Yandex, Tinkoff, VK и других технологических гигантов."""
+
+
+def template_version() -> str:
+    """Hash of everything that shapes an analysis: prompts, system prompt and models"""
+    text, name = "\x00text\x00", "\x00competitor\x00"
+    probe_scores = {field: 0 for field in SCORE_FIELDS}
+    parts = [
+        ANALYST_SYSTEM_PROMPT,
+        deepseek_analyzer._build_analysis_prompt(text, name),
+        deepseek_analyzer._build_score_prompt(text, name),
+        deepseek_analyzer._build_narrative_prompt(text, name, probe_scores),
+        model_router.route("narrative").model,
+        model_router.route("score").model,
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class WarmCache:
+    """Analyses of configured inputs, computed ahead of time and served without an upstream call
+
+    Inputs are the built-in example plus the entries of
+    data/warm_inputs.json: [{"text": ..., "competitor_name": ..., "detail": ...}].
+    Texts match ignoring whitespace differences. Entries computed under a
+    different template version are dropped on load. The file is re-read
+    whenever another process saved it.
+    """
+
+    def __init__(self):
+        self.path = Path(settings.data_dir) / "warm_cache.json"
+        self.inputs_path = Path(settings.warm_cache_inputs or Path(settings.data_dir) / "warm_inputs.json")
+        self.version = template_version()
+        self._entries = None  # type: Optional[Dict[str, Dict[str, Any]]]
+        self._stamp = None
+        self._input_keys = None  # type: Optional[set]
+        self._inputs_mtime = None  # type: Optional[float]
+        self._lock = threading.Lock()
+        self._task = None
+        self.stats = {"hits": 0, "warmed": 0, "errors": 0, "invalidated": 0, "last_warm": None}
+
+    def key(self, text: str, competitor_name: Optional[str], detail: Optional[str]) -> str:
+        normalized = " ".join(text.split())
+        name = " ".join((competitor_name or "").split()).lower()
+        detail = model_router.resolve_detail(detail)
+        raw = "\n".join([self.version, detail, name, normalized])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str, competitor_name: Optional[str] = None,
+            detail: Optional[str] = None) -> Optional[DesignAnalysis]:
+        if not settings.warm_cache_enabled:
+            return None
+        entry = self._load().get(self.key(text, competitor_name, detail))
+        if entry is None:
+            return None
+        self.stats["hits"] += 1
+        return DesignAnalysis(**entry["analysis"])
+
+    def inputs(self) -> List[Dict[str, Any]]:
+        """Configured inputs to keep warm"""
+        items = [{"text": EXAMPLE_TEXT, "competitor_name": EXAMPLE_COMPETITOR, "detail": DETAIL_FULL}]
+        if self.inputs_path.exists():
+            with open(self.inputs_path, encoding="utf-8") as f:
+                items.extend(json.load(f))
+        return items
+
+    def is_warm_input(self, text: str, competitor_name: Optional[str], detail: Optional[str]) -> bool:
+        """Whether a live analysis of this input should be kept for later requests"""
+        mtime = self.inputs_path.stat().st_mtime if self.inputs_path.exists() else None
+        if self._input_keys is None or mtime != self._inputs_mtime:
+            self._input_keys = {
+                self.key(item["text"], item.get("competitor_name"), item.get("detail"))
+                for item in self.inputs()
+            }
+            self._inputs_mtime = mtime
+        return self.key(text, competitor_name, detail) in self._input_keys
+
+    def store(self, text: str, competitor_name: Optional[str], detail: Optional[str],
+              analysis: DesignAnalysis) -> None:
+        with self._lock, locked(self.path):
+            entries = self._load()
+            entries[self.key(text, competitor_name, detail)] = {
+                "competitor_name": competitor_name,
+                "detail": model_router.resolve_detail(detail),
+                "text_preview": text[:200],
+                "created_at": datetime.now().isoformat(),
+                "analysis": analysis.dict()
+            }
+            self._save()
+
+    async def warm(self, force: bool = False) -> int:
+        """Analyze configured inputs that aren't cached yet (all of them with force); returns count"""
+        current_client.set("warmup")
+        # Warmup must never delay user traffic
+        current_priority.set(PRIORITY_BACKGROUND)
+        warmed = 0
+        for item in self.inputs():
+            text, name, detail = item["text"], item.get("competitor_name"), item.get("detail")
+            if not force and self.key(text, name, detail) in self._load():
+                continue
+            if not settings.deepseek_api_key or budget_service.level() != LEVEL_NORMAL:
+                break
+            try:
+                analysis = await deepseek_analyzer.analyze_competitor_text(text, name, detail)
+            except Exception:
+                self.stats["errors"] += 1
+                continue
+            self.store(text, name, detail, analysis)
+            warmed += 1
+        self.stats["warmed"] += warmed
+        self.stats["last_warm"] = time.time()
+        return warmed
+
+    def start(self) -> None:
+        """Warm once now and then every warm_cache_interval_hours (0 = only once)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        entries = self._load()
+        return {
+            "template_version": self.version,
+            "entries": len(entries),
+            "inputs": len(self.inputs()),
+            "running": self._task is not None and not self._task.done(),
+            "stats": dict(self.stats)
+        }
+
+    def clear(self) -> None:
+        with self._lock, locked(self.path):
+            self._entries = {}
+            if self.path.exists():
+                self.path.unlink()
+            self._stamp = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.warm()
+            except Exception:
+                self.stats["errors"] += 1
+            if settings.warm_cache_interval_hours <= 0:
+                return
+            await asyncio.sleep(settings.warm_cache_interval_hours * 3600)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        stamp = file_stamp(self.path)
+        if self._entries is None or stamp != self._stamp:
+            self._entries = {}
+            self._stamp = stamp
+            if stamp is not None:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("template_version") == self.version:
+                    self._entries = data.get("entries", {})
+                else:
+                    self.stats["invalidated"] += len(data.get("entries", {}))
+        return self._entries
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"template_version": self.version, "entries": self._entries}, f, ensure_ascii=False)
+        tmp_path.replace(self.path)
+        self._stamp = file_stamp(self.path)
+
+
+# Global instance
+warm_cache = WarmCache()
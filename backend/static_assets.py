@@ -0,0 +1,78 @@
+"""
+Content-hashed frontend assets: versioned URLs cached for a year, index.html always revalidated
+"""
+import hashlib
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from fastapi.staticfiles import StaticFiles
+from .config import settings
+
+# Local src/href references in index.html, e.g. href="styles.css"
+_ASSET_REF = re.compile(r'(src|href)="(?!https?:|//|/|#|data:)([^"?#]+)"')
+
+
+class HashedAssets:
+    """Rewrites index.html to point at <root_path>/static/<file>?v=<content hash>
+
+    Hashes are recomputed only when a file's mtime changes, so a deploy
+    that replaces frontend/ files changes the URLs without a restart.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        # name -> (mtime, content hash)
+        self._hashes = {}
+        self._index = None  # type: Optional[Tuple[Tuple, bytes, str]]
+
+    def version(self, name: str) -> Optional[str]:
+        path = self.directory / name
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return None
+        cached = self._hashes.get(name)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, hashlib.sha256(path.read_bytes()).hexdigest()[:12])
+            self._hashes[name] = cached
+        return cached[1]
+
+    def index(self, prefix: str = "") -> Tuple[bytes, str]:
+        """Rendered index.html and its ETag; prefix is the app's mount path (root_path)"""
+        source = self.directory / "index.html"
+        html = source.read_text(encoding="utf-8")
+        names = sorted(set(name for _, name in _ASSET_REF.findall(html)))
+        state = (prefix, source.stat().st_mtime) + tuple(self.version(name) for name in names)
+        if self._index is None or self._index[0] != state:
+            body = _ASSET_REF.sub(lambda match: self._versioned(match, prefix), html).encode("utf-8")
+            self._index = (state, body, '"%s"' % hashlib.sha256(body).hexdigest()[:16])
+        return self._index[1], self._index[2]
+
+    def index_response(self, request: Request) -> Response:
+        body, etag = self.index(request.scope.get("root_path", ""))
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(body, headers=headers)
+
+    def _versioned(self, match, prefix: str) -> str:
+        attribute, name = match.group(1), match.group(2)
+        version = self.version(name)
+        if version is None:
+            return match.group(0)
+        return f'{attribute}="{prefix}/static/{name}?v={version}"'
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for ?v= (content-hashed) URLs"""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            if b"v=" in scope.get("query_string", b""):
+                response.headers["Cache-Control"] = f"public, max-age={settings.static_max_age}, immutable"
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,215 @@
+"""
+ASGI to WSGI bridge for Phusion Passenger (Python 3.6 compatible)
+"""
+import asyncio
+import atexit
+import contextvars
+import queue
+import sys
+import threading
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterator
+
+# Body chunks read from wsgi.input per ASGI receive() message
+READ_CHUNK = 65536
+_END = object()
+
+
+class _LifespanFailed(RuntimeError):
+    pass
+
+
+class _ContextTask(asyncio.Task):
+    """Task running every step in its own copy of the creator's context
+
+    Python 3.6 has no contextvars in asyncio: the backport keeps one context
+    per thread, so request-scoped variables (client, usage, priority, stage
+    timings) would leak between the requests sharing the bridge's loop.
+    """
+
+    def __init__(self, coro, *, loop=None):
+        self._context = contextvars.copy_context()
+        super().__init__(coro, loop=loop)
+
+    def _step(self, exc=None):
+        self._context.run(super()._step, exc)
+
+
+class AsgiToWsgi:
+    """Serves an ASGI app from WSGI worker threads through one background event loop
+
+    Each Passenger process runs a single asyncio loop in a daemon thread;
+    WSGI threads hand requests to it and block only for their own
+    request. Because the loop outlives the request, background tasks (such
+    as submit/poll jobs) keep running after the submit response is sent.
+    Startup and shutdown events run through the ASGI lifespan protocol.
+    """
+
+    def __init__(self, app: Callable, request_timeout: float = 300.0, startup_timeout: float = 60.0):
+        self.app = app
+        self.request_timeout = request_timeout
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="asgi-loop", daemon=True)
+        self._thread.start()
+        self._shutdown = None
+        self._lifespan_done = None
+        asyncio.run_coroutine_threadsafe(self._startup(), self.loop).result(startup_timeout)
+        atexit.register(self.close)
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Iterator[bytes]:
+        messages = queue.Queue()  # type: queue.Queue
+        future = asyncio.run_coroutine_threadsafe(
+            self._handle(self._scope(environ), environ, messages), self.loop
+        )
+        message = messages.get(timeout=self.request_timeout)
+        if message is _END:
+            # The app finished (or crashed) without starting a response
+            future.result()
+            start_response("500 Internal Server Error", [("Content-Type", "text/plain")])
+            return [b"Internal Server Error"]
+        status = message["status"]
+        headers = [(name.decode("latin-1"), value.decode("latin-1")) for name, value in message.get("headers", [])]
+        start_response(f"{status} {_reason(status)}", headers)
+        return self._body(messages, future)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Run shutdown handlers and stop the loop"""
+        if not self.loop.is_running():
+            return
+        if self._shutdown is not None and not self._shutdown.done():
+            self.loop.call_soon_threadsafe(self._shutdown.set_result, None)
+            try:
+                asyncio.run_coroutine_threadsafe(self._wait_lifespan(), self.loop).result(timeout)
+            except Exception:
+                pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        if sys.version_info < (3, 7):
+            self.loop.set_task_factory(lambda loop, coro: _ContextTask(coro, loop=loop))
+        self.loop.run_forever()
+
+    def _body(self, messages: queue.Queue, future) -> Iterator[bytes]:
+        """Streams body chunks as the app sends them (StreamingResponse stays incremental)"""
+        try:
+            while True:
+                message = messages.get(timeout=self.request_timeout)
+                if message is _END:
+                    break
+                if message:
+                    yield message
+        finally:
+            if not future.done():
+                # Client went away: stop the app side of the request
+                self.loop.call_soon_threadsafe(future.cancel)
+
+    async def _handle(self, scope: Dict[str, Any], environ: Dict[str, Any], messages: queue.Queue) -> None:
+        loop = self.loop
+        body = environ["wsgi.input"]
+        # Never read past Content-Length: some servers' input streams block there
+        remaining = int(environ.get("CONTENT_LENGTH") or 0)
+        more_body = True
+        disconnect = loop.create_future()
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal more_body, remaining
+            if not more_body:
+                # Nothing more to read; a request only "disconnects" once the response is done
+                await disconnect
+                return {"type": "http.disconnect"}
+            chunk = b""
+            if remaining > 0:
+                chunk = await loop.run_in_executor(None, body.read, min(READ_CHUNK, remaining))
+                remaining -= len(chunk)
+            more_body = remaining > 0 and bool(chunk)
+            return {"type": "http.request", "body": chunk, "more_body": more_body}
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                messages.put(message)
+            elif message["type"] == "http.response.body":
+                messages.put(message.get("body", b""))
+                if not message.get("more_body", False):
+                    messages.put(_END)
+                    if not disconnect.done():
+                        disconnect.set_result(None)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            messages.put(_END)
+            if not disconnect.done():
+                disconnect.set_result(None)
+
+    def _scope(self, environ: Dict[str, Any]) -> Dict[str, Any]:
+        headers = []
+        for key, value in environ.items():
+            if key.startswith("HTTP_"):
+                name = key[5:].replace("_", "-").lower()
+            elif key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                if not value:
+                    continue
+                name = key.replace("_", "-").lower()
+            else:
+                continue
+            headers.append((name.encode("latin-1"), value.encode("latin-1")))
+
+        server = (environ.get("SERVER_NAME", "localhost"), int(environ.get("SERVER_PORT") or 80))
+        client = (environ.get("REMOTE_ADDR", ""), int(environ.get("REMOTE_PORT") or 0))
+        # PEP 3333 strings are latin-1 decoded bytes
+        path = environ.get("PATH_INFO", "") or "/"
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.1"},
+            "http_version": environ.get("SERVER_PROTOCOL", "HTTP/1.1").split("/")[-1],
+            "method": environ["REQUEST_METHOD"].upper(),
+            "scheme": environ.get("wsgi.url_scheme", "http"),
+            "path": path.encode("latin-1").decode("utf-8", "replace"),
+            "raw_path": path.encode("latin-1"),
+            "query_string": environ.get("QUERY_STRING", "").encode("latin-1"),
+            "root_path": environ.get("SCRIPT_NAME", ""),
+            "headers": headers,
+            "server": server,
+            "client": client,
+        }
+
+    async def _startup(self) -> None:
+        self._shutdown = self.loop.create_future()
+        started = self.loop.create_future()
+        events = [{"type": "lifespan.startup"}]
+
+        async def receive() -> Dict[str, Any]:
+            if events:
+                return events.pop()
+            await self._shutdown
+            return {"type": "lifespan.shutdown"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "lifespan.startup.complete" and not started.done():
+                started.set_result(None)
+            elif message["type"] == "lifespan.startup.failed" and not started.done():
+                started.set_exception(_LifespanFailed(message.get("message", "")))
+
+        async def lifespan() -> None:
+            try:
+                await self.app({"type": "lifespan", "asgi": {"version": "3.0"}}, receive, send)
+            finally:
+                # Apps without lifespan support just return or raise
+                if not started.done():
+                    started.set_result(None)
+
+        self._lifespan_done = asyncio.ensure_future(lifespan())
+        await started
+
+    async def _wait_lifespan(self) -> None:
+        if self._lifespan_done is not None:
+            await asyncio.wait([self._lifespan_done])
+
+
+def _reason(status: int) -> str:
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ""
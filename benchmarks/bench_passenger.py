@@ -0,0 +1,217 @@
+"""
+Benchmark: shared-hosting deployment, PHP proxy hop vs Passenger WSGI bridge with submit/poll jobs
+
+Both modes get the same number of hosting workers. In the proxy mode every
+analysis holds a worker (PHP child) for its full duration while proxy.php
+forwards it to uvicorn; in the Passenger mode workers only handle the short
+submit and poll requests. DeepSeek is replaced by a local stand-in that
+answers after UPSTREAM_SECONDS. The Passenger mode is modelled as a single
+process (one bridge, WORKERS threads); real Passenger may start several
+processes sharing data/.
+
+Usage: python benchmarks/bench_passenger.py [users] [workers] [upstream_seconds]
+"""
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+WORKERS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+UPSTREAM_SECONDS = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+POLL_SECONDS = 0.25
+SMALL_REQUESTS = 200
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+UPSTREAM_PORT = free_port()
+APP_PORT = free_port()
+
+# Isolated settings: fresh data dir, stand-in upstream, no shortcuts that would skip the upstream call
+os.environ.update({
+    "DATA_DIR": tempfile.mkdtemp(prefix="bench_passenger_"),
+    "DEEPSEEK_API_KEY": "bench",
+    "DEEPSEEK_API_URL": f"http://127.0.0.1:{UPSTREAM_PORT}/v1/chat/completions",
+    "COALESCE_ENABLED": "false",
+    "SIMILARITY_SHORT_CIRCUIT": "false",
+    "WARM_CACHE_ON_STARTUP": "false",
+    "EXECUTOR_KIND": "inline",
+    "DEEPSEEK_CONCURRENCY": "256",
+    "LOOP_LAG_INTERVAL": "0",
+})
+
+import asyncio  # noqa: E402
+import uvicorn  # noqa: E402
+from backend.main import app  # noqa: E402
+from backend.wsgi_bridge import AsgiToWsgi  # noqa: E402
+
+ANALYSIS = {
+    "design_score": 7, "animation_potential": 8, "innovation_score": 6,
+    "technical_execution": 7, "client_focus": 8,
+    "strengths": ["Сильный 3D"], "weaknesses": ["Мало кейсов"],
+    "style_analysis": "Минимализм", "improvement_recommendations": ["Больше кейсов"],
+    "summary": "Крепкая студия"
+}
+COMPLETION = json.dumps({
+    "choices": [{"message": {"content": json.dumps(ANALYSIS, ensure_ascii=False)}}],
+    "usage": {"prompt_tokens": 900, "completion_tokens": 400, "total_tokens": 1300}
+}).encode("utf-8")
+
+
+class Upstream:
+    """Stand-in DeepSeek: fixed answer after UPSTREAM_SECONDS, tracks concurrent calls"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        more_body = True
+        while more_body:
+            more_body = (await receive()).get("more_body", False)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(UPSTREAM_SECONDS)
+        self.active -= 1
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": COMPLETION})
+
+
+def serve(asgi_app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(asgi_app, host="127.0.0.1", port=port,
+                                           log_level="error", lifespan="auto"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def text_for(user: int) -> str:
+    return f"Студия №{user} делает 3D-анимацию и моушн-дизайн для финтеха, кейс {user * 7919}. " * 5
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[int(share * (len(ordered) - 1))]
+
+
+def report(name, started, latencies, response_bytes, upstream):
+    print(f"{name:<22} all {len(latencies)} done in {time.monotonic() - started:6.2f} s  "
+          f"p50 {percentile(latencies, 0.5):6.2f} s  p95 {percentile(latencies, 0.95):6.2f} s  "
+          f"peak concurrent analyses {upstream.peak:3}  "
+          f"mean response {sum(response_bytes) / len(response_bytes):6.0f} B over {len(response_bytes)} responses")
+
+
+def run_proxy(upstream: Upstream) -> float:
+    """proxy.php: each PHP worker blocks on a curl call to uvicorn for the whole analysis"""
+    server = serve(app, APP_PORT)
+    base = f"http://127.0.0.1:{APP_PORT}"
+
+    def forward(path: str, body: bytes = None) -> bytes:
+        request = urllib.request.Request(base + path, data=body,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=600) as response:
+            return response.read()
+
+    upstream.peak = 0
+    latencies, sizes = [], []
+    started = time.monotonic()
+    with ThreadPoolExecutor(WORKERS) as php_workers:
+        def user(index):
+            submitted = time.monotonic()
+            body = json.dumps({"text": text_for(index), "detail": "full"}).encode("utf-8")
+            data = php_workers.submit(forward, "/analyze_text", body).result()
+            assert json.loads(data)["success"], data
+            sizes.append(len(data))
+            latencies.append(time.monotonic() - submitted)
+
+        with ThreadPoolExecutor(USERS) as clients:
+            list(clients.map(user, range(USERS)))
+        report("proxy.php hop", started, latencies, sizes, upstream)
+
+        small_started = time.monotonic()
+        for _ in range(SMALL_REQUESTS):
+            php_workers.submit(forward, "/health").result()
+        small = (time.monotonic() - small_started) / SMALL_REQUESTS
+    server.should_exit = True
+    time.sleep(0.5)
+    return small
+
+
+def run_passenger(upstream: Upstream) -> float:
+    """passenger_wsgi.py: workers only handle the short submit and poll requests"""
+    application = AsgiToWsgi(app)
+
+    def call(method: str, path: str, body: bytes = b"") -> bytes:
+        environ = {
+            "REQUEST_METHOD": method, "SCRIPT_NAME": "/pem08", "PATH_INFO": path,
+            "QUERY_STRING": "", "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body)),
+            "CONTENT_TYPE": "application/json",
+        }
+        status = []
+        chunks = application(environ, lambda line, headers: status.append(line))
+        data = b"".join(chunks)
+        assert status[0].startswith("2"), (status, data)
+        return data
+
+    upstream.peak = 0
+    latencies, sizes = [], []
+    started = time.monotonic()
+    with ThreadPoolExecutor(WORKERS) as passenger_workers:
+        def user(index):
+            submitted = time.monotonic()
+            body = json.dumps({"text": text_for(index), "detail": "full"}).encode("utf-8")
+            data = passenger_workers.submit(call, "POST", "/jobs/analyze_text", body).result()
+            sizes.append(len(data))
+            job = json.loads(data)
+            while job["status"] in ("queued", "running"):
+                time.sleep(POLL_SECONDS)
+                data = passenger_workers.submit(call, "GET", f"/jobs/{job['job_id']}").result()
+                sizes.append(len(data))
+                job = json.loads(data)
+            assert job["result"]["success"], job
+            latencies.append(time.monotonic() - submitted)
+
+        with ThreadPoolExecutor(USERS) as clients:
+            list(clients.map(user, range(USERS)))
+        report("passenger submit/poll", started, latencies, sizes, upstream)
+
+        small_started = time.monotonic()
+        for _ in range(SMALL_REQUESTS):
+            passenger_workers.submit(call, "GET", "/health").result()
+        small = (time.monotonic() - small_started) / SMALL_REQUESTS
+    application.close()
+    return small
+
+
+def main():
+    upstream = Upstream()
+    serve(upstream, UPSTREAM_PORT)
+    print(f"{USERS} users, {WORKERS} hosting workers, upstream {UPSTREAM_SECONDS:.1f} s per analysis")
+    proxy_small = run_proxy(upstream)
+    passenger_small = run_passenger(upstream)
+    print(f"GET /health per request: proxy hop {proxy_small * 1000:.2f} ms, "
+          f"passenger bridge {passenger_small * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark: interactive latency during a bulk run, priority lanes vs a plain semaphore
+
+Also measures short interactive texts going through the coalescer while it
+is flooded with batch items, with one coalescer semaphore shared by all
+priorities vs one per priority.
+
+Usage: python benchmarks/bench_priority_lanes.py [bulk_calls] [coalesced_batch_items]
+"""
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.services.batching_service import TextCoalescer  # noqa: E402
+from backend.services.priority_lanes import (  # noqa: E402
+    PriorityLanes, PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND, current_priority
+)
+
+CAPACITY = 8
+UPSTREAM_SECONDS = 0.05
+INTERACTIVE_EVERY = 0.025
+
+
+async def upstream() -> None:
+    """Stand-in for a DeepSeek call"""
+    await asyncio.sleep(UPSTREAM_SECONDS * random.uniform(0.8, 1.2))
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[int(share * (len(ordered) - 1))] * 1000
+
+
+async def run(name, slot, bulk_calls):
+    random.seed(7)
+    latencies = {PRIORITY_INTERACTIVE: [], PRIORITY_BATCH: [], PRIORITY_BACKGROUND: []}
+
+    async def call(priority):
+        started = time.monotonic()
+        async with slot(priority):
+            await upstream()
+        latencies[priority].append(time.monotonic() - started)
+
+    bulk = [asyncio.ensure_future(call(PRIORITY_BATCH if i % 4 else PRIORITY_BACKGROUND))
+            for i in range(bulk_calls)]
+    started = time.monotonic()
+    interactive = []
+    while not all(task.done() for task in bulk):
+        interactive.append(asyncio.ensure_future(call(PRIORITY_INTERACTIVE)))
+        await asyncio.sleep(INTERACTIVE_EVERY)
+    await asyncio.gather(*bulk, *interactive)
+    elapsed = time.monotonic() - started
+
+    print(f"{name:<16} bulk done in {elapsed:5.2f} s")
+    for priority, values in latencies.items():
+        print(f"  {priority:<12} n={len(values):4}  p50 {percentile(values, 0.5):7.1f} ms  "
+              f"p95 {percentile(values, 0.95):7.1f} ms")
+
+
+SCORES = {"design_score": 5, "animation_potential": 5, "innovation_score": 5,
+          "technical_execution": 5, "client_focus": 5}
+
+
+class LaneAnalyzer:
+    """Stand-in analyzer: every upstream call takes a lane slot of the caller's priority"""
+
+    def __init__(self, lanes: PriorityLanes):
+        self.lanes = lanes
+
+    async def score_batch(self, items, deterministic=False):
+        async with self.lanes.slot(current_priority.get()):
+            await upstream()
+        return [dict(SCORES) for _ in items]
+
+    async def score(self, text, competitor_name=None, deterministic=False):
+        return (await self.score_batch([(text, competitor_name)], deterministic))[0]
+
+    async def complete_from_scores(self, text, competitor_name, scores, detail):
+        return scores
+
+
+class SharedSemaphoreCoalescer(TextCoalescer):
+    """Previous behaviour: one coalescer semaphore for every priority"""
+
+    def _semaphore_for(self, priority):
+        return super()._semaphore_for("shared")
+
+
+async def run_coalesced(name, coalescer, batch_items):
+    random.seed(7)
+    latencies = []
+
+    async def call(priority, index):
+        current_priority.set(priority)
+        started = time.monotonic()
+        await coalescer.analyze(f"Студия {index}: моушн-дизайн", detail="scores")
+        if priority == PRIORITY_INTERACTIVE:
+            latencies.append(time.monotonic() - started)
+
+    bulk = [asyncio.ensure_future(call(PRIORITY_BATCH, i)) for i in range(batch_items)]
+    await asyncio.sleep(0)
+    interactive = []
+    for i in range(10):
+        interactive.append(asyncio.ensure_future(call(PRIORITY_INTERACTIVE, i)))
+        await asyncio.sleep(INTERACTIVE_EVERY)
+    await asyncio.gather(*bulk, *interactive)
+    print(f"{name:<28} interactive short texts n={len(latencies)}  "
+          f"p50 {percentile(latencies, 0.5):7.1f} ms  max {max(latencies) * 1000:7.1f} ms")
+
+
+def main():
+    bulk_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    batch_items = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    loop = asyncio.get_event_loop()
+
+    semaphore = asyncio.Semaphore(CAPACITY)
+    loop.run_until_complete(run("semaphore", lambda priority: semaphore, bulk_calls))
+
+    lanes = PriorityLanes("bench", CAPACITY)
+    loop.run_until_complete(run("priority lanes", lanes.slot, bulk_calls))
+    print(lanes.status())
+
+    print(f"coalescer flooded with {batch_items} batch items")
+    for name, coalescer_class in (("shared coalescer semaphore", SharedSemaphoreCoalescer),
+                                  ("per-priority semaphores", TextCoalescer)):
+        analyzer = LaneAnalyzer(PriorityLanes("bench", CAPACITY))
+        loop.run_until_complete(run_coalesced(name, coalescer_class(analyzer), batch_items))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: parsing Vision batchAnalyze bodies (stdlib json, orjson, ijson streaming)
+
+Usage: python benchmarks/bench_upstream_json.py [blocks]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_ocr_layout import make_response  # noqa: E402
+from backend.services import upstream_json  # noqa: E402
+from backend.services.ocr_layout import extract_layout_text  # noqa: E402
+
+
+def bench(name, func, raw, expected):
+    started = time.perf_counter()
+    data = func(raw)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    same = "ok" if extract_layout_text(data) == expected else "MISMATCH"
+    print(f"{name:<16} {elapsed * 1000:9.1f} ms   peak {peak / 1e6:7.1f} MB   {same}")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000]
+    for blocks in sizes:
+        response = make_response(blocks)
+        response["results"][0]["results"].append(
+            {"classification": {"properties": [{"name": "text", "probability": 0.93}]}}
+        )
+        raw = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        expected = extract_layout_text(json.loads(raw))
+
+        print("=" * 60)
+        print(f"{blocks} blocks, {len(raw) / 1e6:.1f} MB body")
+        print("=" * 60)
+        bench("json.loads(str)", lambda body: json.loads(body.decode("utf-8")), raw, expected)
+        if upstream_json.orjson is not None:
+            bench("orjson", upstream_json.loads, raw, expected)
+        if upstream_json.ijson is not None:
+            bench("ijson stream", upstream_json._stream_vision_response, raw, expected)
+
+
+if __name__ == "__main__":
+    main()
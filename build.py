@@ -31,8 +31,10 @@ def build_executable():
         '--hidden-import=pydantic',
         '--hidden-import=backend',
         '--hidden-import=backend.config',
+        '--hidden-import=backend.responses',
         '--hidden-import=backend.services',
         '--hidden-import=backend.services.analyzer_service',
+        '--hidden-import=backend.services.model_router',
         '--hidden-import=backend.models',
         '--hidden-import=backend.models.schemas',
         
@@ -4,6 +4,7 @@ PyQt6 GUI for competitor analysis
 """
 import sys
 import os
+import multiprocessing
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -19,6 +20,11 @@ from typing import Optional
 # Import backend services
 from backend.config import settings
 from backend.services.analyzer_service import deepseek_analyzer, yandex_vision_analyzer
+from backend.services.budget_service import budget_service, LEVEL_NORMAL
+from backend.services.warm_cache import warm_cache, EXAMPLE_TEXT, EXAMPLE_COMPETITOR
+from backend.services.export_service import export_service
+from backend.services.history_store import history_store
+from backend.services.similarity_service import similarity_service
 
 
 class AnalysisWorker(QThread):
@@ -35,15 +41,39 @@ class AnalysisWorker(QThread):
         """Run analysis in background thread"""
         try:
             if self.analysis_type == "text":
+                cached = warm_cache.get(self.data['text'], self.data.get('name'), "full")
+                if cached is not None:
+                    self.finished.emit(cached.dict())
+                    return
+                # Results shortened by budget degradation are not kept warm (as in /analyze_text)
+                level = budget_service.level()
+                
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 result = loop.run_until_complete(
                     deepseek_analyzer.analyze_competitor_text(
                         text=self.data['text'],
-                        competitor_name=self.data.get('name')
+                        competitor_name=self.data.get('name'),
+                        detail="full"
                     )
                 )
                 loop.close()
+                # Same history as the server's /analyze_text, so Export includes desktop analyses
+                record = history_store.add(
+                    request_type="text_analysis",
+                    analysis=result.dict(),
+                    competitor_name=self.data.get('name'),
+                    request_summary=self.data['text'][:200],
+                    response_summary=result.summary or ""
+                )
+                similarity_service.index_analysis(
+                    record.id,
+                    self.data['text'],
+                    style_analysis=result.style_analysis,
+                    competitor_name=self.data.get('name')
+                )
+                if level == LEVEL_NORMAL and warm_cache.is_warm_input(self.data['text'], self.data.get('name'), "full"):
+                    warm_cache.store(self.data['text'], self.data.get('name'), "full", result)
                 self.finished.emit(result.dict())
             
             elif self.analysis_type == "image":
@@ -55,12 +85,38 @@ class AnalysisWorker(QThread):
                     )
                 )
                 loop.close()
+                history_store.add(
+                    request_type="image_analysis",
+                    analysis=result.dict(),
+                    request_summary=self.data.get('filename') or "image",
+                    response_summary=result.description[:200]
+                )
                 self.finished.emit(result.dict())
         
         except Exception as e:
             self.error.emit(str(e))
 
 
+class ExportWorker(QThread):
+    """Worker thread writing the history export chunk by chunk"""
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    
+    def __init__(self, file_path: str, fmt: str):
+        super().__init__()
+        self.file_path = file_path
+        self.fmt = fmt
+    
+    def run(self):
+        try:
+            with open(self.file_path, "wb") as f:
+                for chunk in export_service.stream(self.fmt):
+                    f.write(chunk)
+            self.finished.emit(self.file_path)
+        except Exception as e:
+            self.error.emit(str(e))
+
+
 class CompetitionMonitor(QMainWindow):
     """Main application window"""
     
@@ -150,6 +206,10 @@ class CompetitionMonitor(QMainWindow):
         clear_btn.clicked.connect(self.clear_text)
         btn_layout.addWidget(clear_btn)
         
+        export_btn = QPushButton("💾 Export")
+        export_btn.clicked.connect(self.export_history)
+        btn_layout.addWidget(export_btn)
+        
         layout.addLayout(btn_layout)
         
         # Progress bar
@@ -314,7 +374,7 @@ Required variables:
         self.image_results.clear()
         
         # Start worker
-        data = {'image_base64': image_base64}
+        data = {'image_base64': image_base64, 'filename': os.path.basename(self.current_image_path)}
         self.worker = AnalysisWorker("image", data)
         self.worker.finished.connect(self.on_image_analysis_complete)
         self.worker.error.connect(self.on_analysis_error)
@@ -413,27 +473,10 @@ Required variables:
     
     def load_example(self):
         """Load example text"""
-        example = """Студия MotionCraft — лидер в создании 3D-анимации и моушн-дизайна для технологических компаний.
-
-Наши ключевые услуги:
-• Создание анимированных роликов для презентаций продуктов
-• Разработка 3D-визуализаций для SaaS-платформ
-• Производство рекламных роликов для IT-стартапов
-• Создание анимированных инфографик
-
-Технологический стек:
-- Cinema 4D + Redshift
-- After Effects + Lottie
-- Blender для 3D-моделирования
-- Figma для пре-продакшн
-
-Наш подход: глубокое погружение в продукт клиента, agile-методология работы,
-фокус на передаче сложных технических концепций через простую и красивую анимацию.
-
-Портфолио включает проекты для Yandex, Tinkoff, VK и других технологических гигантов."""
+        example = EXAMPLE_TEXT
         
         self.text_input.setPlainText(example)
-        self.name_input.setText("MotionCraft Studio")
+        self.name_input.setText(EXAMPLE_COMPETITOR)
         self.statusBar().showMessage("Пример загружен")
     
     def clear_text(self):
@@ -443,6 +486,29 @@ Required variables:
         self.text_results.clear()
         self.statusBar().showMessage("Очищено")
     
+    def export_history(self):
+        """Export stored analyses to CSV or Parquet"""
+        filters = {"CSV (*.csv)": "csv"}
+        if "parquet" in export_service.available_formats():
+            filters["Parquet (*.parquet)"] = "parquet"
+        file_path, selected = QFileDialog.getSaveFileName(
+            self,
+            "Экспорт анализов",
+            "motioncraft_analyses.csv",
+            ";;".join(filters)
+        )
+        
+        if file_path:
+            self.statusBar().showMessage("Экспорт...")
+            self.export_worker = ExportWorker(file_path, filters.get(selected, "csv"))
+            self.export_worker.finished.connect(
+                lambda path: self.statusBar().showMessage(f"Экспортировано: {Path(path).name}")
+            )
+            self.export_worker.error.connect(
+                lambda error: QMessageBox.critical(self, "Ошибка экспорта", f"Ошибка: {error}")
+            )
+            self.export_worker.start()
+    
     def clear_image(self):
         """Clear image"""
         self.current_image_path = None
@@ -514,5 +580,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Frozen builds need this for the analyzer's process pool
+    multiprocessing.freeze_support()
     main()
 
@@ -11,6 +11,17 @@ document.addEventListener('DOMContentLoaded', () => {
     loadHistory();
 });
 
+// === HTML ESCAPING ===
+// Analysis texts and history entries come from users and the model: never insert them as markup
+function escapeHtml(value) {
+    return String(value === null || value === undefined ? '' : value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
 // === TAB NAVIGATION ===
 function initTabs() {
     const tabButtons = document.querySelectorAll('.tab-btn');
@@ -93,6 +104,28 @@ function clearImage() {
     document.getElementById('image-preview').style.display = 'none';
 }
 
+// === JOBS ===
+// Analyses run as submit/poll jobs: every request stays short, even behind shared-hosting proxies
+async function runJob(path, options) {
+    const submitted = await fetch(`${API_BASE}${path}`, options);
+    if (!submitted.ok) {
+        throw new Error(`HTTP ${submitted.status}`);
+    }
+    let job = await submitted.json();
+    let delay = Number(submitted.headers.get('Retry-After')) || 2;
+    
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, delay * 1000));
+        const response = await fetch(`${API_BASE}/jobs/${job.job_id}`);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        job = await response.json();
+        delay = Number(response.headers.get('Retry-After')) || delay;
+    }
+    return job.result;
+}
+
 // === TEXT ANALYSIS ===
 async function analyzeText() {
     const text = document.getElementById('text-input').value.trim();
@@ -106,19 +139,18 @@ async function analyzeText() {
     showStatus('Analyzing text...', 'info');
     
     try {
-        const response = await fetch(`${API_BASE}/analyze_text`, {
+        const data = await runJob('/jobs/analyze_text', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
                 text: text,
-                competitor_name: competitorName || null
+                competitor_name: competitorName || null,
+                detail: 'full'
             })
         });
         
-        const data = await response.json();
-        
         if (data.success) {
             displayTextAnalysis(data.analysis);
             showStatus('Analysis complete!', 'success');
@@ -171,7 +203,7 @@ function displayTextAnalysis(analysis) {
             <div class="analysis-section">
                 <h4>✅ Strengths:</h4>
                 <ul>
-                    ${analysis.strengths.map(s => `<li>${s}</li>`).join('')}
+                    ${analysis.strengths.map(s => `<li>${escapeHtml(s)}</li>`).join('')}
                 </ul>
             </div>
         `;
@@ -183,7 +215,7 @@ function displayTextAnalysis(analysis) {
             <div class="analysis-section">
                 <h4>⚠️ Weaknesses:</h4>
                 <ul>
-                    ${analysis.weaknesses.map(w => `<li class="weakness">${w}</li>`).join('')}
+                    ${analysis.weaknesses.map(w => `<li class="weakness">${escapeHtml(w)}</li>`).join('')}
                 </ul>
             </div>
         `;
@@ -194,7 +226,7 @@ function displayTextAnalysis(analysis) {
         html += `
             <div class="analysis-section">
                 <h4>🎨 Style Analysis:</h4>
-                <p>${analysis.style_analysis}</p>
+                <p>${escapeHtml(analysis.style_analysis)}</p>
             </div>
         `;
     }
@@ -205,7 +237,7 @@ function displayTextAnalysis(analysis) {
             <div class="analysis-section">
                 <h4>💡 Recommendations:</h4>
                 <ul>
-                    ${analysis.improvement_recommendations.map(r => `<li>${r}</li>`).join('')}
+                    ${analysis.improvement_recommendations.map(r => `<li>${escapeHtml(r)}</li>`).join('')}
                 </ul>
             </div>
         `;
@@ -216,7 +248,7 @@ function displayTextAnalysis(analysis) {
         html += `
             <div class="analysis-section">
                 <h4>📊 Summary:</h4>
-                <p>${analysis.summary}</p>
+                <p>${escapeHtml(analysis.summary)}</p>
             </div>
         `;
     }
@@ -238,13 +270,11 @@ async function analyzeImage() {
         const formData = new FormData();
         formData.append('file', currentImageFile);
         
-        const response = await fetch(`${API_BASE}/analyze_image`, {
+        const data = await runJob('/jobs/analyze_image', {
             method: 'POST',
             body: formData
         });
         
-        const data = await response.json();
-        
         if (data.success) {
             displayImageAnalysis(data.analysis);
             showStatus('Analysis complete!', 'success');
@@ -264,7 +294,7 @@ function displayImageAnalysis(analysis) {
     let html = `
         <div class="analysis-section">
             <h4>📝 Description:</h4>
-            <p>${analysis.description || 'No description'}</p>
+            <p>${escapeHtml(analysis.description || 'No description')}</p>
         </div>
     `;
     
@@ -291,7 +321,7 @@ function displayImageAnalysis(analysis) {
         html += `
             <div class="analysis-section">
                 <h4>🎨 Visual style:</h4>
-                <p>${analysis.visual_style_analysis}</p>
+                <p>${escapeHtml(analysis.visual_style_analysis)}</p>
             </div>
         `;
     }
@@ -301,7 +331,7 @@ function displayImageAnalysis(analysis) {
             <div class="analysis-section">
                 <h4>💡 Recommendations:</h4>
                 <ul>
-                    ${analysis.recommendations.map(r => `<li>${r}</li>`).join('')}
+                    ${analysis.recommendations.map(r => `<li>${escapeHtml(r)}</li>`).join('')}
                 </ul>
             </div>
         `;
@@ -355,7 +385,7 @@ function displayParseResults(data) {
     let html = `
         <div class="analysis-section">
             <h4>🌐 URL:</h4>
-            <p><a href="${data.url}" target="_blank">${data.url}</a></p>
+            <p><a href="${escapeHtml(data.url)}" target="_blank" rel="noopener">${escapeHtml(data.url)}</a></p>
         </div>
     `;
     
@@ -363,7 +393,7 @@ function displayParseResults(data) {
         html += `
             <div class="analysis-section">
                 <h4>📄 Content preview:</h4>
-                <p>${data.text_preview}</p>
+                <p>${escapeHtml(data.text_preview)}</p>
             </div>
         `;
     }
@@ -410,7 +440,6 @@ async function parseAllCompetitors() {
                 <div class="analysis-section">
                     <h4>✅ Bulk parsing complete</h4>
                     <p>Total analyzed: <strong>${data.total}</strong> competitors</p>
-                    <p>Results saved to file: <code>data/parsing_results.json</code></p>
                 </div>
             `;
             
@@ -433,6 +462,8 @@ function showProgress(show) {
 
 // === HISTORY ===
 async function loadHistory() {
+    loadAnalytics();
+    
     const historyList = document.getElementById('history-list');
     historyList.innerHTML = '<p class="loading"><span class="spinner"></span> Loading history...</p>';
     
@@ -454,8 +485,8 @@ async function loadHistory() {
                             <span class="history-time">${formattedDate}</span>
                         </div>
                         <div class="history-content">
-                            <p><strong>Request:</strong> ${item.request_summary}</p>
-                            <p><strong>Result:</strong> ${item.response_summary}</p>
+                            <p><strong>Request:</strong> ${escapeHtml(item.request_summary)}</p>
+                            <p><strong>Result:</strong> ${escapeHtml(item.response_summary)}</p>
                         </div>
                     </div>
                 `;
@@ -471,6 +502,59 @@ async function loadHistory() {
     }
 }
 
+async function loadAnalytics() {
+    const summary = document.getElementById('analytics-summary');
+    
+    try {
+        const [trendsResponse, improversResponse] = await Promise.all([
+            fetch(`${API_BASE}/analytics/trends`),
+            fetch(`${API_BASE}/analytics/improvers?field=innovation_score`)
+        ]);
+        const trends = await trendsResponse.json();
+        const improvers = await improversResponse.json();
+        
+        if (!trends.items || trends.items.length === 0) {
+            summary.innerHTML = '';
+            return;
+        }
+        
+        let html = `
+            <h4>📈 Score trends</h4>
+            <table class="analytics-table">
+                <tr>
+                    <th>Competitor</th><th>Analyses</th><th>Design</th><th>Animation</th>
+                    <th>Innovation</th><th>Execution</th><th>Clients</th>
+                </tr>
+                ${trends.items.map(item => `
+                    <tr>
+                        <td>${escapeHtml(item.competitor)}</td>
+                        <td>${item.count}</td>
+                        <td>${item.mean.design_score}</td>
+                        <td>${item.mean.animation_potential}</td>
+                        <td>${item.mean.innovation_score}</td>
+                        <td>${item.mean.technical_execution}</td>
+                        <td>${item.mean.client_focus}</td>
+                    </tr>
+                `).join('')}
+            </table>
+        `;
+        
+        if (improvers.items && improvers.items.length > 0) {
+            html += `
+                <h4>🚀 Innovation improved this quarter</h4>
+                <ul>
+                    ${improvers.items.map(i => `<li>${escapeHtml(i.competitor)}: ${i.previous_mean} → ${i.current_mean} (+${i.delta})</li>`).join('')}
+                </ul>
+            `;
+        }
+        
+        summary.innerHTML = html;
+    } catch (error) {
+        summary.innerHTML = '';
+        console.error(error);
+    }
+}
+
 async function clearHistory() {
     if (!confirm('Are you sure you want to clear all history?')) {
         return;
@@ -502,6 +586,12 @@ function getRequestTypeLabel(type) {
     return labels[type] || type;
 }
 
+// === EXPORT ===
+function exportHistory(format) {
+    // Streamed download: the browser saves the file as it arrives
+    window.location.href = `${API_BASE}/export?format=${format}`;
+}
+
 // === EXAMPLES ===
 function loadExampleText() {
     // Text split into parts for convenience
@@ -1 +1,18 @@
- 
\ No newline at end of file
+"""
+Phusion Passenger entry point (cPanel "Setup Python App", Python 3.6)
+
+Passenger speaks WSGI, the app is ASGI: requests are bridged to one event
+loop per Passenger process, so no uvicorn process or PHP proxy is needed.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Passenger runs several processes: a process pool in each would fork cpu_count workers per process
+os.environ.setdefault("EXECUTOR_KIND", "thread")
+
+from backend.main import app  # noqa: E402
+from backend.wsgi_bridge import AsgiToWsgi  # noqa: E402
+
+application = AsgiToWsgi(app)
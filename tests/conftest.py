@@ -0,0 +1,48 @@
+"""
+Shared test setup: isolated data directory, no background work on import
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Settings are read when backend.config is imported, so this must run first
+os.environ.update({
+    "DATA_DIR": tempfile.mkdtemp(prefix="motioncraft_tests_"),
+    "WARM_CACHE_ON_STARTUP": "false",
+    "EXECUTOR_KIND": "inline",
+    "LOOP_LAG_INTERVAL": "0",
+})
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion on a fresh event loop"""
+    loop = asyncio.new_event_loop()
+    if sys.version_info < (3, 7):
+        # As served by passenger_wsgi: tasks get their own context, like asyncio does from 3.7
+        from backend.wsgi_bridge import _ContextTask
+        loop.set_task_factory(lambda loop, coro: _ContextTask(coro, loop=loop))
+    asyncio.set_event_loop(loop)
+    yield loop.run_until_complete
+    loop.close()
+    asyncio.set_event_loop(None)
+
+
+@pytest.fixture
+def api(run):
+    """Call the app in-process: api("GET", "/history", headers=...) -> httpx.Response"""
+    from backend.main import app
+
+    def call(method, url, **kwargs):
+        async def send():
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                return await client.request(method, url, **kwargs)
+        return run(send())
+
+    return call
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from backend.services.analytics_service import AnalyticsService, previous_quarter, quarter_of
+from backend.services.history_store import HistoryStore
+from backend.services.model_router import SCORE_FIELDS
+
+
+def write_records(path, rows):
+    """Append (competitor, timestamp, innovation_score) rows as another process would"""
+    with open(path, "a", encoding="utf-8") as f:
+        for index, (competitor, timestamp, innovation) in enumerate(rows):
+            analysis = {field: 5 for field in SCORE_FIELDS}
+            analysis["innovation_score"] = innovation
+            record = {"id": f"{competitor}-{timestamp}-{index}", "timestamp": timestamp,
+                      "request_type": "text_analysis", "competitor_name": competitor,
+                      "analysis": analysis}
+            f.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def history(tmp_path):
+    return tmp_path / "history.jsonl"
+
+
+def test_quarters():
+    assert quarter_of("2024-02-29T10:00:00") == "2024-Q1"
+    assert quarter_of("2024-12-01T00:00:00") == "2024-Q4"
+    assert previous_quarter("2024-Q1") == "2023-Q4"
+    with pytest.raises(ValueError):
+        previous_quarter("2024-Q5")
+
+
+def test_trends_describe_each_competitor(history):
+    write_records(history, [
+        ("Alpha", "2024-01-10T10:00:00", 4),
+        ("alpha ", "2024-01-20T10:00:00", 6),
+        ("Alpha", "2024-02-10T10:00:00", 8),
+        ("Beta", "2024-02-11T10:00:00", 3),
+    ])
+    analytics = AnalyticsService(HistoryStore(history))
+
+    trends = {item["competitor"]: item for item in analytics.competitor_trends(window=2)}
+    # Competitor names are matched case- and whitespace-insensitively
+    assert set(trends) == {"Alpha", "Beta"}
+    alpha = trends["Alpha"]
+    assert alpha["count"] == 3
+    assert alpha["mean"]["innovation_score"] == 6.0
+    assert alpha["std"]["innovation_score"] == 1.63
+    assert alpha["latest"]["innovation_score"] == 8
+    assert alpha["moving_average"]["innovation_score"] == [5.0, 7.0]
+    assert alpha["distribution"]["innovation_score"] == [0, 0, 0, 1, 0, 1, 0, 1, 0, 0]
+    assert alpha["first_seen"] == "2024-01-10T10:00:00"
+
+    assert [item["competitor"] for item in analytics.competitor_trends(competitor="BETA")] == ["Beta"]
+    assert analytics.competitor_trends(competitor="Gamma") == []
+
+
+def test_improvers_compare_quarter_means(history):
+    write_records(history, [
+        ("Alpha", "2023-11-01T10:00:00", 4),
+        ("Alpha", "2024-01-15T10:00:00", 7),
+        ("Beta", "2023-12-01T10:00:00", 6),
+        ("Beta", "2024-02-01T10:00:00", 7),
+        ("Gamma", "2023-12-01T10:00:00", 8),
+        ("Gamma", "2024-03-01T10:00:00", 5),
+        # No previous quarter to compare with
+        ("Delta", "2024-03-01T10:00:00", 9),
+    ])
+    analytics = AnalyticsService(HistoryStore(history))
+
+    improvers = analytics.improvers(field="innovation_score", quarter="2024-Q1")
+    assert [(row["competitor"], row["delta"]) for row in improvers] == [("Alpha", 3.0), ("Beta", 1.0)]
+    assert improvers[0]["previous_mean"] == 4.0
+
+
+def test_rollups_catch_up_with_appended_and_cleared_history(history):
+    write_records(history, [("Alpha", "2024-01-10T10:00:00", 4)])
+    store = HistoryStore(history)
+    analytics = AnalyticsService(store)
+    assert analytics.competitor_trends()[0]["count"] == 1
+
+    write_records(history, [("Alpha", "2024-01-11T10:00:00", 6)])
+    assert analytics.competitor_trends()[0]["count"] == 2
+
+    store.clear()
+    assert analytics.competitor_trends() == []
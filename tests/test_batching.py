@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from backend.config import settings
+from backend.services.batching_service import TextCoalescer
+from backend.services.budget_service import RequestUsage, current_client, current_usage, budget_service
+from backend.services.profiling_service import StageTimings, current_stages, stage
+
+SCORES = {"design_score": 5, "animation_potential": 6, "innovation_score": 7,
+          "technical_execution": 8, "client_focus": 9}
+
+
+class FakeAnalyzer:
+    """Records packed and individual score calls; packed answers echo each item's text length"""
+
+    def __init__(self, batch_error=None, usage=None):
+        self.batch_error = batch_error
+        self.usage = usage
+        self.batches = []
+        self.singles = []
+
+    async def score_batch(self, items, deterministic=False):
+        self.batches.append(items)
+        with stage("deepseek_upstream"):
+            await asyncio.sleep(0)
+        if self.usage is not None:
+            budget_service.record_completion(self.usage)
+        if self.batch_error is not None:
+            raise self.batch_error
+        return [dict(SCORES, design_score=len(text)) for text, _ in items]
+
+    async def score(self, text, competitor_name=None, deterministic=False):
+        self.singles.append(text)
+        with stage("single_upstream"):
+            await asyncio.sleep(0)
+        return dict(SCORES)
+
+    async def complete_from_scores(self, text, competitor_name, scores, detail):
+        return scores
+
+
+@pytest.fixture(autouse=True)
+def coalesce_settings(monkeypatch):
+    monkeypatch.setattr(settings, "coalesce_enabled", True)
+    monkeypatch.setattr(settings, "coalesce_window_ms", 5.0)
+    monkeypatch.setattr(settings, "coalesce_max_items", 10)
+
+
+async def analyze_all(coalescer, texts):
+    return await asyncio.gather(
+        *[coalescer.analyze(text, detail="scores") for text in texts], return_exceptions=True
+    )
+
+
+def test_short_texts_share_one_packed_call(run):
+    analyzer = FakeAnalyzer()
+    coalescer = TextCoalescer(analyzer)
+    results = run(analyze_all(coalescer, ["a", "bb", "ccc"]))
+
+    assert len(analyzer.batches) == 1
+    # Every caller gets the answer for its own text
+    assert [result["design_score"] for result in results] == [1, 2, 3]
+    assert analyzer.singles == []
+    assert coalescer.stats["upstream_calls_saved"] == 2
+
+
+def test_unparseable_packed_answer_falls_back_to_single_calls(run):
+    analyzer = FakeAnalyzer(batch_error=ValueError("not JSON"))
+    coalescer = TextCoalescer(analyzer)
+    results = run(analyze_all(coalescer, ["first", "second", "third"]))
+
+    assert results == [SCORES] * 3
+    assert sorted(analyzer.singles) == ["first", "second", "third"]
+    assert coalescer.stats["fallback_items"] == 3
+
+
+def test_upstream_error_reaches_every_caller(run):
+    analyzer = FakeAnalyzer(batch_error=RuntimeError("upstream down"))
+    coalescer = TextCoalescer(analyzer)
+    results = run(analyze_all(coalescer, ["first", "second"]))
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert analyzer.singles == []
+
+
+def test_packed_usage_is_split_across_callers(run):
+    analyzer = FakeAnalyzer(usage={"prompt_tokens": 400, "completion_tokens": 100})
+    coalescer = TextCoalescer(analyzer)
+
+    async def caller(client, text):
+        current_client.set(client)
+        usage = RequestUsage()
+        current_usage.set(usage)
+        await coalescer.analyze(text, detail="scores")
+        return usage.counters
+
+    async def scenario():
+        return await asyncio.gather(caller("test:a", "x" * 100), caller("test:b", "y" * 300))
+
+    first, second = run(scenario())
+    assert (first["prompt_tokens"], second["prompt_tokens"]) == (100, 300)
+    assert (first["completion_tokens"], second["completion_tokens"]) == (25, 75)
+    assert first["deepseek_calls"] + second["deepseek_calls"] == 1
+
+
+def timed_callers(coalescer, texts):
+    async def caller(text):
+        timings = StageTimings()
+        current_stages.set(timings)
+        await coalescer.analyze(text, detail="scores")
+        return timings.counts
+
+    return asyncio.gather(*[caller(text) for text in texts])
+
+
+def test_packed_call_stages_reach_every_caller(run):
+    coalescer = TextCoalescer(FakeAnalyzer())
+    counts = run(timed_callers(coalescer, ["a", "bb", "ccc"]))
+    assert counts == [{"deepseek_upstream": 1}] * 3
+
+
+def test_fallback_stages_reach_only_their_caller(run):
+    coalescer = TextCoalescer(FakeAnalyzer(batch_error=ValueError("not JSON")))
+    counts = run(timed_callers(coalescer, ["first", "second"]))
+    assert counts == [{"deepseek_upstream": 1, "single_upstream": 1}] * 2
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from backend.config import settings
+from backend.services import budget_service as budget_module
+from backend.services.budget_service import (
+    UsageStore, RequestUsage, budget_service, current_client, current_payers, current_usage, _split,
+    LEVEL_NORMAL, LEVEL_DEGRADED, LEVEL_EXHAUSTED
+)
+
+
+@pytest.fixture(autouse=True)
+def usage_store(tmp_path, monkeypatch):
+    store = UsageStore(tmp_path / "usage.json")
+    monkeypatch.setattr(budget_service, "store", store)
+    monkeypatch.setattr(settings, "daily_token_budget", 0)
+    monkeypatch.setattr(settings, "client_daily_token_budget", 1000)
+    monkeypatch.setattr(settings, "budget_degrade_fraction", 0.8)
+    # Python 3.6 tasks run in the caller's context, so earlier tests may have left payers set
+    current_payers.set(None)
+    return store
+
+
+def spend(client, tokens):
+    current_client.set(client)
+    budget_service.record_completion({"prompt_tokens": tokens, "completion_tokens": 0})
+
+
+def test_split_is_proportional_and_exact():
+    assert _split(100, [1, 3]) == [25, 75]
+    assert _split(10, [1, 1, 1]) == [4, 3, 3]
+    assert sum(_split(7, [0.2, 0.3, 0.5])) == 7
+    assert _split(5, [1]) == [5]
+    assert _split(5, [0, 0]) == [5, 0]
+
+
+def test_client_level_moves_from_normal_to_degraded_to_exhausted():
+    spend("key:a", 799)
+    assert budget_service.level("key:a") == LEVEL_NORMAL
+    spend("key:a", 1)
+    assert budget_service.level("key:a") == LEVEL_DEGRADED
+    assert budget_service.max_tokens(400) == int(400 * settings.budget_degraded_token_factor)
+    spend("key:a", 200)
+    assert budget_service.level("key:a") == LEVEL_EXHAUSTED
+    # Other clients keep their own budget
+    assert budget_service.level("key:b") == LEVEL_NORMAL
+
+
+def test_global_budget_applies_to_everyone(monkeypatch):
+    monkeypatch.setattr(settings, "daily_token_budget", 100)
+    spend("key:a", 100)
+    assert budget_service.level("key:b") == LEVEL_EXHAUSTED
+
+
+def test_shared_call_takes_the_most_restrictive_payer_level():
+    spend("key:a", 900)
+    current_payers.set([("key:a", None, 1), ("key:b", None, 1)])
+    try:
+        assert budget_service.level() == LEVEL_DEGRADED
+    finally:
+        current_payers.set(None)
+
+
+def test_shared_call_is_split_and_written_once(usage_store, monkeypatch):
+    writes = []
+    save = usage_store._save
+    monkeypatch.setattr(usage_store, "_save", lambda: writes.append(1) or save())
+    first, second = RequestUsage(), RequestUsage()
+    current_payers.set([("key:a", first, 1), ("key:b", second, 3), ("key:a", None, 4)])
+    try:
+        budget_service.record_completion({"prompt_tokens": 80, "completion_tokens": 8})
+    finally:
+        current_payers.set(None)
+
+    assert writes == [1]
+    assert (first.counters["prompt_tokens"], second.counters["prompt_tokens"]) == (10, 30)
+    today = usage_store.day(budget_module._today())
+    assert today["key:a"]["prompt_tokens"] == 50
+    assert today["key:b"]["completion_tokens"] == 3
+    assert today["key:a"]["deepseek_calls"] + today["key:b"]["deepseek_calls"] == 1
+
+
+def test_request_usage_counts_the_current_caller():
+    usage = RequestUsage()
+    current_usage.set(usage)
+    try:
+        spend("key:a", 12)
+        budget_service.record_vision_call()
+    finally:
+        current_usage.set(None)
+    assert usage.header() == "prompt_tokens=12,completion_tokens=0,deepseek_calls=1,vision_calls=1"
+
+
+def test_old_days_are_pruned(usage_store, monkeypatch):
+    monkeypatch.setattr(settings, "usage_retention_days", 30)
+    usage_store.path.write_text(json.dumps({"2000-01-01": {"key:a": {"prompt_tokens": 5}}}))
+    spend("key:a", 1)
+
+    days = json.loads(usage_store.path.read_text())
+    assert list(days) == [budget_module._today()]
+
+    monkeypatch.setattr(settings, "usage_retention_days", 0)
+    usage_store.path.write_text(json.dumps({"2000-01-01": {"key:a": {"prompt_tokens": 5}}}))
+    spend("key:a", 1)
+    assert "2000-01-01" in json.loads(usage_store.path.read_text())
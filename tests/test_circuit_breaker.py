@@ -0,0 +1,162 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.config import settings
+from backend.services.circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+)
+from backend.services.priority_lanes import PriorityLanes
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(monkeypatch):
+    monkeypatch.setattr(settings, "breaker_min_calls", 4)
+    monkeypatch.setattr(settings, "breaker_failure_rate", 0.5)
+    monkeypatch.setattr(settings, "breaker_slow_call_seconds", 20.0)
+    monkeypatch.setattr(settings, "breaker_open_seconds", 30.0)
+
+
+async def ok():
+    return "ok"
+
+
+async def fail():
+    raise httpx.ConnectError("upstream down")
+
+
+async def call_all(breaker, attempts):
+    for attempt in attempts:
+        try:
+            await breaker.call(attempt)
+        except httpx.HTTPError:
+            pass
+
+
+def expire_open_period(breaker):
+    breaker.opened_at -= settings.breaker_open_seconds
+
+
+def test_opens_at_failure_rate_and_fails_fast(run):
+    breaker = CircuitBreaker("test")
+    run(call_all(breaker, [ok, fail, ok]))
+    assert breaker.state == STATE_CLOSED
+
+    run(call_all(breaker, [fail]))
+    assert breaker.state == STATE_OPEN
+
+    calls = []
+
+    async def counted():
+        calls.append(1)
+        return "ok"
+
+    with pytest.raises(CircuitOpenError):
+        run(breaker.call(counted))
+    assert calls == []
+
+
+def test_client_errors_do_not_open(run):
+    breaker = CircuitBreaker("test")
+    request = httpx.Request("POST", "http://upstream.test/")
+
+    async def bad_request():
+        response = httpx.Response(400, request=request)
+        raise httpx.HTTPStatusError("bad request", request=request, response=response)
+
+    run(call_all(breaker, [bad_request] * 6))
+    assert breaker.state == STATE_CLOSED
+
+
+def test_half_open_lets_one_probe_through_and_closes(run):
+    breaker = CircuitBreaker("test")
+    run(call_all(breaker, [fail] * 4))
+    expire_open_period(breaker)
+    assert breaker.status()["state"] == STATE_HALF_OPEN
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_probe():
+            await release.wait()
+            return "probe"
+
+        probe = asyncio.ensure_future(breaker.call(slow_probe))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+        release.set()
+        return await probe
+
+    assert run(scenario()) == "probe"
+    assert breaker.state == STATE_CLOSED
+    assert run(breaker.call(ok)) == "ok"
+
+
+def test_failed_probe_reopens(run):
+    breaker = CircuitBreaker("test")
+    run(call_all(breaker, [fail] * 4))
+    expire_open_period(breaker)
+
+    run(call_all(breaker, [fail]))
+    assert breaker.status()["state"] == STATE_OPEN
+    with pytest.raises(CircuitOpenError):
+        run(breaker.call(ok))
+
+
+def test_hedge_wins_and_loser_finishes_in_its_own_slot(run, monkeypatch):
+    monkeypatch.setattr(settings, "hedge_enabled", True)
+    monkeypatch.setattr(settings, "hedge_min_samples", 1)
+    monkeypatch.setattr(settings, "lane_interactive_reserved", 0)
+    breaker = CircuitBreaker("test")
+    lanes = PriorityLanes("test", 2)
+    run(breaker.call(ok, hedge=True, slot=lanes.slot))
+
+    async def scenario():
+        attempts = []
+        finished = []
+
+        async def attempt():
+            attempts.append(lanes.in_use)
+            # The first attempt is slow, the hedge answers right away
+            await asyncio.sleep(0.2 if len(attempts) == 1 else 0)
+            finished.append(len(attempts))
+            return "answer"
+
+        result = await breaker.call(attempt, hedge=True, slot=lanes.slot)
+        assert result == "answer"
+        assert attempts == [1, 2]
+        assert lanes.in_use == 1
+        await asyncio.sleep(0.3)
+        assert lanes.in_use == 0
+        assert len(finished) == 2
+
+    run(scenario())
+
+
+def test_each_hedged_attempt_records_its_own_latency(run, monkeypatch):
+    monkeypatch.setattr(settings, "hedge_enabled", True)
+    monkeypatch.setattr(settings, "hedge_min_samples", 1)
+    breaker = CircuitBreaker("test")
+    run(breaker.call(ok, hedge=True))
+    before = len(breaker._latencies)
+
+    async def scenario():
+        attempts = []
+
+        async def attempt():
+            attempts.append(1)
+            await asyncio.sleep(0.2 if len(attempts) == 1 else 0)
+            return "answer"
+
+        await breaker.call(attempt, hedge=True)
+        # The winner answers at once; the slow first attempt is recorded once it finishes
+        assert len(breaker._latencies) == before + 1
+        await asyncio.sleep(0.3)
+
+    run(scenario())
+    latencies = list(breaker._latencies)[before:]
+    assert len(latencies) == 2
+    assert max(latencies) >= 0.2
+    assert breaker.status()["calls"] == before + 2
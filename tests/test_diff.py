@@ -0,0 +1,71 @@
+import pytest
+
+from backend.config import settings
+from backend.models.schemas import HistoryRecord
+from backend.services.diff_service import DiffService, match_items
+from backend.services.history_store import HistoryStore
+from backend.services.model_router import SCORE_FIELDS
+
+
+@pytest.fixture(autouse=True)
+def diff_settings(monkeypatch):
+    monkeypatch.setattr(settings, "diff_fuzzy_threshold", 0.5)
+    monkeypatch.setattr(settings, "diff_score_noise", 1)
+    monkeypatch.setattr(settings, "diff_list_weight", 0.5)
+    monkeypatch.setattr(settings, "diff_significance_threshold", 2.0)
+
+
+@pytest.fixture
+def service(tmp_path):
+    return DiffService(HistoryStore(tmp_path / "history.jsonl"))
+
+
+def record(record_id, scores=None, summary="", **lists):
+    analysis = {field: 5 for field in SCORE_FIELDS}
+    analysis.update(scores or {})
+    analysis.update(lists, summary=summary)
+    return HistoryRecord(id=record_id, timestamp="2024-05-01T10:00:00",
+                         request_type="text_analysis", competitor_name="Alpha", analysis=analysis)
+
+
+def test_reworded_items_match_and_new_ones_are_added():
+    added, removed = match_items(
+        ["Smooth page transitions", "Weak mobile layout"],
+        ["Very smooth page transitions!", "Bold 3D hero animation"],
+        0.5
+    )
+    assert added == ["Bold 3D hero animation"]
+    assert removed == ["Weak mobile layout"]
+
+
+def test_deltas_within_the_noise_band_are_not_significant(service):
+    diff = service.compare(record("a"), record("b", {"design_score": 6, "client_focus": 4}))
+
+    assert diff.score_deltas == {"design_score": 1, "client_focus": -1}
+    assert diff.significance == 0
+    assert not diff.significant
+
+
+def test_large_score_jump_is_significant(service):
+    diff = service.compare(record("a"), record("b", {"innovation_score": 8}))
+
+    assert diff.score_deltas == {"innovation_score": 3}
+    assert diff.significance == 2
+    assert diff.significant
+
+
+def test_list_changes_add_their_weight(service):
+    previous = record("a", summary="old", strengths=["Clean typography"])
+    current = record("b", {"design_score": 6}, summary="new",
+                     strengths=["Clean typography", "Bold 3D hero animation"],
+                     weaknesses=["Slow first load"])
+    diff = service.compare(previous, current)
+
+    assert diff.added == {"strengths": ["Bold 3D hero animation"], "weaknesses": ["Slow first load"]}
+    assert diff.significance == 1.0
+    assert not diff.significant
+
+
+def test_score_only_analyses_skip_list_comparison(service):
+    diff = service.compare(record("a", strengths=["Clean typography"]), record("b", strengths=[]))
+    assert diff.removed == {}
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from backend.config import settings
+from backend.services import executor_service as executor_module
+from backend.services.executor_service import ExecutorService, LoopLagMonitor
+
+MAIN_PID = os.getpid()
+
+
+def worker_pid(_):
+    return os.getpid()
+
+
+def crash_in_worker(value):
+    # Kills a pool worker; in the test process itself it just answers
+    if os.getpid() != MAIN_PID:
+        os._exit(1)
+    return value * 2
+
+
+@pytest.fixture
+def make_executor(monkeypatch):
+    executors = []
+    monkeypatch.setattr(settings, "executor_offload_min_bytes", 100)
+    monkeypatch.setattr(settings, "executor_workers", 1)
+
+    def make(kind):
+        monkeypatch.setattr(settings, "executor_kind", kind)
+        executors.append(ExecutorService())
+        return executors[-1]
+
+    yield make
+    for executor in executors:
+        executor.shutdown()
+
+
+def test_small_payloads_run_inline_and_large_ones_offload(run, make_executor):
+    executor = make_executor("thread")
+    assert run(executor.run(len, "abc", size=3)) == 3
+    assert run(executor.run(len, "abc", size=100)) == 3
+    assert (executor.stats["inline"], executor.stats["offloaded"]) == (1, 1)
+
+
+def test_inline_kind_never_offloads(run, make_executor):
+    executor = make_executor("inline")
+    run(executor.run(len, "abc", size=10 ** 9))
+    assert executor.stats["offloaded"] == 0
+
+
+def test_unknown_kind_is_rejected(make_executor):
+    with pytest.raises(ValueError):
+        make_executor("fibers")
+
+
+def test_process_pool_runs_in_another_process(run, make_executor):
+    executor = make_executor("process")
+    assert run(executor.run(worker_pid, None, size=100)) != MAIN_PID
+
+
+def test_falls_back_to_threads_without_process_support(run, make_executor, monkeypatch):
+    def unavailable(max_workers=None):
+        raise OSError("[Errno 38] Function not implemented")
+
+    monkeypatch.setattr(executor_module, "ProcessPoolExecutor", unavailable)
+    executor = make_executor("process")
+
+    assert run(executor.run(worker_pid, None, size=100)) == MAIN_PID
+    assert executor.status()["kind"] == "thread"
+
+
+def test_broken_process_pool_runs_the_job_inline_and_recovers(run, make_executor):
+    executor = make_executor("process")
+    assert run(executor.run(crash_in_worker, 21, size=100)) == 42
+    assert run(executor.run(worker_pid, None, size=100)) != MAIN_PID
+
+
+def test_lag_monitor_counts_stalls(monkeypatch):
+    monkeypatch.setattr(settings, "loop_lag_stall_ms", 100)
+    monitor = LoopLagMonitor()
+    for lag in (0.001, 0.25, 0.002):
+        monitor._record(lag)
+
+    status = monitor.status()
+    assert status["stalls"] == 1
+    assert status["max_lag_ms"] == 250.0
+    assert status["lag_ms"] == 2.0
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+import pytest
+
+from backend.config import settings
+from backend.services.export_service import COLUMNS, ExportService
+from backend.services.history_store import HistoryStore
+from backend.services.model_router import SCORE_FIELDS
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "export_chunk_rows", 2)
+    path = tmp_path / "history.jsonl"
+    records = [
+        {"id": f"text-{index}", "timestamp": f"2024-05-0{index + 1}T10:00:00", "request_type": "text_analysis",
+         "competitor_name": "Alpha" if index % 2 else "Beta",
+         "analysis": dict({field: index + 1 for field in SCORE_FIELDS},
+                          strengths=["Плавная анимация", "Сильный шоурил"], summary="Студия")}
+        for index in range(5)
+    ]
+    records.append({"id": "image-0", "timestamp": "2024-05-09T10:00:00", "request_type": "image_analysis",
+                    "analysis": {"description": "Главная страница", "visual_style_score": 8,
+                                 "recommendations": ["Крупнее заголовок"]}})
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+    return ExportService(HistoryStore(path))
+
+
+def test_csv_has_every_column_and_one_line_per_list_item(service):
+    body = b"".join(service.stream("csv")).decode("utf-8")
+    rows = list(csv.DictReader(io.StringIO(body)))
+
+    assert list(rows[0]) == COLUMNS
+    assert len(rows) == 6
+    assert rows[0]["design_score"] == "1"
+    assert rows[0]["strengths"] == "Плавная анимация\nСильный шоурил"
+    assert rows[5]["design_score"] == ""
+    assert rows[5]["visual_style_score"] == "8"
+    assert rows[5]["recommendations"] == "Крупнее заголовок"
+
+
+def test_filters(service):
+    body = b"".join(service.stream("csv", request_type="text_analysis", competitor="alpha")).decode("utf-8")
+    assert [row["id"] for row in csv.DictReader(io.StringIO(body))] == ["text-1", "text-3"]
+
+
+def test_empty_export_is_header_only(tmp_path):
+    body = b"".join(ExportService(HistoryStore(tmp_path / "none.jsonl")).stream("csv")).decode("utf-8")
+    assert body.strip() == ",".join(COLUMNS)
+
+
+def test_parquet_columns_and_types(service):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    table = pyarrow.parquet.read_table(io.BytesIO(b"".join(service.stream("parquet"))))
+    assert table.column_names == COLUMNS
+    assert table.num_rows == 6
+    assert table.schema.field("design_score").type == pyarrow.int8()
+    assert table.schema.field("strengths").type == pyarrow.list_(pyarrow.string())
+    assert table.column("strengths")[0].as_py() == ["Плавная анимация", "Сильный шоурил"]
+    assert table.column("innovation_score")[5].as_py() is None
+    # One row group per chunk of export_chunk_rows
+    assert pyarrow.parquet.ParquetFile(io.BytesIO(b"".join(service.stream("parquet")))).num_row_groups == 3
+
+
+def test_unknown_format_is_rejected(service):
+    with pytest.raises(ValueError):
+        service.stream("xlsx")
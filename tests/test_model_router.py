@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from backend.config import settings
+from backend.services.analyzer_service import DeepSeekAnalyzer
+from backend.services.model_router import model_router, SCORE_FIELDS
+
+MIDDLE_SCORES = {field: 6 for field in SCORE_FIELDS}
+NARRATIVE = {"strengths": ["Чистая типографика"], "weaknesses": [], "style_analysis": "Минимализм",
+             "improvement_recommendations": [], "summary": "Сдержанный сайт"}
+
+
+class RecordingAnalyzer(DeepSeekAnalyzer):
+    """Answers every completion locally and records which route was used"""
+
+    def __init__(self, scores):
+        super().__init__()
+        self.scores = scores
+        self.routes = []
+
+    async def _complete(self, route, system_prompt, prompt, max_tokens=None):
+        self.routes.append(route.name)
+        if route.name == "narrative":
+            return json.dumps(dict(NARRATIVE, **self.scores))
+        return json.dumps(self.scores)
+
+
+def test_resolve_detail_defaults_and_rejects_unknown(monkeypatch):
+    monkeypatch.setattr(settings, "default_analysis_detail", "auto")
+    assert model_router.resolve_detail(None) == "auto"
+    assert model_router.resolve_detail("FULL") == "full"
+    with pytest.raises(ValueError):
+        model_router.resolve_detail("everything")
+
+
+def test_needs_narrative_only_for_notable_scores():
+    assert not model_router.needs_narrative(MIDDLE_SCORES)
+    assert model_router.needs_narrative(dict(MIDDLE_SCORES, innovation_score=model_router.threshold_high))
+    assert model_router.needs_narrative(dict(MIDDLE_SCORES, client_focus=model_router.threshold_low))
+
+
+def test_scores_detail_runs_only_the_score_pass(run):
+    analyzer = RecordingAnalyzer(MIDDLE_SCORES)
+    analysis = run(analyzer.analyze_competitor_text("text", detail="scores"))
+
+    assert analyzer.routes == ["score"]
+    assert analysis.design_score == 6
+    assert analysis.summary == ""
+
+
+def test_auto_detail_skips_narrative_for_middling_scores(run):
+    analyzer = RecordingAnalyzer(MIDDLE_SCORES)
+    run(analyzer.analyze_competitor_text("text", detail="auto"))
+    assert analyzer.routes == ["score"]
+
+
+def test_auto_detail_adds_narrative_for_notable_scores(run):
+    scores = dict(MIDDLE_SCORES, design_score=9)
+    analyzer = RecordingAnalyzer(scores)
+    analysis = run(analyzer.analyze_competitor_text("text", detail="auto"))
+
+    assert analyzer.routes == ["score", "narrative"]
+    assert analysis.design_score == 9
+    assert analysis.summary == "Сдержанный сайт"
+
+
+def test_full_detail_is_one_narrative_call(run):
+    analyzer = RecordingAnalyzer(MIDDLE_SCORES)
+    analysis = run(analyzer.analyze_competitor_text("text", detail="full"))
+
+    assert analyzer.routes == ["narrative"]
+    assert analysis.style_analysis == "Минимализм"
+
+
+def test_deterministic_runs_use_the_rescore_route(run):
+    analyzer = RecordingAnalyzer(MIDDLE_SCORES)
+    run(analyzer.analyze_competitor_text("text", detail="scores", deterministic=True))
+    assert analyzer.routes == ["rescore"]
+    assert model_router.route("rescore").temperature == 0.0
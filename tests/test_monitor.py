@@ -0,0 +1,94 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from backend.config import settings
+from backend.services import monitor_service as monitor_module
+from backend.services.monitor_service import UnsafeURLError, check_public_host, check_url, monitor_service
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """/loop redirects to itself, /metadata redirects to the cloud metadata address, /big is a large page"""
+
+    def do_GET(self):
+        if self.path == "/loop":
+            self.send_response(302)
+            self.send_header("Location", "/loop")
+            self.end_headers()
+        elif self.path == "/metadata":
+            self.send_response(302)
+            self.send_header("Location", "http://169.254.169.254/latest/meta-data/")
+            self.end_headers()
+        else:
+            body = b"<html><body><p>" + b"motion " * 2000 + b"</p></body></html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site(monkeypatch):
+    server = HTTPServer(("127.0.0.1", 0), SiteHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    checked = []
+
+    async def allow_test_server(url):
+        # The test server itself is on loopback; every other host goes through the real check
+        checked.append(url)
+        if not url.startswith(base):
+            await check_public_host(url)
+
+    monkeypatch.setattr(monitor_module, "check_public_host", allow_test_server)
+    monkeypatch.setattr(settings, "monitor_allow_private_hosts", False)
+    yield base, checked
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "ftp://example.com/", "gopher://example.com", "http:///path"])
+def test_only_http_urls_with_a_host_are_accepted(url):
+    with pytest.raises(UnsafeURLError):
+        check_url(url)
+    with pytest.raises(UnsafeURLError):
+        monitor_service.add_target(url)
+
+
+@pytest.mark.parametrize("url", ["http://127.0.0.1/", "http://localhost:8080/", "http://10.0.0.7/",
+                                 "http://169.254.169.254/latest/", "http://[::1]/"])
+def test_non_public_hosts_are_refused(run, monkeypatch, url):
+    monkeypatch.setattr(settings, "monitor_allow_private_hosts", False)
+    with pytest.raises(UnsafeURLError):
+        run(check_public_host(url))
+
+    monkeypatch.setattr(settings, "monitor_allow_private_hosts", True)
+    run(check_public_host(url))
+
+
+def test_redirect_hops_are_checked(run, site):
+    base, checked = site
+    with pytest.raises(UnsafeURLError):
+        run(monitor_service._fetch_text(base + "/metadata"))
+    assert checked == [base + "/metadata", "http://169.254.169.254/latest/meta-data/"]
+
+
+def test_redirects_are_capped(run, site, monkeypatch):
+    base, checked = site
+    monkeypatch.setattr(settings, "monitor_max_redirects", 3)
+    with pytest.raises(UnsafeURLError, match="More than 3 redirects"):
+        run(monitor_service._fetch_text(base + "/loop"))
+    assert len(checked) == 4
+
+
+def test_page_size_is_capped(run, site, monkeypatch):
+    base, _ = site
+    monkeypatch.setattr(settings, "monitor_max_page_bytes", 1000)
+    text = run(monitor_service._fetch_text(base + "/page"))
+    assert 0 < len(text) <= 1000
@@ -0,0 +1,69 @@
+import pytest
+
+from backend.config import settings
+from backend.services.ocr_layout import extract_layout_text
+
+
+def vertices(x0, y0, x1, y1):
+    return {"vertices": [{"x": str(x0), "y": str(y0)}, {"x": str(x1), "y": str(y0)},
+                         {"x": str(x1), "y": str(y1)}, {"x": str(x0), "y": str(y1)}]}
+
+
+def line(text, x0, y0, height=20, confidence=0.9):
+    words = [{"text": word, "confidence": confidence} for word in text.split()]
+    return {"boundingBox": vertices(x0, y0, x0 + 10 * len(text), y0 + height), "words": words}
+
+
+def block(*lines):
+    return {"lines": list(lines)}
+
+
+def response(*blocks):
+    return {"results": [{"results": [{"textDetection": {"pages": [{"blocks": list(blocks)}]}}]}]}
+
+
+@pytest.fixture(autouse=True)
+def ocr_settings(monkeypatch):
+    monkeypatch.setattr(settings, "ocr_min_confidence", 0.5)
+    monkeypatch.setattr(settings, "ocr_heading_ratio", 1.4)
+    monkeypatch.setattr(settings, "ocr_chars_per_token", 3)
+
+
+def test_columns_are_read_left_then_right_row_by_row():
+    data = response(
+        block(line("Footer", 0, 500)),
+        block(line("Right column", 400, 100), line("continues here", 400, 130)),
+        block(line("Left column", 0, 105), line("goes on", 0, 135)),
+        block(line("Motion Studio", 0, 0, height=40)),
+    )
+    assert extract_layout_text(data, max_tokens=1000) == (
+        "# Motion Studio\n\nLeft column\ngoes on\n\nRight column\ncontinues here\n\nFooter"
+    )
+
+
+def test_low_confidence_and_doubled_words_are_dropped():
+    noisy = line("Studio Studio reel", 0, 0)
+    noisy["words"].append({"text": "###", "confidence": 0.1})
+    data = response(block(noisy, line("smudge", 0, 30, confidence=0.2)))
+    assert extract_layout_text(data, max_tokens=1000) == "Studio reel"
+
+
+def test_repeated_lines_are_kept_once():
+    data = response(
+        block(line("Menu Work Contact", 0, 0)),
+        block(line("Showreel 2024", 0, 100)),
+        block(line("menu work contact", 0, 200)),
+    )
+    assert extract_layout_text(data, max_tokens=1000) == "Menu Work Contact\n\nShowreel 2024"
+
+
+def test_output_stops_at_the_token_budget():
+    data = response(*[block(line(f"Project number {index}", 0, index * 50)) for index in range(20)])
+    text = extract_layout_text(data, max_tokens=20)
+
+    # Each line is 16 characters: 6 tokens, so three fit
+    assert text.split("\n\n") == ["Project number 0", "Project number 1", "Project number 2"]
+
+
+def test_empty_response():
+    assert extract_layout_text({"results": []}) == ""
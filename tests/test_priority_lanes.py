@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from backend.config import settings
+from backend.services.priority_lanes import (
+    PriorityLanes, PRIORITY_INTERACTIVE, PRIORITY_BATCH, PRIORITY_BACKGROUND
+)
+
+
+@pytest.fixture(autouse=True)
+def lane_settings(monkeypatch):
+    monkeypatch.setattr(settings, "lane_weight_interactive", 6.0)
+    monkeypatch.setattr(settings, "lane_weight_batch", 3.0)
+    monkeypatch.setattr(settings, "lane_weight_background", 1.0)
+
+
+def test_reserved_slots_are_only_for_interactive(run, monkeypatch):
+    monkeypatch.setattr(settings, "lane_interactive_reserved", 2)
+    lanes = PriorityLanes("test", 4)
+
+    async def scenario():
+        await lanes.acquire(PRIORITY_BATCH)
+        await lanes.acquire(PRIORITY_BATCH)
+        blocked = asyncio.ensure_future(lanes.acquire(PRIORITY_BACKGROUND))
+        await asyncio.sleep(0)
+        assert not blocked.done()
+
+        # The reserved slots still admit interactive calls at once
+        await lanes.acquire(PRIORITY_INTERACTIVE)
+        await lanes.acquire(PRIORITY_INTERACTIVE)
+        assert lanes.in_use == 4
+
+        lanes.release(PRIORITY_INTERACTIVE)
+        lanes.release(PRIORITY_BATCH)
+        await asyncio.sleep(0)
+        # Two slots are free, but both are reserved
+        assert not blocked.done()
+
+        lanes.release(PRIORITY_INTERACTIVE)
+        await asyncio.wait_for(blocked, 1)
+        assert lanes.lanes[PRIORITY_BACKGROUND].active == 1
+
+    run(scenario())
+
+
+def test_waiters_are_served_by_weight(run, monkeypatch):
+    monkeypatch.setattr(settings, "lane_interactive_reserved", 0)
+    lanes = PriorityLanes("test", 1)
+    order = []
+
+    async def call(priority):
+        async with lanes.slot(priority):
+            order.append(priority)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        await lanes.acquire(PRIORITY_INTERACTIVE)
+        calls = [asyncio.ensure_future(call(priority))
+                 for priority in [PRIORITY_BATCH] * 8 + [PRIORITY_BACKGROUND] * 8]
+        await asyncio.sleep(0)
+        lanes.release(PRIORITY_INTERACTIVE)
+        await asyncio.gather(*calls)
+
+    run(scenario())
+    # Weights 3:1 over the first eight grants
+    assert order[:8].count(PRIORITY_BATCH) == 6
+    assert order[:8].count(PRIORITY_BACKGROUND) == 2
+    assert lanes.in_use == 0
+
+
+def test_cancelled_waiter_leaves_the_queue(run, monkeypatch):
+    monkeypatch.setattr(settings, "lane_interactive_reserved", 0)
+    lanes = PriorityLanes("test", 1)
+
+    async def scenario():
+        await lanes.acquire(PRIORITY_BATCH)
+        waiter = asyncio.ensure_future(lanes.acquire(PRIORITY_BATCH))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert lanes.status()["lanes"][PRIORITY_BATCH]["queued"] == 0
+
+        lanes.release(PRIORITY_BATCH)
+        assert lanes.in_use == 0
+
+    run(scenario())
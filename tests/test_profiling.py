@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from backend import main
+from backend.config import settings
+from backend.models.schemas import DesignAnalysis
+from backend.services.history_store import history_store
+from backend.services.profiling_service import StageTimings, profiling_service, stage
+from backend.services.similarity_service import similarity_service
+
+
+@pytest.fixture(autouse=True)
+def staged_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "deepseek_api_key", "test")
+    monkeypatch.setattr(settings, "similarity_short_circuit", False)
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_sample_rate", 0.0)
+    monkeypatch.setattr(settings, "profiling_slow_ms", 0.0)
+
+    async def analyze(text, competitor_name=None, detail=None, deterministic=False):
+        with stage("deepseek_upstream"):
+            await asyncio.sleep(0.01)
+        with stage("analysis_parse"):
+            pass
+        return DesignAnalysis(design_score=8, animation_potential=7, innovation_score=6,
+                              technical_execution=9, client_focus=5)
+
+    monkeypatch.setattr(main.text_coalescer, "analyze", analyze)
+    yield
+    history_store.clear()
+    similarity_service.clear()
+    profiling_service.clear()
+
+
+def server_timing(response):
+    entries = [part.split(";dur=") for part in response.headers["server-timing"].split(", ")]
+    return {name: float(duration) for name, duration in entries}
+
+
+def test_header_format():
+    timings = StageTimings()
+    timings.add("json_parse", 0.0012)
+    timings.add("json_parse", 0.0003)
+    assert timings.header() == "json_parse;dur=1.5"
+    assert timings.counts == {"json_parse": 2}
+
+
+def test_stage_timings_are_sent_as_server_timing(api):
+    response = api("POST", "/analyze_text", json={"text": "Студия"})
+
+    stages = server_timing(response)
+    assert set(stages) == {"deepseek_upstream", "analysis_parse"}
+    assert stages["deepseek_upstream"] >= 10
+
+
+def test_no_header_when_profiling_is_off(api, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", False)
+    response = api("POST", "/analyze_text", json={"text": "Студия"})
+    assert "server-timing" not in response.headers
+
+
+def test_sampled_request_is_captured_with_its_stages(api, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_sample_rate", 1.0)
+    api("POST", "/analyze_text", json={"text": "Студия"})
+
+    items = api("GET", "/debug/profiles").json()["items"]
+    assert len(items) == 1
+    assert items[0]["path"] == "/analyze_text"
+    assert items[0]["reason"] == "sampled"
+    assert items[0]["stage_counts"] == {"deepseek_upstream": 1, "analysis_parse": 1}
+    assert api("GET", "/debug/profiles/" + items[0]["id"]).status_code == 200
+
+
+def test_slow_requests_are_kept(api, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_slow_ms", 5.0)
+    api("POST", "/analyze_text", json={"text": "Студия"})
+    assert [item["reason"] for item in profiling_service.list()] == ["slow"]
@@ -0,0 +1,74 @@
+import pytest
+
+from backend import main
+from backend.config import settings
+from backend.models.schemas import DesignAnalysis
+from backend.services.history_store import history_store
+from backend.services.similarity_service import similarity_service
+
+ANALYSIS = DesignAnalysis(design_score=8, animation_potential=7, innovation_score=6,
+                          technical_execution=9, client_focus=5,
+                          strengths=["Плавные переходы"], summary="Сильная моушн-студия")
+
+
+@pytest.fixture(autouse=True)
+def fake_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "deepseek_api_key", "test")
+    monkeypatch.setattr(settings, "similarity_short_circuit", False)
+
+    async def analyze(text, competitor_name=None, detail=None, deterministic=False):
+        return ANALYSIS
+
+    monkeypatch.setattr(main.text_coalescer, "analyze", analyze)
+    yield
+    history_store.clear()
+    similarity_service.clear()
+
+
+def test_fields_limit_the_returned_analysis(api):
+    response = api("POST", "/analyze_text?fields=design_score,summary", json={"text": "Студия"})
+
+    assert response.status_code == 200
+    assert response.json()["analysis"] == {"design_score": 8, "summary": "Сильная моушн-студия"}
+
+
+def test_unknown_field_is_rejected(api):
+    response = api("POST", "/analyze_text?fields=design_score,colour", json={"text": "Студия"})
+
+    assert response.status_code == 400
+    assert "colour" in response.json()["detail"]
+
+
+def test_history_in_msgpack(api):
+    msgpack = pytest.importorskip("msgpack")
+    api("POST", "/analyze_text", json={"text": "Студия", "competitor_name": "Alpha"})
+    response = api("GET", "/history", headers={"Accept": "application/x-msgpack"})
+
+    assert response.headers["content-type"] == "application/x-msgpack"
+    payload = msgpack.unpackb(response.content, raw=False)
+    assert payload["total"] == 1
+    assert payload["items"][0]["competitor_name"] == "Alpha"
+
+
+def test_single_analysis_stays_json_when_msgpack_is_asked(api):
+    response = api("POST", "/analyze_text", json={"text": "Студия"},
+                   headers={"Accept": "application/x-msgpack"})
+    assert response.headers["content-type"].startswith("application/json")
+
+
+def test_large_responses_are_compressed(api, monkeypatch):
+    if main.BrotliMiddleware is not None:
+        pytest.skip("brotli-asgi negotiates its own encoding")
+    items = [{"text": f"Студия номер {index}"} for index in range(20)]
+    response = api("POST", "/analyze_text_batch", json={"items": items},
+                   headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()["total"] == 20
+
+
+def test_small_responses_are_not_compressed(api):
+    response = api("POST", "/analyze_text?fields=design_score", json={"text": "Студия"},
+                   headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
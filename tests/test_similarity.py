@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from backend import main
+from backend.config import settings
+from backend.models.schemas import DesignAnalysis
+from backend.services.executor_service import executor_service
+from backend.services.history_store import history_store
+from backend.services.similarity_service import BruteForceIndex, HashingVectorizer, similarity_service
+
+SITE_TEXT = ("Студия моушн-дизайна создает анимацию для брендов, рекламные ролики, "
+             "3D-графику и интерфейсы полного цикла. ") * 3
+
+
+def unit(*values):
+    vector = np.zeros(4, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector / np.linalg.norm(vector)
+
+
+def test_search_ranks_filters_kind_and_drops_non_positive(tmp_path):
+    index = BruteForceIndex(tmp_path, 4)
+    index.add(unit(1, 0), {"id": "same", "kind": "text"})
+    index.add(unit(1, 1), {"id": "close", "kind": "style"})
+    index.add(unit(0, 1), {"id": "orthogonal", "kind": "text"})
+    index.add(unit(-1, 0), {"id": "opposite", "kind": "text"})
+
+    assert [hit["id"] for hit in index.search(unit(1, 0), k=4)] == ["same", "close"]
+    assert [hit["id"] for hit in index.search(unit(1, 0), k=4, kind="style")] == ["close"]
+    assert index.search(unit(1, 0), kind="image") == []
+
+
+def test_appends_from_another_process_are_mapped(tmp_path):
+    reader = BruteForceIndex(tmp_path, 4)
+    assert reader.count() == 0
+    writer = BruteForceIndex(tmp_path, 4)
+    writer.add(unit(1, 0), {"id": "first", "kind": "text"})
+    writer.add(unit(0, 1), {"id": "second", "kind": "text"})
+
+    assert reader.count() == 2
+    assert reader.search(unit(0, 1), k=1)[0]["id"] == "second"
+    assert isinstance(reader._matrix, np.memmap)
+
+    writer.clear()
+    assert reader.count() == 0
+    assert reader.search(unit(1, 0)) == []
+
+
+def test_near_duplicates_score_above_the_threshold():
+    vectorizer = HashingVectorizer(settings.similarity_dim)
+    original = vectorizer.transform(SITE_TEXT)
+    assert float(original @ vectorizer.transform(SITE_TEXT + " ")) >= settings.similarity_duplicate_threshold
+    assert float(original @ vectorizer.transform("Веб-студия: SEO и контекстная реклама")) < 0.5
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(settings, "deepseek_api_key", "test")
+    monkeypatch.setattr(settings, "similarity_short_circuit", True)
+    calls = []
+
+    async def analyze(text, competitor_name=None, detail=None, deterministic=False):
+        calls.append(text)
+        return DesignAnalysis(design_score=8, animation_potential=7, innovation_score=6,
+                              technical_execution=9, client_focus=5, summary="Сильная студия")
+
+    monkeypatch.setattr(main.text_coalescer, "analyze", analyze)
+    yield calls
+    history_store.clear()
+    similarity_service.clear()
+
+
+def test_near_duplicate_of_the_same_competitor_is_served_from_history(api, upstream):
+    first = api("POST", "/analyze_text", json={"text": SITE_TEXT, "competitor_name": "Alpha"}).json()
+    repeat = api("POST", "/analyze_text", json={"text": SITE_TEXT + " ", "competitor_name": "alpha"}).json()
+
+    assert upstream == [SITE_TEXT]
+    assert repeat["detail"] == main.CACHED_DETAIL
+    assert repeat["analysis"] == first["analysis"]
+
+
+def test_same_text_for_another_competitor_is_analyzed(api, upstream):
+    api("POST", "/analyze_text", json={"text": SITE_TEXT, "competitor_name": "Alpha"})
+    other = api("POST", "/analyze_text", json={"text": SITE_TEXT, "competitor_name": "Beta"}).json()
+
+    assert len(upstream) == 2
+    assert "detail" not in other
+
+
+def test_search_runs_in_the_executor(run, upstream, monkeypatch):
+    monkeypatch.setattr(executor_service, "kind", "thread")
+    monkeypatch.setattr(settings, "executor_offload_min_bytes", 1)
+    similarity_service.index_analysis("record", SITE_TEXT, competitor_name="Alpha")
+    offloaded = executor_service.stats["offloaded"]
+
+    duplicate = run(similarity_service.find_duplicate(SITE_TEXT))
+    assert duplicate["record_id"] == "record"
+    assert executor_service.stats["offloaded"] == offloaded + 1
+    executor_service.shutdown()
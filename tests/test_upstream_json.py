@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from backend.config import settings
+from backend.services.ocr_layout import extract_layout_text
+from backend.services.upstream_json import classification_labels, loads, parse_vision_response
+
+
+def vertices(x0, y0, x1, y1):
+    # Vision returns coordinates as strings
+    return {"vertices": [{"x": str(x0), "y": str(y0)}, {"x": str(x1), "y": str(y1)}]}
+
+
+def vision_body():
+    def line(text, y):
+        return {
+            "boundingBox": vertices(0, y, 300, y + 20),
+            "words": [{"text": word, "confidence": 0.95, "languages": [{"languageCode": "ru"}],
+                       "boundingBox": vertices(0, y, 50, y + 20)} for word in text.split()]
+        }
+
+    return json.dumps({"results": [{"results": [
+        {"textDetection": {"pages": [{
+            "width": "1280", "height": "800",
+            "blocks": [
+                {"boundingBox": vertices(0, 0, 300, 60), "lines": [line("Студия моушн-дизайна", 0)]},
+                {"boundingBox": vertices(0, 100, 300, 160), "lines": [line("Анимация для брендов", 100),
+                                                                         line("Шоурил 2024", 130)]},
+            ]
+        }]}},
+        {"classification": {"properties": [
+            {"name": "text", "probability": 0.4},
+            {"name": "screenshot", "probability": 0.9},
+        ]}}
+    ]}]}, ensure_ascii=False).encode("utf-8")
+
+
+def test_loads_parses_bytes():
+    assert loads('{"a": [1, 2.5, "б"]}'.encode("utf-8")) == {"a": [1, 2.5, "б"]}
+
+
+def test_small_bodies_are_parsed_whole(monkeypatch):
+    monkeypatch.setattr(settings, "vision_stream_parse_min_bytes", 10 ** 9)
+    data = parse_vision_response(vision_body())
+    page = data["results"][0]["results"][0]["textDetection"]["pages"][0]
+    assert page["width"] == "1280"
+
+
+def test_streamed_parse_keeps_what_extraction_needs(monkeypatch):
+    pytest.importorskip("ijson")
+    body = vision_body()
+    full = loads(body)
+    monkeypatch.setattr(settings, "vision_stream_parse_min_bytes", 1)
+    slim = parse_vision_response(body)
+
+    assert extract_layout_text(slim, max_tokens=1000) == extract_layout_text(full, max_tokens=1000)
+    assert classification_labels(slim) == classification_labels(full) == ["screenshot", "text"]
+    word = slim["results"][0]["results"][0]["textDetection"]["pages"][0]["blocks"][1]["lines"][1]["words"][0]
+    # Word boxes and languages are never materialized
+    assert word == {"text": "Шоурил", "confidence": 0.95}
+
+
+def test_labels_below_the_probability_are_dropped():
+    assert classification_labels(loads(vision_body()), min_probability=0.5) == ["screenshot"]
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from backend import main
+from backend.config import settings
+from backend.models.schemas import DesignAnalysis
+from backend.services import warm_cache as warm_module
+from backend.services.history_store import history_store
+from backend.services.similarity_service import similarity_service
+from backend.services.warm_cache import EXAMPLE_COMPETITOR, EXAMPLE_TEXT, warm_cache
+
+ANALYSIS = DesignAnalysis(design_score=9, animation_potential=9, innovation_score=8,
+                          technical_execution=9, client_focus=7, summary="Эталонный пример")
+
+
+@pytest.fixture(autouse=True)
+def upstream(monkeypatch):
+    monkeypatch.setattr(settings, "deepseek_api_key", "test")
+    monkeypatch.setattr(settings, "warm_cache_enabled", True)
+    monkeypatch.setattr(settings, "similarity_short_circuit", False)
+    calls = []
+
+    async def analyze(text, competitor_name=None, detail=None, deterministic=False):
+        calls.append((text, competitor_name, detail))
+        return ANALYSIS
+
+    monkeypatch.setattr(main.text_coalescer, "analyze", analyze)
+    monkeypatch.setattr(warm_module.deepseek_analyzer, "analyze_competitor_text", analyze)
+    warm_cache.clear()
+    yield calls
+    warm_cache.clear()
+    history_store.clear()
+    similarity_service.clear()
+
+
+def test_get_matches_ignoring_whitespace_but_not_detail():
+    warm_cache.store("Студия  моушн\nдизайна", "Alpha", "full", ANALYSIS)
+
+    assert warm_cache.get("Студия моушн дизайна", " alpha ", "full") == ANALYSIS
+    assert warm_cache.get("Студия моушн дизайна", "Alpha", "scores") is None
+    assert warm_cache.get("Студия моушн дизайна", "Beta", "full") is None
+
+
+def test_entries_of_another_template_version_are_dropped():
+    warm_cache.store(EXAMPLE_TEXT, EXAMPLE_COMPETITOR, "full", ANALYSIS)
+    data = json.loads(warm_cache.path.read_text(encoding="utf-8"))
+    data["template_version"] = "0" * 16
+    warm_cache.path.write_text(json.dumps(data), encoding="utf-8")
+
+    assert warm_cache.get(EXAMPLE_TEXT, EXAMPLE_COMPETITOR, "full") is None
+
+
+def test_warm_input_is_served_without_an_upstream_call(api, upstream):
+    request = {"text": EXAMPLE_TEXT, "competitor_name": EXAMPLE_COMPETITOR, "detail": "full"}
+    first = api("POST", "/analyze_text", json=request).json()
+    second = api("POST", "/analyze_text", json=request).json()
+
+    # The live analysis of a warm input is kept, the repeat never reaches upstream
+    assert len(upstream) == 1
+    assert second == first
+    assert second["analysis"]["summary"] == "Эталонный пример"
+
+
+def test_other_inputs_are_not_kept(api, upstream):
+    request = {"text": "Другая студия", "competitor_name": "Beta", "detail": "full"}
+    api("POST", "/analyze_text", json=request)
+    api("POST", "/analyze_text", json=request)
+    assert len(upstream) == 2
+
+
+def test_warm_pass_fills_missing_entries_once(run, upstream):
+    assert run(warm_cache.warm()) == 1
+    assert run(warm_cache.warm()) == 0
+    assert upstream == [(EXAMPLE_TEXT, EXAMPLE_COMPETITOR, "full")]
+    assert warm_cache.get(EXAMPLE_TEXT, EXAMPLE_COMPETITOR, "full") == ANALYSIS
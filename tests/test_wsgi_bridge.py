@@ -0,0 +1,100 @@
+import io
+import json
+
+import pytest
+
+from backend.wsgi_bridge import AsgiToWsgi
+
+
+class EchoApp:
+    """ASGI app echoing the request back in two body chunks, tracking lifespan events"""
+
+    def __init__(self):
+        self.events = []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                self.events.append(message["type"])
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                else:
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        if scope["path"] == "/crash":
+            raise RuntimeError("boom")
+
+        payload = json.dumps({
+            "method": scope["method"],
+            "path": scope["path"],
+            "root_path": scope["root_path"],
+            "query": scope["query_string"].decode(),
+            "headers": {name.decode(): value.decode() for name, value in scope["headers"]},
+            "body": body.decode("utf-8"),
+        }).encode("utf-8")
+        await send({"type": "http.response.start", "status": 201,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload[:10], "more_body": True})
+        await send({"type": "http.response.body", "body": payload[10:]})
+
+
+def environ_for(path, body=b"", method="POST", query=""):
+    return {
+        "REQUEST_METHOD": method, "SCRIPT_NAME": "/pem08", "PATH_INFO": path, "QUERY_STRING": query,
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(body), "CONTENT_LENGTH": str(len(body)),
+        "CONTENT_TYPE": "application/json", "HTTP_X_API_KEY": "secret",
+    }
+
+
+@pytest.fixture
+def bridge():
+    app = EchoApp()
+    application = AsgiToWsgi(app)
+    yield application
+    application.close()
+
+
+def call(application, environ):
+    responses = []
+    chunks = list(application(environ, lambda status, headers: responses.append((status, headers))))
+    return responses[0], chunks
+
+
+def test_request_round_trip(bridge):
+    body = "Студия моушн-дизайна".encode("utf-8")
+    (status, headers), chunks = call(bridge, environ_for("/analyze_text", body, query="detail=full"))
+
+    assert status == "201 Created"
+    assert ("content-type", "application/json") in headers
+    # Streamed bodies stay in chunks
+    assert len(chunks) == 2
+    echoed = json.loads(b"".join(chunks))
+    assert echoed["method"] == "POST"
+    assert echoed["path"] == "/analyze_text"
+    assert echoed["root_path"] == "/pem08"
+    assert echoed["query"] == "detail=full"
+    assert echoed["headers"]["x-api-key"] == "secret"
+    assert echoed["headers"]["content-length"] == str(len(body))
+    assert echoed["body"] == "Студия моушн-дизайна"
+
+
+def test_app_error_reaches_the_wsgi_server(bridge):
+    with pytest.raises(RuntimeError):
+        call(bridge, environ_for("/crash"))
+
+
+def test_lifespan_startup_and_shutdown():
+    app = EchoApp()
+    application = AsgiToWsgi(app)
+    assert app.events == ["lifespan.startup"]
+    application.close()
+    assert app.events == ["lifespan.startup", "lifespan.shutdown"]